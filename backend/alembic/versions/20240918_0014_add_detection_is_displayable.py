@@ -0,0 +1,67 @@
+"""add detection displayable flag
+
+Revision ID: 20240918_0014
+Revises: 20240917_0013
+Create Date: 2024-09-18 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20240918_0014"
+down_revision = "20240917_0013"
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_BATCH_SIZE = 10000
+
+# 与 app.models.detection.has_displayable_payload 保持一致：
+# 原文去掉空白后非空，且 analysis 是对象并带有非空的 summary 或 sentences。
+IS_DISPLAYABLE_BACKFILL_SQL = """
+UPDATE detections
+SET is_displayable = TRUE
+WHERE id >= :start_id
+  AND id < :end_id
+  AND btrim(input_text, E' \\t\\r\\n') <> ''
+  AND jsonb_typeof(meta_json -> 'analysis') = 'object'
+  AND (
+      COALESCE(meta_json -> 'analysis' -> 'summary', 'null'::jsonb)
+          NOT IN ('null'::jsonb, '{}'::jsonb, '[]'::jsonb, '""'::jsonb, 'false'::jsonb, '0'::jsonb)
+      OR COALESCE(meta_json -> 'analysis' -> 'sentences', 'null'::jsonb)
+          NOT IN ('null'::jsonb, '{}'::jsonb, '[]'::jsonb, '""'::jsonb, 'false'::jsonb, '0'::jsonb)
+  )
+"""
+
+
+def upgrade() -> None:
+    op.add_column(
+        "detections",
+        sa.Column("is_displayable", sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+    # 按 id 区间分批回填并逐批提交，避免大表上一条 UPDATE 长时间持有行锁。
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        bounds = bind.execute(sa.text("SELECT MIN(id), MAX(id) FROM detections")).first()
+        if bounds is not None and bounds[0] is not None:
+            start_id, max_id = int(bounds[0]), int(bounds[1])
+            while start_id <= max_id:
+                end_id = start_id + BACKFILL_BATCH_SIZE
+                bind.execute(sa.text(IS_DISPLAYABLE_BACKFILL_SQL), {"start_id": start_id, "end_id": end_id})
+                start_id = end_id
+
+        # CONCURRENTLY 不能放在事务里；建索引期间不阻塞 detections 的写入。
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_detections_user_displayable_pinned_created "
+            "ON detections (user_id, is_displayable, is_pinned, created_at)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_detections_user_displayable_pinned_created")
+    op.drop_column("detections", "is_displayable")
@@ -0,0 +1,42 @@
+"""add trigram search indexes
+
+Revision ID: 20240919_0015
+Revises: 20240918_0014
+Create Date: 2024-09-19 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20240919_0015"
+down_revision = "20240918_0014"
+branch_labels = None
+depends_on = None
+
+
+TRIGRAM_INDEXES = (
+    ("ix_detections_input_text_trgm", "detections", "input_text"),
+    ("ix_detections_title_trgm", "detections", "title"),
+    ("ix_detections_actor_id_trgm", "detections", "actor_id"),
+    ("ix_users_email_trgm", "users", "email"),
+    ("ix_users_name_trgm", "users", "name"),
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY 不能放在事务里；大表建 GIN 索引期间不阻塞写入。
+    with op.get_context().autocommit_block():
+        for index_name, table_name, column_name in TRIGRAM_INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+                f"ON {table_name} USING gin ({column_name} gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, _, _ in reversed(TRIGRAM_INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
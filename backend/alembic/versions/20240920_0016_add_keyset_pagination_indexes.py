@@ -0,0 +1,47 @@
+"""add keyset pagination indexes
+
+Revision ID: 20240920_0016
+Revises: 20240919_0015
+Create Date: 2024-09-20 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20240920_0016"
+down_revision = "20240919_0015"
+branch_labels = None
+depends_on = None
+
+
+# (排序键..., id) 复合索引；旧的单列/前缀索引被新索引覆盖后删除。
+KEYSET_INDEXES = (
+    ("ix_detections_created_id", "detections", "created_at, id"),
+    ("ix_detections_actor_created_id", "detections", "actor_type, actor_id, created_at, id"),
+    ("ix_detections_score_id", "detections", "score, id"),
+    ("ix_detections_chars_used_id", "detections", "chars_used, id"),
+    ("ix_users_created_id", "users", "created_at, id"),
+    ("ix_users_credits_remaining_id", "users", "(credits_total - credits_used), id"),
+)
+SUPERSEDED_INDEXES = (
+    ("ix_detections_created_at", "detections", "created_at"),
+    ("ix_detections_actor_type_actor_id", "detections", "actor_type, actor_id"),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns in KEYSET_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+        for index_name, _, _ in SUPERSEDED_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns in SUPERSEDED_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+        for index_name, _, _ in reversed(KEYSET_INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
@@ -0,0 +1,73 @@
+"""create usage rollup tables
+
+Revision ID: 20240921_0017
+Revises: 20240920_0016
+Create Date: 2024-09-21 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20240921_0017"
+down_revision = "20240920_0016"
+branch_labels = None
+depends_on = None
+
+
+GRANULARITIES = ("hour", "day")
+
+USAGE_BACKFILL_SQL = """
+INSERT INTO usage_rollups (granularity, bucket_start, detections, chars_used, new_users)
+SELECT :granularity, bucket_start, SUM(detections), SUM(chars_used), SUM(new_users)
+FROM (
+    SELECT date_trunc(:granularity, created_at, 'UTC') AS bucket_start,
+           COUNT(*) AS detections, COALESCE(SUM(chars_used), 0) AS chars_used, 0 AS new_users
+    FROM detections
+    GROUP BY 1
+    UNION ALL
+    SELECT date_trunc(:granularity, created_at, 'UTC'), 0, 0, COUNT(*)
+    FROM users
+    GROUP BY 1
+) AS buckets
+GROUP BY bucket_start
+"""
+
+LABEL_BACKFILL_SQL = """
+INSERT INTO usage_label_rollups (granularity, bucket_start, label, detections)
+SELECT :granularity, date_trunc(:granularity, created_at, 'UTC'), result_label, COUNT(*)
+FROM detections
+GROUP BY 2, 3
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "usage_rollups",
+        sa.Column("granularity", sa.String(length=8), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("detections", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("chars_used", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+        sa.Column("new_users", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.PrimaryKeyConstraint("granularity", "bucket_start"),
+    )
+    op.create_table(
+        "usage_label_rollups",
+        sa.Column("granularity", sa.String(length=8), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("label", sa.String(length=50), nullable=False),
+        sa.Column("detections", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.PrimaryKeyConstraint("granularity", "bucket_start", "label"),
+    )
+
+    bind = op.get_bind()
+    for granularity in GRANULARITIES:
+        bind.execute(sa.text(USAGE_BACKFILL_SQL), {"granularity": granularity})
+        bind.execute(sa.text(LABEL_BACKFILL_SQL), {"granularity": granularity})
+
+
+def downgrade() -> None:
+    op.drop_table("usage_label_rollups")
+    op.drop_table("usage_rollups")
@@ -0,0 +1,52 @@
+"""create team daily stats rollup
+
+Revision ID: 20240922_0018
+Revises: 20240921_0017
+Create Date: 2024-09-22 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20240922_0018"
+down_revision = "20240921_0017"
+branch_labels = None
+depends_on = None
+
+
+# 与 app.services.team_stats 保持一致：检测只计入创建时作者已加入的团队。
+TEAM_STATS_BACKFILL_SQL = """
+INSERT INTO team_daily_stats (team_id, day, label, detections, chars_used, score_sum)
+SELECT
+    tm.team_id,
+    (d.created_at AT TIME ZONE 'UTC')::date,
+    d.result_label,
+    COUNT(*),
+    COALESCE(SUM(d.chars_used), 0),
+    COALESCE(SUM(d.score), 0)
+FROM detections AS d
+JOIN team_members AS tm ON tm.user_id = d.user_id AND tm.joined_at <= d.created_at
+GROUP BY 1, 2, 3
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "team_daily_stats",
+        sa.Column("team_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("label", sa.String(length=50), nullable=False),
+        sa.Column("detections", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("chars_used", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+        sa.Column("score_sum", sa.Float(), server_default=sa.text("0"), nullable=False),
+        sa.ForeignKeyConstraint(["team_id"], ["teams.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("team_id", "day", "label"),
+    )
+    op.execute(TEAM_STATS_BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    op.drop_table("team_daily_stats")
@@ -0,0 +1,107 @@
+"""partition detections by month
+
+Revision ID: 20240923_0019
+Revises: 20240922_0018
+Create Date: 2024-09-23 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20240923_0019"
+down_revision = "20240922_0018"
+branch_labels = None
+depends_on = None
+
+
+MONTHS_AHEAD = 3
+LEGACY_TABLE = "detections_unpartitioned"
+
+# 与 app.models.detection.Detection.__table_args__ 保持一致；分区表父表上建索引会自动下发到每个分区。
+DETECTION_INDEXES = (
+    ("ix_detections_user_id", "(user_id)"),
+    ("ix_detections_created_id", "(created_at, id)"),
+    ("ix_detections_actor_created_id", "(actor_type, actor_id, created_at, id)"),
+    ("ix_detections_score_id", "(score, id)"),
+    ("ix_detections_chars_used_id", "(chars_used, id)"),
+    ("ix_detections_user_pinned_created", "(user_id, is_pinned, created_at)"),
+    ("ix_detections_user_displayable_pinned_created", "(user_id, is_displayable, is_pinned, created_at)"),
+    ("ix_detections_input_text_trgm", "USING gin (input_text gin_trgm_ops)"),
+    ("ix_detections_title_trgm", "USING gin (title gin_trgm_ops)"),
+    ("ix_detections_actor_id_trgm", "USING gin (actor_id gin_trgm_ops)"),
+)
+
+
+def _add_months(value: date, months: int) -> date:
+    index = value.month - 1 + months
+    return date(value.year + index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes(table_name: str) -> None:
+    for index_name, definition in DETECTION_INDEXES:
+        op.execute(f"CREATE INDEX {index_name} ON {table_name} {definition}")
+
+
+def _drop_indexes() -> None:
+    for index_name, _ in DETECTION_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 整表改造需要停写：拷贝期间持有排他锁，避免新行写进旧表后丢失。
+    op.execute("LOCK TABLE detections IN ACCESS EXCLUSIVE MODE")
+    op.execute(f"ALTER TABLE detections RENAME TO {LEGACY_TABLE}")
+    op.execute(f"ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT detections_pkey TO {LEGACY_TABLE}_pkey")
+    _drop_indexes()
+
+    op.execute(
+        f"CREATE TABLE detections (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+    )
+    # 分区表的主键必须包含分区键；id 仍由 detections_id_seq 保证唯一。
+    op.execute("ALTER TABLE detections ADD CONSTRAINT detections_pkey PRIMARY KEY (id, created_at)")
+    op.execute(
+        "ALTER TABLE detections ADD CONSTRAINT detections_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    op.execute("ALTER SEQUENCE detections_id_seq OWNED BY detections.id")
+
+    oldest = bind.execute(sa.text(f"SELECT MIN(created_at) FROM {LEGACY_TABLE}")).scalar()
+    today = datetime.now(timezone.utc).date()
+    first_month = (oldest.astimezone(timezone.utc).date() if oldest else today).replace(day=1)
+    last_month = _add_months(today.replace(day=1), MONTHS_AHEAD)
+    month = first_month
+    while month <= last_month:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE detections_p{month:%Y%m} PARTITION OF detections "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{next_month.isoformat()} 00:00:00+00')"
+        )
+        month = next_month
+    # 兜底分区只接住还没来得及建月分区的行，正常情况下保持为空。
+    op.execute("CREATE TABLE detections_default PARTITION OF detections DEFAULT")
+
+    op.execute(f"INSERT INTO detections SELECT * FROM {LEGACY_TABLE}")
+    op.execute(f"DROP TABLE {LEGACY_TABLE}")
+    _create_indexes("detections")
+    op.execute("ANALYZE detections")
+
+
+def downgrade() -> None:
+    op.execute("LOCK TABLE detections IN ACCESS EXCLUSIVE MODE")
+    op.execute(f"CREATE TABLE {LEGACY_TABLE} (LIKE detections INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO {LEGACY_TABLE} SELECT * FROM detections")
+    op.execute(f"ALTER SEQUENCE detections_id_seq OWNED BY {LEGACY_TABLE}.id")
+    op.execute("DROP TABLE detections CASCADE")
+    op.execute(f"ALTER TABLE {LEGACY_TABLE} RENAME TO detections")
+    op.execute("ALTER TABLE detections ADD CONSTRAINT detections_pkey PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE detections ADD CONSTRAINT detections_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    _create_indexes("detections")
@@ -0,0 +1,35 @@
+"""create user history counters
+
+Revision ID: 20240924_0020
+Revises: 20240923_0019
+Create Date: 2024-09-24 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20240924_0020"
+down_revision = "20240923_0019"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_history_counters",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("records", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.execute(
+        "INSERT INTO user_history_counters (user_id, records) "
+        "SELECT user_id, COUNT(*) FROM detections WHERE user_id IS NOT NULL GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_history_counters")
@@ -1,7 +1,9 @@
 from datetime import datetime
 
 from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
+from app.core.metrics import metrics_registry
 from app.core.roles import UserRole
 from app.db.deps import SessionDep, SysAdminDep
 from app.schemas import ErrorResponse
@@ -10,6 +12,7 @@ from app.schemas.admin import (
     AdminDetectionListItem,
     AdminDetectionListResponse,
     AdminDetectionMini,
+    AdminMetricsResponse,
     AdminOverviewPeriod,
     AdminOverviewPreset,
     AdminOverviewResponse,
@@ -28,6 +31,16 @@ from app.schemas.admin import (
 )
 from app.schemas.history import Analysis
 from app.services.admin_service import AdminOverviewData, AdminService, DetectionWithUser
+from app.services.exports import (
+    ADMIN_DETECTION_DEFAULT_COLUMNS,
+    ADMIN_DETECTION_EXPORT_COLUMNS,
+    MEDIA_TYPES,
+    ExportFormat,
+    export_filename,
+    resolve_columns,
+    stream_export,
+)
+from app.services.overview_cache import overview_cache
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -84,6 +97,7 @@ def _build_detection_list_item(row: DetectionWithUser) -> AdminDetectionListItem
         chars_used=detection.chars_used,
         functions_used=detection.functions_used or [],
         created_at=detection.created_at,
+        snippet=row.snippet,
     )
 
 
@@ -152,6 +166,16 @@ async def admin_status(_: SysAdminDep) -> AdminStatusResponse:
     return AdminStatusResponse(message="admin ok")
 
 
+@router.get(
+    "/metrics",
+    response_model=AdminMetricsResponse,
+    summary="Process-local runtime metrics",
+    responses={401: {"model": ErrorResponse}, 403: {"model": ErrorResponse}},
+)
+async def get_admin_metrics(_: SysAdminDep) -> AdminMetricsResponse:
+    return AdminMetricsResponse(metrics=metrics_registry.snapshot())
+
+
 @router.get(
     "/overview",
     response_model=AdminOverviewResponse,
@@ -163,8 +187,10 @@ async def get_admin_overview(
     _: SysAdminDep,
     preset: AdminOverviewPreset = Query(AdminOverviewPreset.WEEK),
 ) -> AdminOverviewResponse:
-    service = AdminService(db)
-    return _build_overview_response(service.get_overview(preset=preset.value))
+    def load(session) -> AdminOverviewResponse:
+        return _build_overview_response(AdminService(session).get_overview(preset=preset.value))
+
+    return await overview_cache.get(preset.value, db, load)
 
 
 @router.get(
@@ -184,9 +210,11 @@ async def list_admin_users(
     plan_tier: str | None = Query(None, alias="planTier"),
     sort: str = Query("createdAt"),
     order: str = Query("desc"),
+    cursor: str | None = Query(None, max_length=512),
+    include_total: bool = Query(True, alias="includeTotal"),
 ) -> AdminUserListResponse:
     service = AdminService(db)
-    users, total = service.list_users(
+    users, total, next_cursor = service.list_users(
         page=page,
         page_size=page_size,
         search=search,
@@ -195,12 +223,16 @@ async def list_admin_users(
         plan_tier=plan_tier,
         sort=sort,
         order=order,
+        cursor=cursor,
+        include_total=include_total,
     )
     return AdminUserListResponse(
         items=[_build_user_list_item(user) for user in users],
         page=page,
         page_size=page_size,
-        total=total,
+        total=total.value if total is not None else None,
+        total_exact=total.exact if total is not None else None,
+        next_cursor=next_cursor,
     )
 
 
@@ -308,9 +340,11 @@ async def list_admin_detections(
     date_to: datetime | None = Query(None, alias="dateTo"),
     sort: str = Query("createdAt"),
     order: str = Query("desc"),
+    cursor: str | None = Query(None, max_length=512),
+    include_total: bool = Query(True, alias="includeTotal"),
 ) -> AdminDetectionListResponse:
     service = AdminService(db)
-    items, total = service.list_detections(
+    items, total, next_cursor = service.list_detections(
         page=page,
         page_size=page_size,
         search=search,
@@ -322,12 +356,55 @@ async def list_admin_detections(
         date_to=date_to,
         sort=sort,
         order=order,
+        cursor=cursor,
+        include_total=include_total,
     )
     return AdminDetectionListResponse(
         items=[_build_detection_list_item(item) for item in items],
         page=page,
         page_size=page_size,
-        total=total,
+        total=total.value if total is not None else None,
+        total_exact=total.exact if total is not None else None,
+        next_cursor=next_cursor,
+    )
+
+
+@router.get(
+    "/detections/export",
+    response_class=StreamingResponse,
+    summary="Export detections as NDJSON or CSV",
+    responses={401: {"model": ErrorResponse}, 403: {"model": ErrorResponse}},
+)
+async def export_admin_detections(
+    db: SessionDep,
+    _: SysAdminDep,
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    columns: str | None = Query(None, max_length=500),
+    search: str | None = Query(None),
+    user_id: int | None = Query(None, alias="userId"),
+    actor_type: str | None = Query(None, alias="actorType"),
+    label: str | None = Query(None),
+    function_name: str | None = Query(None, alias="function"),
+    date_from: datetime | None = Query(None, alias="dateFrom"),
+    date_to: datetime | None = Query(None, alias="dateTo"),
+    gzip: bool = Query(False),
+) -> StreamingResponse:
+    names = resolve_columns(columns, ADMIN_DETECTION_EXPORT_COLUMNS, ADMIN_DETECTION_DEFAULT_COLUMNS)
+    stmt = AdminService(db).export_detections_statement(
+        [ADMIN_DETECTION_EXPORT_COLUMNS[name] for name in names],
+        search=search,
+        user_id=user_id,
+        actor_type=actor_type,
+        label=label,
+        function_name=function_name,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    filename = export_filename("aidetector-detections", export_format, gzip)
+    return StreamingResponse(
+        stream_export(db, stmt, names, export_format, compress=gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "private, no-cache"},
     )
 
 
@@ -221,17 +221,21 @@ async def update_current_user_profile(
     current_user: CurrentUserDep,
     db: SessionDep,
 ) -> UserResponse:
+    # current_user 可能来自认证缓存（detached），修改前在本请求的会话里取一份。
+    user = db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive or invalid user")
     if payload.firstName is not None:
-        current_user.first_name = payload.firstName
+        user.first_name = payload.firstName
     if payload.surname is not None:
-        current_user.surname = payload.surname
+        user.surname = payload.surname
     if payload.role is not None:
-        current_user.job_role = payload.role
+        user.job_role = payload.role
     if payload.organization is not None:
-        current_user.organization = payload.organization
+        user.organization = payload.organization
     if payload.industry is not None:
-        current_user.industry = payload.industry
+        user.industry = payload.industry
 
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    return user
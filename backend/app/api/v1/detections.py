@@ -1,19 +1,21 @@
 import asyncio
 import re
+from dataclasses import dataclass
 from datetime import datetime
 from html import escape
-from io import BytesIO
 from math import exp
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
-from docx import Document
-from fastapi import APIRouter, File, HTTPException, Query, UploadFile, status
-from pypdf import PdfReader
+from fastapi import APIRouter, File, Form, Header, HTTPException, Query, Response, UploadFile, status
 
 from app.core.config import get_settings
-from app.db.deps import ActiveMemberDep, CurrentActorDep, SessionDep
+from app.db.deps import ActiveMemberDep, CurrentActorDep, LazySessionDep, SessionDep
 from app.schemas import (
     AnalysisResponse,
     Citation,
+    DetectFileResult,
+    DetectFilesResponse,
     DetectRequest,
     DetectionListResponse,
     DetectionRequest,
@@ -27,9 +29,10 @@ from app.schemas import (
 from app.schemas.detection import DetectionItem
 from app.schemas.history import Analysis, Citation as HistoryCitation, Sentence as HistorySentence, Summary
 from app.services.detection_service import DetectionService
+from app.services.file_parsing import FileTooLargeError, parse_file, spool_upload
 from app.services.quota_service import QuotaExceededError, consume_quota, get_quota_limit, get_today_bounds, get_used_today
 from app.services.repre_guard_client import RepreGuardError, repre_guard_client
-from app.services.scan_example_service import ScanExampleService
+from app.services.scan_example_service import get_cached_examples
 from app.services.token_chunker import DETECTABLE_STATUS, TOO_SHORT_STATUS, build_token_aware_segments
 
 router = APIRouter(tags=["detections"])
@@ -816,6 +819,7 @@ async def _detect_impl(
         actor_id=actor_id,
         chars_used=chars,
         analysis=analysis.model_dump(),
+        write_behind=settings.detection_write_behind,
     )
 
     return DetectionResponse(
@@ -832,22 +836,6 @@ async def _detect_impl(
     )
 
 
-def _parse_txt(content: bytes) -> str:
-    return content.decode("utf-8")
-
-
-def _parse_pdf(content: bytes) -> str:
-    reader = PdfReader(BytesIO(content))
-    pages = [page.extract_text() or "" for page in reader.pages]
-    return "\n".join(pages).strip()
-
-
-def _parse_docx(content: bytes) -> str:
-    document = Document(BytesIO(content))
-    paragraphs = [paragraph.text for paragraph in document.paragraphs]
-    return "\n".join(paragraphs).strip()
-
-
 def _extension_from_filename(filename: str) -> str:
     if not filename or "." not in filename:
         return ""
@@ -908,12 +896,67 @@ async def detect_scan_root(
     "/scan/examples",
     response_model=ScanExamplesResponse,
     summary="Get scan examples",
+    responses={304: {"description": "Not Modified"}},
 )
 async def get_scan_examples(
-    db: SessionDep,
+    db: LazySessionDep,
     locale: str = Query("zh-CN", description="Example locale, supports zh-CN / en-US"),
-) -> ScanExamplesResponse:
-    return ScanExampleService(db).list_examples(locale=locale)
+    if_none_match: str | None = Header(None, alias="If-None-Match"),
+) -> Response:
+    cached = get_cached_examples(locale, db)
+    max_age = settings.scan_examples_cache_seconds
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={max_age}" if max_age else "no-cache",
+    }
+    if cached.matches(if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+@dataclass(frozen=True)
+class _SpooledUpload:
+    index: int
+    file_name: str
+    extension: str
+    path: Path
+    sha256: str
+
+
+def _check_file_count(files: list[UploadFile]) -> None:
+    if len(files) > MAX_FILE_COUNT:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"Too many files. Max {MAX_FILE_COUNT}.",
+        )
+
+
+async def _spool_uploads(files: list[UploadFile], spool_dir: Path) -> tuple[dict[int, str], list[_SpooledUpload]]:
+    """Spool accepted uploads into ``spool_dir``; returns per-index rejection messages and the spooled files."""
+    rejected: dict[int, str] = {}
+    spooled: list[_SpooledUpload] = []
+    for index, upload in enumerate(files):
+        filename = upload.filename or "unknown"
+        extension = _extension_from_filename(filename)
+        if extension not in ALLOWED_EXTENSIONS:
+            rejected[index] = f"Unsupported file type: {extension or 'unknown'}"
+            continue
+        # 分块落盘，超过大小上限立即停止读取，不再把整个文件读进内存。
+        path = spool_dir / f"{index}{extension}"
+        try:
+            sha256 = await asyncio.to_thread(spool_upload, upload.file, path, MAX_FILE_SIZE_BYTES)
+        except FileTooLargeError as exc:
+            rejected[index] = str(exc)
+            continue
+        spooled.append(_SpooledUpload(index, filename, extension, path, sha256))
+    return rejected, spooled
+
+
+def _error_from_http_exception(exc: HTTPException) -> ErrorResponse:
+    detail = exc.detail
+    if isinstance(detail, dict) and {"code", "message"}.issubset(detail.keys()):
+        return ErrorResponse(code=detail["code"], message=detail["message"], detail=detail.get("detail"))
+    return ErrorResponse(code=exc.status_code, message=str(detail), detail=detail)
 
 
 @router.post(
@@ -927,55 +970,94 @@ async def parse_files(
     files: list[UploadFile] = File(..., description="Uploaded files"),
 ) -> ParseFilesResponse:
     _ = current_user
-    if len(files) > MAX_FILE_COUNT:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-            detail=f"Too many files. Max {MAX_FILE_COUNT}.",
+    _check_file_count(files)
+
+    with TemporaryDirectory(prefix="parse-files-") as spool_dir:
+        rejected, spooled = await _spool_uploads(files, Path(spool_dir))
+        # 同一请求的文件并行解析，每个文件在独立子进程里跑，单个超时不影响其他文件。
+        parsed = await asyncio.gather(
+            *(parse_file(item.extension, item.path, MAX_DETECT_CHARS, item.sha256) for item in spooled),
+            return_exceptions=True,
         )
 
-    results: list[ParsedFileResult] = []
-    for upload in files:
-        filename = upload.filename or "unknown"
-        extension = _extension_from_filename(filename)
-        if extension not in ALLOWED_EXTENSIONS:
-            results.append(
-                ParsedFileResult(
-                    file_name=filename,
-                    content=None,
-                    error=f"Unsupported file type: {extension or 'unknown'}",
-                )
+    results = [
+        ParsedFileResult(file_name=upload.filename or "unknown", content=None, error=rejected.get(index))
+        for index, upload in enumerate(files)
+    ]
+    for item, outcome in zip(spooled, parsed):
+        if isinstance(outcome, BaseException):
+            results[item.index] = ParsedFileResult(file_name=item.file_name, content=None, error=f"Failed to parse file: {outcome}")
+        else:
+            results[item.index] = ParsedFileResult(
+                file_name=item.file_name,
+                content=outcome.content,
+                error=None,
+                truncated=outcome.truncated,
+                cached=outcome.cached,
             )
-            continue
 
-        data = await upload.read()
-        if len(data) > MAX_FILE_SIZE_BYTES:
-            results.append(
-                ParsedFileResult(
-                    file_name=filename,
-                    content=None,
-                    error=f"File too large. Max {MAX_FILE_SIZE_BYTES} bytes.",
-                )
-            )
-            continue
+    return ParseFilesResponse(results=results)
 
-        try:
-            if extension == ".pdf":
-                content = _parse_pdf(data)
-            elif extension == ".docx":
-                content = _parse_docx(data)
-            else:
-                content = _parse_txt(data)
-            results.append(ParsedFileResult(file_name=filename, content=content, error=None))
-        except Exception as exc:  # noqa: BLE001
-            results.append(
-                ParsedFileResult(
-                    file_name=filename,
-                    content=None,
-                    error=f"Failed to parse file: {exc}",
-                )
-            )
 
-    return ParseFilesResponse(results=results)
+@detect_router.post(
+    "/detect/file",
+    response_model=DetectFilesResponse,
+    summary="Parse uploaded files and detect their text",
+    responses={401: {"model": ErrorResponse}, 403: {"model": ErrorResponse}, 422: {"model": ErrorResponse}},
+)
+async def detect_file(
+    db: SessionDep,
+    current_user: ActiveMemberDep,
+    current_actor: CurrentActorDep,
+    files: list[UploadFile] = File(..., description="Uploaded files"),
+    functions: list[str] | None = Form(None, description="Detection feature flags"),
+) -> DetectFilesResponse:
+    _ = current_user
+    _check_file_count(files)
+
+    results = [DetectFileResult(file_name=upload.filename or "unknown") for upload in files]
+    with TemporaryDirectory(prefix="detect-file-") as spool_dir:
+        rejected, spooled = await _spool_uploads(files, Path(spool_dir))
+        for index, message in rejected.items():
+            results[index].error = ErrorResponse(code="INVALID_FILE", message=message, detail=None)
+
+        # 所有文件先并行开始解析，检测按上传顺序逐个进行：后面文件的解析和前面文件的推理重叠，
+        # 同一个数据库会话不会被并发使用，配额也按顺序扣减。
+        parse_tasks = [
+            asyncio.create_task(parse_file(item.extension, item.path, MAX_DETECT_CHARS, item.sha256)) for item in spooled
+        ]
+        try:
+            for item, task in zip(spooled, parse_tasks):
+                result = results[item.index]
+                try:
+                    parsed = await task
+                except Exception as exc:  # noqa: BLE001
+                    result.error = ErrorResponse(code="PARSE_FAILED", message=f"Failed to parse file: {exc}", detail=None)
+                    continue
+                result.cached = parsed.cached
+                if parsed.truncated:
+                    result.error = ErrorResponse(
+                        code="TEXT_TOO_LONG",
+                        message=f"Text exceeds the {MAX_DETECT_CHARS} character limit",
+                        detail={"maximum": MAX_DETECT_CHARS},
+                    )
+                    continue
+                try:
+                    if not parsed.content.strip():
+                        raise HTTPException(
+                            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                            detail="Text cannot be empty",
+                        )
+                    payload = DetectionRequest(text=parsed.content, functions=functions or [])
+                    result.detection = await _detect_impl(payload=payload, db=db, current_actor=current_actor)
+                except HTTPException as exc:
+                    result.error = _error_from_http_exception(exc)
+        finally:
+            # 取消还在解析的任务：parse_file 会通知解析线程杀掉子进程，不会留下子进程跑到超时。
+            for task in parse_tasks:
+                task.cancel()
+
+    return DetectFilesResponse(results=results)
 
 
 async def _list_detections_impl(
@@ -985,6 +1067,8 @@ async def _list_detections_impl(
     page_size: int,
     from_time: datetime | None,
     to_time: datetime | None,
+    cursor: str | None = None,
+    include_total: bool = True,
 ) -> DetectionListResponse:
     if from_time and to_time and from_time > to_time:
         raise HTTPException(
@@ -992,13 +1076,15 @@ async def _list_detections_impl(
             detail="from must be <= to",
         )
 
-    records, total = DetectionService(db).list_detections(
+    records, total, next_cursor = DetectionService(db).list_detections(
         actor_type=current_actor.actor_type,
         actor_id=current_actor.actor_id,
         page=page,
         page_size=page_size,
         from_time=from_time,
         to_time=to_time,
+        cursor=cursor,
+        include_total=include_total,
     )
 
     items = [
@@ -1018,6 +1104,7 @@ async def _list_detections_impl(
         page=page,
         page_size=page_size,
         items=items,
+        next_cursor=next_cursor,
     )
 
 
@@ -1034,6 +1121,8 @@ async def list_detections(
     page_size: int = Query(10, ge=1, le=100, description="Page size"),
     from_time: datetime | None = Query(None, alias="from", description="From datetime in ISO8601"),
     to_time: datetime | None = Query(None, alias="to", description="To datetime in ISO8601"),
+    cursor: str | None = Query(None, max_length=512, description="Opaque cursor from nextCursor; overrides page"),
+    include_total: bool = Query(True, alias="includeTotal", description="Set false to skip the exact total count"),
 ) -> DetectionListResponse:
     return await _list_detections_impl(
         db=db,
@@ -1042,6 +1131,8 @@ async def list_detections(
         page_size=page_size,
         from_time=from_time,
         to_time=to_time,
+        cursor=cursor,
+        include_total=include_total,
     )
 
 
@@ -1058,6 +1149,8 @@ async def list_detections_history(
     page_size: int = Query(10, ge=1, le=100, description="Page size"),
     from_time: datetime | None = Query(None, alias="from", description="From datetime in ISO8601"),
     to_time: datetime | None = Query(None, alias="to", description="To datetime in ISO8601"),
+    cursor: str | None = Query(None, max_length=512, description="Opaque cursor from nextCursor; overrides page"),
+    include_total: bool = Query(True, alias="includeTotal", description="Set false to skip the exact total count"),
 ) -> DetectionListResponse:
     return await _list_detections_impl(
         db=db,
@@ -1066,4 +1159,6 @@ async def list_detections_history(
         page_size=page_size,
         from_time=from_time,
         to_time=to_time,
+        cursor=cursor,
+        include_total=include_total,
     )
@@ -3,6 +3,7 @@
 from typing import Annotated
 
 from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
 from app.db.deps import ActiveMemberDep, SessionDep, _decode_token
 from app.schemas.history import (
@@ -17,12 +18,22 @@ from app.schemas.history import (
     HistoryRecordResponse,
     HistoryRecordUpdate,
 )
+from app.services.exports import (
+    HISTORY_DEFAULT_COLUMNS,
+    HISTORY_EXPORT_COLUMNS,
+    MEDIA_TYPES,
+    ExportFormat,
+    export_filename,
+    resolve_columns,
+    stream_export,
+)
 from app.services.history_service import HistoryService
+from app.services.search import highlight_snippet, normalize_search_term
 
 router = APIRouter(prefix="/history", tags=["history"])
 
 
-def _detection_to_history_response(detection) -> HistoryRecordResponse:
+def _detection_to_history_response(detection, search: str | None = None) -> HistoryRecordResponse:
     analysis_data = None
     if detection.meta_json and "analysis" in detection.meta_json:
         try:
@@ -40,6 +51,7 @@ def _detection_to_history_response(detection) -> HistoryRecordResponse:
         editor_html=detection.editor_html,
         is_pinned=bool(getattr(detection, "is_pinned", False)),
         analysis=analysis_data,
+        snippet=highlight_snippet(detection.input_text, search) if search else None,
     )
 
 
@@ -71,13 +83,15 @@ async def list_histories(
     current_user: ActiveMemberDep,
     page: Annotated[int, Query(ge=1, description="Page number, default 1")] = 1,
     per_page: Annotated[int, Query(ge=1, le=100, description="Page size, default 20, max 100")] = 20,
-    sort: Annotated[str, Query(description="Sort field, default created_at")] = "created_at",
+    sort: Annotated[str, Query(description="Sort field, created_at or relevance (requires q), default created_at")] = "created_at",
     order: Annotated[str, Query(description="Sort order, asc or desc, default desc")] = "desc",
     q: Annotated[str | None, Query(max_length=200, description="Search title or input text")] = None,
     pinned: Annotated[bool | None, Query(description="Filter pinned state")] = None,
+    cursor: Annotated[str | None, Query(max_length=512, description="Opaque cursor from nextCursor; overrides page")] = None,
+    include_total: Annotated[bool, Query(description="Set false to skip the exact total count")] = True,
 ) -> HistoryListResponse:
     service = HistoryService(db)
-    records, total, total_pages = service.list_histories(
+    records, total, total_pages, next_cursor = service.list_histories(
         user_id=current_user.id,
         page=page,
         per_page=per_page,
@@ -85,14 +99,47 @@ async def list_histories(
         order=order,
         q=q,
         pinned=pinned,
+        cursor=cursor,
+        include_total=include_total,
     )
 
+    search = normalize_search_term(q)
     return HistoryListResponse(
-        items=[_detection_to_history_response(record) for record in records],
+        items=[_detection_to_history_response(record, search) for record in records],
         total=total,
         page=page,
         per_page=per_page,
         total_pages=total_pages,
+        next_cursor=next_cursor,
+    )
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Export history records as NDJSON or CSV",
+)
+async def export_histories(
+    db: SessionDep,
+    current_user: ActiveMemberDep,
+    export_format: Annotated[ExportFormat, Query(alias="format", description="ndjson or csv, default ndjson")] = "ndjson",
+    columns: Annotated[str | None, Query(max_length=500, description="Comma-separated columns, default all but inputText")] = None,
+    q: Annotated[str | None, Query(max_length=200, description="Search title or input text")] = None,
+    pinned: Annotated[bool | None, Query(description="Filter pinned state")] = None,
+    gzip: Annotated[bool, Query(description="Gzip the file while it streams")] = False,
+) -> StreamingResponse:
+    names = resolve_columns(columns, HISTORY_EXPORT_COLUMNS, HISTORY_DEFAULT_COLUMNS)
+    stmt = HistoryService(db).export_statement(
+        user_id=current_user.id,
+        columns=[HISTORY_EXPORT_COLUMNS[name] for name in names],
+        q=q,
+        pinned=pinned,
+    )
+    filename = export_filename("aidetector-history", export_format, gzip)
+    return StreamingResponse(
+        stream_export(db, stmt, names, export_format, compress=gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "private, no-cache"},
     )
 
 
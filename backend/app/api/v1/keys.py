@@ -11,6 +11,7 @@ from app.schemas import (
     APIKeySelfTestResponse,
     ErrorResponse,
 )
+from app.services.api_key_cache import api_key_cache
 
 router = APIRouter(prefix="/keys", tags=["api_keys"])
 
@@ -73,6 +74,7 @@ async def deactivate_api_key(
     api_key.status = APIKeyStatus.INACTIVE
     db.add(api_key)
     db.commit()
+    api_key_cache.invalidate(api_key.key_hash)
 
 
 @router.get(
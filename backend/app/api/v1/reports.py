@@ -1,25 +1,63 @@
 from datetime import datetime, timezone
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, Response, status
+from fastapi import APIRouter, Header, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
+from app.core.config import get_settings
 from app.db.deps import ActiveMemberDep, SessionDep
-from app.schemas import ReportPdfContent, ReportPdfRequest
+from app.models.detection import Detection
+from app.schemas import ReportBulkRequest, ReportPdfContent, ReportPdfRequest
 from app.schemas.history import Analysis
 from app.services.history_service import HistoryService
-from app.services.report_pdf import build_report_filename, build_report_pdf
+from app.services.report_bundle import BundleError, stream_report_zip
+from app.services.report_pdf import ReportUser
+from app.services.report_rendering import render_report
 
 router = APIRouter(prefix="/reports", tags=["reports"])
+settings = get_settings()
+
+
+def _build_report_content(detection: Detection, report_type: str, locale: str) -> ReportPdfContent:
+    analysis_raw = (detection.meta_json or {}).get("analysis")
+    if not isinstance(analysis_raw, dict):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail={"code": "REPORT_SOURCE_INVALID", "message": "History analysis is unavailable", "detail": detection.id},
+        )
+
+    try:
+        analysis = Analysis.model_validate(analysis_raw)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail={"code": "REPORT_SOURCE_INVALID", "message": "History analysis is invalid", "detail": detection.id},
+        ) from exc
+
+    return ReportPdfContent(
+        report_type=report_type,
+        generated_at=datetime.now(timezone.utc),
+        locale=locale,
+        history_id=detection.id,
+        detection_id=detection.id,
+        functions=detection.functions_used or ["scan"],
+        input_text=detection.input_text,
+        analysis=analysis,
+    )
 
 
 @router.post(
     "/pdf",
     summary="Export a PDF report",
     status_code=status.HTTP_200_OK,
+    responses={304: {"description": "Not Modified"}},
 )
 async def export_pdf_report(
     payload: ReportPdfRequest,
     db: SessionDep,
     current_user: ActiveMemberDep,
+    if_none_match: Annotated[str | None, Header(alias="If-None-Match")] = None,
 ) -> Response:
     service = HistoryService(db)
     detection = service.get_history(user_id=current_user.id, history_id=payload.history_id)
@@ -29,37 +67,68 @@ async def export_pdf_report(
             detail={"code": "HISTORY_NOT_FOUND", "message": "History record not found", "detail": payload.history_id},
         )
 
-    analysis_raw = (detection.meta_json or {}).get("analysis")
-    if not isinstance(analysis_raw, dict):
+    report_content = _build_report_content(detection, payload.report_type, payload.locale)
+    rendered = await render_report(report_content, ReportUser.from_user(current_user))
+    headers = {
+        "Content-Disposition": f'attachment; filename="{rendered.filename}"',
+        "ETag": rendered.etag,
+        "Cache-Control": "private, no-cache",
+    }
+    if rendered.matches(if_none_match):
+        rendered.discard()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if rendered.body is not None:
+        return Response(content=rendered.body, media_type="application/pdf", headers=headers)
+    # 大报告从临时文件分块发送；客户端中途断开时由后台任务兜底删除文件。
+    return StreamingResponse(
+        rendered.iter_file(),
+        media_type="application/pdf",
+        headers={**headers, "Content-Length": str(rendered.size)},
+        background=BackgroundTask(rendered.discard),
+    )
+
+
+@router.post(
+    "/bulk",
+    summary="Export PDF reports for several history records as a ZIP",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+)
+async def export_bulk_reports(
+    payload: ReportBulkRequest,
+    db: SessionDep,
+    current_user: ActiveMemberDep,
+) -> StreamingResponse:
+    history_ids = list(dict.fromkeys(payload.history_ids))
+    max_items = settings.report_bulk_max_items
+    if len(history_ids) > max_items:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-            detail={"code": "REPORT_SOURCE_INVALID", "message": "History analysis is unavailable", "detail": detection.id},
+            detail={"code": "TOO_MANY_REPORTS", "message": f"At most {max_items} reports per request", "detail": len(history_ids)},
         )
 
-    try:
-        analysis = Analysis.model_validate(analysis_raw)
-    except Exception as exc:
+    # 报告内容在开始流式响应前一次性取好：之后只用 pydantic 对象，不再碰数据库会话。
+    detections = HistoryService(db).get_histories(user_id=current_user.id, ids=history_ids)
+    contents: list[ReportPdfContent] = []
+    errors: list[BundleError] = []
+    for history_id in history_ids:
+        detection = detections.get(history_id)
+        if detection is None:
+            errors.append(BundleError(history_id, "HISTORY_NOT_FOUND", "History record not found"))
+            continue
+        try:
+            contents.append(_build_report_content(detection, payload.report_type, payload.locale))
+        except HTTPException as exc:
+            errors.append(BundleError(history_id, exc.detail["code"], exc.detail["message"]))
+    if not contents:
         raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-            detail={"code": "REPORT_SOURCE_INVALID", "message": "History analysis is invalid", "detail": detection.id},
-        ) from exc
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"code": "HISTORY_NOT_FOUND", "message": "No exportable history records", "detail": history_ids},
+        )
 
-    report_content = ReportPdfContent(
-        report_type=payload.report_type,
-        generated_at=datetime.now(timezone.utc),
-        locale=payload.locale,
-        history_id=detection.id,
-        detection_id=detection.id,
-        functions=detection.functions_used or ["scan"],
-        input_text=detection.input_text,
-        analysis=analysis,
-    )
-    pdf_bytes = build_report_pdf(report_content, current_user)
-    filename = build_report_filename(report_content)
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"',
-        },
+    filename = f"aidetector-reports-{datetime.now(timezone.utc).strftime('%Y-%m-%d-%H-%M-%S')}.zip"
+    return StreamingResponse(
+        stream_report_zip(contents, ReportUser.from_user(current_user), errors),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "private, no-cache"},
     )
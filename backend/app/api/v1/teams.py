@@ -65,7 +65,7 @@ async def add_team_member(
 @router.get(
     "/{team_id}/stats",
     response_model=TeamStatsResponse,
-    summary="按天聚合团队检测次数（仅团队成员可访问）",
+    summary="按天聚合团队检测统计（仅团队成员可访问）",
     responses={
         401: {"model": ErrorResponse},
         403: {"model": ErrorResponse},
@@ -85,5 +85,14 @@ async def get_team_stats(
 
     service = TeamService(db)
     rows = service.get_team_stats(team_id=team_id, user_id=current_user.id, start=start, end=end)
-    items = [TeamStatsItem(day=row.day.date(), detections=row.count) for row in rows]
+    items = [
+        TeamStatsItem(
+            day=row.day,
+            detections=row.detections,
+            chars_used=row.chars_used,
+            average_score=round(row.average_score, 4) if row.average_score is not None else None,
+            label_counts=row.label_counts,
+        )
+        for row in rows
+    ]
     return TeamStatsResponse(team_id=team_id, items=items)
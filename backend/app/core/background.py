@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodic(name: str, interval_seconds: float, job: Callable[[], object]) -> None:
+    """在线程池里按固定间隔执行同步任务，单次失败只记录日志不退出循环。"""
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(job)
+        except Exception as exc:
+            logger.error("Periodic job failed", exc_info=exc, extra={"job": name})
+
+
+def start_periodic(name: str, interval_seconds: float, job: Callable[[], object]) -> asyncio.Task | None:
+    if interval_seconds <= 0:
+        return None
+    return asyncio.create_task(run_periodic(name, interval_seconds, job), name=name)
+
+
+async def stop_tasks(tasks: list[asyncio.Task | None]) -> None:
+    active = [task for task in tasks if task is not None]
+    for task in active:
+        task.cancel()
+    await asyncio.gather(*active, return_exceptions=True)
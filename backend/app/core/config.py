@@ -48,6 +48,41 @@ class Settings(BaseSettings):
     postgres_password: str = Field(default="postgres")
     postgres_db: str = Field(default="aidetector")
     access_token_expire_minutes: int = Field(default=60, ge=1, le=1440)
+    quota_cache_ttl_seconds: int = Field(default=30, ge=0, le=3600)
+    quota_cache_reconcile_seconds: int = Field(default=300, ge=0, le=86400)
+    detection_write_behind: bool = Field(default=False)
+    detection_spool_dir: str = Field(default="var/spool/detections")
+    detection_write_batch_size: int = Field(default=200, ge=1, le=5000)
+    detection_write_flush_seconds: float = Field(default=1.0, gt=0, le=60)
+    list_count_exact_threshold: int = Field(default=10000, ge=0, le=10_000_000)
+    list_count_cache_ttl_seconds: int = Field(default=30, ge=0, le=3600)
+    usage_rollup_rebuild_seconds: int = Field(default=600, ge=0, le=86400)
+    usage_rollup_rebuild_window_hours: int = Field(default=48, ge=1, le=24 * 366)
+    history_counter_reconcile_seconds: int = Field(default=3600, ge=0, le=7 * 86400)
+    admin_overview_cache_ttl_seconds: int = Field(default=30, ge=0, le=3600)
+    admin_overview_stale_seconds: int = Field(default=300, ge=0, le=86400)
+    detection_partition_months_ahead: int = Field(default=3, ge=1, le=24)
+    detection_partition_check_seconds: int = Field(default=86400, ge=0, le=7 * 86400)
+    retention_guest_days: int = Field(default=90, ge=0, le=36500)
+    retention_user_days: int = Field(default=0, ge=0, le=36500)
+    retention_archive_dir: str = Field(default="var/archive/detections")
+    retention_batch_size: int = Field(default=1000, ge=1, le=50000)
+    retention_run_seconds: int = Field(default=3600, ge=0, le=7 * 86400)
+    api_key_cache_ttl_seconds: int = Field(default=30, ge=0, le=3600)
+    api_key_last_used_flush_seconds: float = Field(default=5.0, gt=0, le=300)
+    principal_cache_ttl_seconds: int = Field(default=10, ge=0, le=600)
+    scan_examples_cache_seconds: int = Field(default=300, ge=0, le=86400)
+    file_parse_workers: int = Field(default=2, ge=0, le=32)
+    file_parse_cpu_seconds: int = Field(default=10, ge=0, le=300)
+    file_parse_timeout_seconds: float = Field(default=15.0, gt=0, le=600)
+    file_parse_cache_max_bytes: int = Field(default=32 * 1024 * 1024, ge=0, le=1024 * 1024 * 1024)
+    file_parse_cache_ttl_seconds: int = Field(default=86400, ge=0, le=30 * 86400)
+    report_render_workers: int = Field(default=2, ge=0, le=32)
+    report_cache_max_bytes: int = Field(default=64 * 1024 * 1024, ge=0, le=1024 * 1024 * 1024)
+    report_cache_ttl_seconds: int = Field(default=3600, ge=0, le=7 * 86400)
+    report_inline_max_bytes: int = Field(default=4 * 1024 * 1024, ge=0, le=256 * 1024 * 1024)
+    report_bulk_max_items: int = Field(default=50, ge=1, le=500)
+    export_batch_size: int = Field(default=1000, ge=10, le=50000)
 
     @field_validator("backend_cors_origins", mode="before")
     @classmethod
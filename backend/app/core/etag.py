@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import hashlib
+
+
+def etag_from_digest(hexdigest: str) -> str:
+    return f'"{hexdigest[:32]}"'
+
+
+def strong_etag(body: bytes) -> str:
+    return etag_from_digest(hashlib.sha256(body).hexdigest())
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match 用弱比较（RFC 9110 13.1.2）：忽略 W/ 前缀，支持逗号分隔的多个值和 *。
+    if not if_none_match:
+        return False
+    candidates = {item.strip().removeprefix("W/") for item in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from threading import Lock
+from typing import Any
+
+MetricsProvider = Callable[[], dict[str, Any]]
+
+
+class MetricsRegistry:
+    """进程内指标注册表：各子系统注册一个返回快照的回调，由 admin 接口统一读取。"""
+
+    def __init__(self) -> None:
+        self._providers: dict[str, MetricsProvider] = {}
+        self._lock = Lock()
+
+    def register(self, name: str, provider: MetricsProvider) -> None:
+        with self._lock:
+            self._providers[name] = provider
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            providers = dict(self._providers)
+        return {name: provider() for name, provider in sorted(providers.items())}
+
+
+metrics_registry = MetricsRegistry()
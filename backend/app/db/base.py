@@ -4,6 +4,8 @@ from app.db.base_class import Base  # noqa
 import app.models.user  # noqa: F401
 import app.models.api_key  # noqa: F401
 import app.models.detection  # noqa: F401
+import app.models.history_counter
 import app.models.quota_usage  # noqa: F401
 import app.models.scan_example  # noqa: F401
-import app.models.team  # noqa: F401
+import app.models.team
+import app.models.usage_rollup  # noqa: F401
@@ -12,16 +12,21 @@ from sqlalchemy.orm import Session
 from app.core.config import get_settings
 from app.core.roles import UserRole, has_required_role, normalize_role
 from app.core.security import hash_api_key
-from app.db.session import get_db
-from app.models.api_key import APIKey, APIKeyStatus
+from app.db.session import LazySession, get_db, get_lazy_db
+from app.models.api_key import APIKey
 from app.models.user import User
 from app.schemas import TokenPayload
+from app.services.api_key_cache import CachedAPIKey, api_key_cache, last_used_recorder
+from app.services.principal_cache import principal_cache
 
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 AUTH_COOKIE_NAME = "aid_access_token"
 
 SessionDep = Annotated[Session, Depends(get_db)]
+# 认证依赖只在缓存未命中时才真正创建会话；直接调用时也可以传入现成的 Session。
+AuthSessionDep = Annotated[Session | LazySession, Depends(get_lazy_db)]
+LazySessionDep = Annotated[LazySession, Depends(get_lazy_db)]
 TokenDep = Annotated[str | None, Depends(oauth2_scheme)]
 AuthCookieDep = Annotated[str | None, Cookie(alias=AUTH_COOKIE_NAME)]
 # FastAPI requires the default to be defined outside of Annotated when using Header
@@ -29,27 +34,13 @@ APIKeyHeaderDep = Annotated[str | None, Header(alias="X-API-Key")]
 
 
 def get_current_user(
-    db: SessionDep,
+    db: AuthSessionDep,
     token: TokenDep,
     auth_cookie: AuthCookieDep = None,
     api_key_header: APIKeyHeaderDep = None,
 ) -> User:
     if api_key_header:
-        key_hash = hash_api_key(api_key_header)
-        api_key = db.scalar(
-            select(APIKey).where(APIKey.key_hash == key_hash, APIKey.status == APIKeyStatus.ACTIVE)
-        )
-        if api_key is None or api_key.user is None or not api_key.user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid API key",
-                headers={"WWW-Authenticate": "API-Key"},
-            )
-
-        api_key.last_used_at = datetime.now(timezone.utc)
-        db.add(api_key)
-        db.commit()
-        return api_key.user
+        return _authenticate_api_key(db, api_key_header)
 
     resolved_token = token or auth_cookie
     if resolved_token is None:
@@ -91,7 +82,7 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         ) from exc
 
-    user = db.get(User, user_id)
+    user = _load_user(db, user_id)
     if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -102,6 +93,51 @@ def get_current_user(
     return user
 
 
+def _invalid_api_key() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid API key",
+        headers={"WWW-Authenticate": "API-Key"},
+    )
+
+
+def _session(db: Session | LazySession) -> Session:
+    return db() if isinstance(db, LazySession) else db
+
+
+def _load_user(db: Session | LazySession, user_id: int) -> User | None:
+    user = principal_cache.get(user_id)
+    if user is None:
+        loaded = _session(db).get(User, user_id)
+        if loaded is None:
+            return None
+        user = principal_cache.set(loaded)
+    return user
+
+
+def _authenticate_api_key(db: Session | LazySession, raw_key: str) -> User:
+    key_hash = hash_api_key(raw_key)
+    cached = api_key_cache.get(key_hash)
+    if cached is None:
+        row = _session(db).execute(
+            select(APIKey.id, APIKey.user_id, APIKey.status).where(APIKey.key_hash == key_hash)
+        ).first()
+        if row is None:
+            raise _invalid_api_key()
+        # 只缓存 key 本身；用户的启用状态和角色由 _load_user 经 principal_cache 读取，用户变更提交后即失效。
+        cached = api_key_cache.set(key_hash, CachedAPIKey(key_id=row.id, user_id=row.user_id, status=row.status))
+    if not cached.is_active:
+        raise _invalid_api_key()
+
+    user = _load_user(db, cached.user_id)
+    if user is None or not user.is_active:
+        raise _invalid_api_key()
+
+    # last_used_at 只记在内存里，由后台任务批量写回，只读请求不再开写事务。
+    last_used_recorder.touch(cached.key_id, datetime.now(timezone.utc))
+    return user
+
+
 CurrentUserDep = Annotated[User, Depends(get_current_user)]
 
 
@@ -131,7 +167,7 @@ def _decode_token(token: str) -> TokenPayload:
 
 
 def get_current_actor(
-    db: SessionDep,
+    db: AuthSessionDep,
     token: TokenDep,
     auth_cookie: AuthCookieDep = None,
     api_key_header: APIKeyHeaderDep = None,
@@ -179,7 +215,7 @@ def get_current_actor(
             headers={"WWW-Authenticate": "Bearer"},
         ) from exc
 
-    user = db.get(User, user_id)
+    user = _load_user(db, user_id)
     if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -14,3 +14,29 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, futu
 def get_db() -> Generator[Session, None, None]:
     with SessionLocal() as session:
         yield session
+
+
+class LazySession:
+    """Creates the session on first call, so requests that never touch the database never open one."""
+
+    def __init__(self, factory: sessionmaker = SessionLocal) -> None:
+        self._factory = factory
+        self._session: Session | None = None
+
+    def __call__(self) -> Session:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+def get_lazy_db() -> Generator[LazySession, None, None]:
+    lazy = LazySession()
+    try:
+        yield lazy
+    finally:
+        lazy.close()
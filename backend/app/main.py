@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from http import HTTPStatus
 
@@ -8,21 +9,93 @@ from fastapi.responses import JSONResponse
 
 from app.api import router as api_router
 from app.api.v1.detections import scan_router
-
+from app.core.background import start_periodic, stop_tasks
 from app.core.config import get_settings
 from app.core.logging import configure_logging
+from app.db.session import SessionLocal, engine
 from app.schemas import ErrorResponse, WelcomeResponse
+from app.services.api_key_cache import last_used_recorder
+from app.services.detection_partitions import ensure_detection_partitions
+from app.services.detection_writer import configure_detection_writer
+from app.services.history_counters import reconcile_history_counters
+from app.services.overview_cache import overview_cache
+from app.services.quota_cache import reconcile_quota_counters
+from app.services.report_rendering import report_render_pool
 from app.services.repre_guard_client import repre_guard_client
+from app.services.retention import archive_expired_detections
+from app.services.scan_example_service import seed_scan_examples
+from app.services.team_stats import rebuild_recent_team_stats
+from app.services.usage_rollups import rebuild_recent_usage_rollups
 
 settings = get_settings()
 logger = configure_logging()
 
 
+def _reconcile_quota_counters() -> None:
+    with SessionLocal() as db:
+        reconcile_quota_counters(db)
+
+
+def _rebuild_usage_rollups() -> None:
+    with SessionLocal() as db:
+        rebuild_recent_usage_rollups(db)
+        rebuild_recent_team_stats(db)
+
+
+def _reconcile_history_counters() -> None:
+    with SessionLocal() as db:
+        reconcile_history_counters(db)
+
+
+def _flush_api_key_last_used() -> None:
+    last_used_recorder.flush(SessionLocal)
+
+
+def _ensure_detection_partitions() -> None:
+    ensure_detection_partitions(engine)
+
+
+def _archive_expired_detections() -> None:
+    with SessionLocal() as db:
+        archive_expired_detections(db)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    background_tasks = [
+        start_periodic("quota-counter-reconcile", settings.quota_cache_reconcile_seconds, _reconcile_quota_counters),
+        start_periodic("usage-rollup-rebuild", settings.usage_rollup_rebuild_seconds, _rebuild_usage_rollups),
+        start_periodic("history-counter-reconcile", settings.history_counter_reconcile_seconds, _reconcile_history_counters),
+        start_periodic("detection-partitions", settings.detection_partition_check_seconds, _ensure_detection_partitions),
+        start_periodic("api-key-last-used", settings.api_key_last_used_flush_seconds, _flush_api_key_last_used),
+        start_periodic("detection-retention", settings.retention_run_seconds, _archive_expired_detections),
+    ]
+    overview_cache.configure(SessionLocal)
+    try:
+        await asyncio.to_thread(seed_scan_examples, SessionLocal)
+    except Exception as exc:
+        # 种子数据写不进去时接口仍可返回库里已有的示例，不阻塞启动。
+        logger.error("Scan example seeding failed", exc_info=exc)
+    detection_writer = None
+    if settings.detection_write_behind:
+        detection_writer = configure_detection_writer(
+            SessionLocal,
+            settings.detection_spool_dir,
+            batch_size=settings.detection_write_batch_size,
+            flush_interval=settings.detection_write_flush_seconds,
+        )
+        detection_writer.start()
     try:
         yield
     finally:
+        await stop_tasks(background_tasks)
+        try:
+            await asyncio.to_thread(_flush_api_key_last_used)
+        except Exception as exc:
+            logger.error("Final API key last_used_at flush failed", exc_info=exc)
+        if detection_writer is not None:
+            await asyncio.to_thread(detection_writer.stop)
+        await asyncio.to_thread(report_render_pool.shutdown)
         await repre_guard_client.aclose()
 
 
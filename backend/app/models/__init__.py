@@ -2,8 +2,10 @@
 
 from app.models.api_key import APIKey
 from app.models.detection import Detection
+from app.models.history_counter import UserHistoryCounter
 from app.models.quota_usage import QuotaUsage
+from app.models.usage_rollup import UsageLabelRollup, UsageRollup
 from app.models.user import User
-from app.models.team import Team, TeamMember
+from app.models.team import Team, TeamDailyStat, TeamMember
 
-__all__ = ["APIKey", "Detection", "QuotaUsage", "Team", "TeamMember", "User"]
+__all__ = ["APIKey", "Detection", "QuotaUsage", "Team", "TeamDailyStat", "TeamMember", "UsageLabelRollup", "UsageRollup", "User", "UserHistoryCounter"]
@@ -3,9 +3,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
-from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, String, Text, func, text
+from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, String, Text, event, func, inspect, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -14,29 +14,84 @@ from app.db.types import JSONType
 if TYPE_CHECKING:  # pragma: no cover - 类型检查辅助
     from app.models.user import User
 
+PAYLOAD_GROUP = "payload"
+
+
+def has_displayable_payload(input_text: str | None, meta_json: dict[str, Any] | None) -> bool:
+    """历史列表只展示有原文且带 summary/sentences 分析结果的记录，写入时据此维护 is_displayable。"""
+
+    if not input_text or not input_text.strip():
+        return False
+
+    analysis = (meta_json or {}).get("analysis")
+    if not isinstance(analysis, dict):
+        return False
+
+    return bool(analysis.get("summary") or analysis.get("sentences"))
+
 
 class Detection(Base):
     __tablename__ = "detections"
     __table_args__ = (
         Index("ix_detections_user_id", "user_id"),
-        Index("ix_detections_created_at", "created_at"),
-        Index("ix_detections_actor_type_actor_id", "actor_type", "actor_id"),
+        # 列表按 (排序键, id) 做 keyset 分页，复合索引与排序键一一对应；B-tree 可反向扫描，DESC 同样适用。
+        Index("ix_detections_created_id", "created_at", "id"),
+        Index("ix_detections_actor_created_id", "actor_type", "actor_id", "created_at", "id"),
+        Index("ix_detections_score_id", "score", "id"),
+        Index("ix_detections_chars_used_id", "chars_used", "id"),
         Index("ix_detections_user_pinned_created", "user_id", "is_pinned", "created_at"),
+        Index(
+            "ix_detections_user_displayable_pinned_created",
+            "user_id",
+            "is_displayable",
+            "is_pinned",
+            "created_at",
+        ),
+        # pg_trgm GIN 索引，支撑历史/后台搜索的 ILIKE '%q%'。
+        Index(
+            "ix_detections_input_text_trgm",
+            "input_text",
+            postgresql_using="gin",
+            postgresql_ops={"input_text": "gin_trgm_ops"},
+        ),
+        Index("ix_detections_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index(
+            "ix_detections_actor_id_trgm",
+            "actor_id",
+            postgresql_using="gin",
+            postgresql_ops={"actor_id": "gin_trgm_ops"},
+        ),
     )
 
+    # PostgreSQL 上按 created_at 月度分区，物理主键为 (id, created_at)；id 仍由序列保证唯一。
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
     actor_type: Mapped[str] = mapped_column(String(20), nullable=False, server_default="user")
     actor_id: Mapped[str] = mapped_column(String(64), nullable=False)
     chars_used: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
     title: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    input_text: Mapped[str] = mapped_column(Text, nullable=False)
-    editor_html: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # 原文、编辑器 HTML 和 meta_json（完整 analysis）体积大，列表查询默认不加载；
+    # 详情视图通过 undefer_group(PAYLOAD_GROUP) 一次取回。
+    input_text: Mapped[str] = mapped_column(Text, nullable=False, deferred=True, deferred_group=PAYLOAD_GROUP)
+    editor_html: Mapped[str | None] = mapped_column(Text, nullable=True, deferred=True, deferred_group=PAYLOAD_GROUP)
     functions_used: Mapped[list[str] | None] = mapped_column(JSONType, nullable=True)
     result_label: Mapped[str] = mapped_column(String(50), nullable=False)
     score: Mapped[float] = mapped_column(Float, nullable=False)
     is_pinned: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false"), default=False)
+    is_displayable: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false"), default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    meta_json: Mapped[dict | None] = mapped_column(JSONType, nullable=True)
+    meta_json: Mapped[dict | None] = mapped_column(JSONType, nullable=True, deferred=True, deferred_group=PAYLOAD_GROUP)
 
     user: Mapped["User"] = relationship("User", back_populates="detections")
+
+
+@event.listens_for(Detection, "before_insert")
+def _set_displayable_on_insert(mapper, connection, target: Detection) -> None:
+    target.is_displayable = has_displayable_payload(target.input_text, target.meta_json)
+
+
+@event.listens_for(Detection, "before_update")
+def _refresh_displayable_on_update(mapper, connection, target: Detection) -> None:
+    state = inspect(target)
+    if state.attrs.input_text.history.has_changes() or state.attrs.meta_json.history.has_changes():
+        target.is_displayable = has_displayable_payload(target.input_text, target.meta_json)
@@ -0,0 +1,16 @@
+"""Per-user detection counts behind the history retention cap."""
+
+from __future__ import annotations
+
+from sqlalchemy import ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class UserHistoryCounter(Base):
+    __tablename__ = "user_history_counters"
+
+    # 与 detections 中 user_id 相同的行数同事务维护，create_history 据此判断是否超出上限。
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    records: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
@@ -1,19 +1,26 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
-from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Index, String, UniqueConstraint, func
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import Enum as SqlEnum
 
 from app.db.base_class import Base
 from app.models.user import User
 
-if TYPE_CHECKING:  # pragma: no cover - 类型检查辅助
-    pass
-
 
 class Team(Base):
     __tablename__ = "teams"
@@ -55,3 +62,16 @@ class TeamMember(Base):
 
     team: Mapped[Team] = relationship("Team", back_populates="members")
     user: Mapped["User"] = relationship("User", back_populates="team_memberships")
+
+
+class TeamDailyStat(Base):
+    """按天、按标签累计的团队检测汇总；检测计入作者当前所在且加入时间不晚于检测时间的团队，成员增删时同步调整。"""
+
+    __tablename__ = "team_daily_stats"
+
+    team_id: Mapped[int] = mapped_column(ForeignKey("teams.id", ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    label: Mapped[str] = mapped_column(String(50), primary_key=True)
+    detections: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
+    chars_used: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0", default=0)
+    score_sum: Mapped[float] = mapped_column(Float, nullable=False, server_default="0", default=0.0)
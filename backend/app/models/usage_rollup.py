@@ -0,0 +1,33 @@
+"""Pre-aggregated usage counters behind the admin overview."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+ROLLUP_HOUR = "hour"
+ROLLUP_DAY = "day"
+
+
+class UsageRollup(Base):
+    __tablename__ = "usage_rollups"
+
+    # granularity 为 hour / day，bucket_start 为 UTC 整点或零点。
+    granularity: Mapped[str] = mapped_column(String(8), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    detections: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
+    chars_used: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0", default=0)
+    new_users: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
+
+
+class UsageLabelRollup(Base):
+    __tablename__ = "usage_label_rollups"
+
+    granularity: Mapped[str] = mapped_column(String(8), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    label: Mapped[str] = mapped_column(String(50), primary_key=True)
+    detections: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
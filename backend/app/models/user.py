@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, DateTime, Integer, String, func
+from sqlalchemy import Boolean, DateTime, Index, Integer, String, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import Enum as SqlEnum
 
@@ -18,6 +18,13 @@ class User(Base):
     """用户表模型，邮箱唯一。"""
 
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_id", "created_at", "id"),
+        Index("ix_users_credits_remaining_id", text("(credits_total - credits_used)"), "id"),
+        # pg_trgm GIN 索引，支撑后台用户搜索的 ILIKE '%q%'。
+        Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index("ix_users_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
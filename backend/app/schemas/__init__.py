@@ -32,9 +32,16 @@ from app.schemas.admin import (
 )
 from app.schemas.analysis import AnalysisResponse, Citation, DetectRequest, SentenceAnalysis
 from app.schemas.parse_files import ParseFilesResponse, ParsedFileResult
-from app.schemas.report import ReportPdfContent, ReportPdfRequest
+from app.schemas.report import ReportBulkRequest, ReportPdfContent, ReportPdfRequest
 from app.schemas.scan_example import ScanExamplesResponse, ScanHeroExampleItem, ScanUsageExampleItem
-from app.schemas.detection import DetectionItem, DetectionListResponse, DetectionRequest, DetectionResponse
+from app.schemas.detection import (
+    DetectFileResult,
+    DetectFilesResponse,
+    DetectionItem,
+    DetectionListResponse,
+    DetectionRequest,
+    DetectionResponse,
+)
 from app.schemas.quota import QuotaResponse
 from app.schemas.auth import GuestTokenRequest, LoginRequest, RegisterRequest, Token, TokenPayload
 from app.schemas.responses import DatabasePingResponse, ErrorResponse, HealthResponse, ReadinessResponse, WelcomeResponse
@@ -79,12 +86,15 @@ __all__ = [
     "AnalysisResponse",
     "Citation",
     "GuestTokenRequest",
+    "DetectFileResult",
+    "DetectFilesResponse",
     "DetectionItem",
     "DetectionListResponse",
     "DetectionRequest",
     "DetectionResponse",
     "DetectRequest",
     "QuotaResponse",
+    "ReportBulkRequest",
     "ReportPdfContent",
     "ReportPdfRequest",
     "DatabasePingResponse",
@@ -2,6 +2,7 @@
 
 from datetime import datetime
 from enum import Enum
+from typing import Any
 
 from pydantic import Field
 
@@ -29,6 +30,13 @@ class AdminStatusResponse(SchemaBase):
     message: str = Field(..., json_schema_extra={"example": "admin ok"})
 
 
+class AdminMetricsResponse(SchemaBase):
+    metrics: dict[str, dict[str, Any]] = Field(
+        default_factory=dict,
+        json_schema_extra={"example": {"detection_write_behind": {"queue_depth": 0, "lag_seconds": 0.0}}},
+    )
+
+
 class AdminUserProfile(SchemaBase):
     first_name: str | None = Field(default=None, json_schema_extra={"example": "Jane"})
     surname: str | None = Field(default=None, json_schema_extra={"example": "Doe"})
@@ -72,6 +80,7 @@ class AdminOverviewSummary(SchemaBase):
     new_users: int = Field(..., json_schema_extra={"example": 35})
     detections: int = Field(..., json_schema_extra={"example": 365})
     chars_used: int = Field(..., json_schema_extra={"example": 420000})
+    label_counts: dict[str, int] = Field(default_factory=dict, json_schema_extra={"example": {"ai": 200, "human": 165}})
 
 
 class AdminOverviewSeriesItem(SchemaBase):
@@ -107,7 +116,9 @@ class AdminUserListResponse(SchemaBase):
     items: list[AdminUserListItem]
     page: int = Field(..., json_schema_extra={"example": 1})
     page_size: int = Field(..., json_schema_extra={"example": 20})
-    total: int = Field(..., json_schema_extra={"example": 120})
+    total: int | None = Field(..., json_schema_extra={"example": 120})
+    total_exact: bool | None = Field(default=None, json_schema_extra={"example": True})
+    next_cursor: str | None = Field(default=None, json_schema_extra={"example": "eyJzIjoiY3JlYXRlZEF0In0"})
 
 
 class AdminDetectionMini(SchemaBase):
@@ -153,13 +164,16 @@ class AdminDetectionListItem(SchemaBase):
     chars_used: int = Field(..., json_schema_extra={"example": 1200})
     functions_used: list[str] = Field(default_factory=list, json_schema_extra={"example": ["scan"]})
     created_at: datetime = Field(..., json_schema_extra={"example": "2026-03-19T10:00:00Z"})
+    snippet: str | None = Field(default=None, json_schema_extra={"example": "…a <mark>generated</mark> text…"})
 
 
 class AdminDetectionListResponse(SchemaBase):
     items: list[AdminDetectionListItem]
     page: int = Field(..., json_schema_extra={"example": 1})
     page_size: int = Field(..., json_schema_extra={"example": 20})
-    total: int = Field(..., json_schema_extra={"example": 320})
+    total: int | None = Field(..., json_schema_extra={"example": 320})
+    total_exact: bool | None = Field(default=None, json_schema_extra={"example": True})
+    next_cursor: str | None = Field(default=None, json_schema_extra={"example": "eyJzIjoiY3JlYXRlZEF0In0"})
 
 
 class AdminDetectionDetailResponse(AdminDetectionListItem):
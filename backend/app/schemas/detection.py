@@ -7,6 +7,7 @@ from pydantic import ConfigDict, Field
 
 from app.schemas.base import SchemaBase
 from app.schemas.history import Analysis
+from app.schemas.responses import ErrorResponse
 
 
 class DetectionRequest(SchemaBase):
@@ -78,6 +79,17 @@ class DetectionResponse(SchemaBase):
     )
 
 
+class DetectFileResult(SchemaBase):
+    file_name: str = Field(..., json_schema_extra={"example": "essay.docx"})
+    detection: DetectionResponse | None = Field(default=None, description="Detection result; null when the file failed.")
+    error: ErrorResponse | None = Field(default=None, description="Why this file was not detected.")
+    cached: bool = Field(default=False, description="Extracted text came from the parsed-file cache")
+
+
+class DetectFilesResponse(SchemaBase):
+    results: list[DetectFileResult]
+
+
 class DetectionItem(SchemaBase):
     id: int = Field(..., json_schema_extra={"example": 1})
     label: str = Field(..., json_schema_extra={"example": "ai"})
@@ -115,7 +127,8 @@ class DetectionItem(SchemaBase):
 
 
 class DetectionListResponse(SchemaBase):
-    total: int = Field(..., json_schema_extra={"example": 23})
+    total: int | None = Field(..., json_schema_extra={"example": 23})
     page: int = Field(..., json_schema_extra={"example": 1})
     page_size: int = Field(..., json_schema_extra={"example": 10})
     items: list[DetectionItem]
+    next_cursor: str | None = Field(default=None, json_schema_extra={"example": "eyJzIjoiY3JlYXRlZEF0In0"})
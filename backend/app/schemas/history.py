@@ -93,14 +93,20 @@ class HistoryRecordResponse(SchemaBase):
     editor_html: str | None = Field(None, json_schema_extra={"example": "<p>The quick brown fox...</p>"}, description="Editor HTML content")
     is_pinned: bool = Field(default=False, description="Whether the history record is pinned")
     analysis: Analysis | None = Field(None, description="Analysis result")
+    snippet: str | None = Field(
+        None,
+        json_schema_extra={"example": "…the <mark>quick brown</mark> fox…"},
+        description="HTML-escaped excerpt around the first search match, only set when q is given",
+    )
 
 
 class HistoryListResponse(SchemaBase):
     items: list[HistoryRecordResponse] = Field(..., description="History records")
-    total: int = Field(..., json_schema_extra={"example": 50}, description="Total count")
+    total: int | None = Field(..., json_schema_extra={"example": 50}, description="Total count, null when include_total=false")
     page: int = Field(..., json_schema_extra={"example": 1}, description="Current page")
     per_page: int = Field(..., json_schema_extra={"example": 20}, description="Items per page")
-    total_pages: int = Field(..., json_schema_extra={"example": 3}, description="Total pages")
+    total_pages: int | None = Field(..., json_schema_extra={"example": 3}, description="Total pages, null when include_total=false")
+    next_cursor: str | None = Field(None, description="Cursor for the next page, null on the last page")
 
 
 class BatchDeleteRequest(SchemaBase):
@@ -9,6 +9,8 @@ class ParsedFileResult(SchemaBase):
     file_name: str = Field(..., json_schema_extra={"example": "example.pdf"})
     content: str | None = Field(default=None, json_schema_extra={"example": "Extracted content"})
     error: str | None = Field(default=None, json_schema_extra={"example": "Unsupported file type"})
+    truncated: bool = Field(default=False, description="Content was cut at the detection character limit")
+    cached: bool = Field(default=False, description="Content came from the parsed-file cache")
 
 
 class ParseFilesResponse(SchemaBase):
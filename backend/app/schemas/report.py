@@ -21,6 +21,25 @@ class ReportPdfRequest(SchemaBase):
     history_id: int = Field(..., ge=1, description="Associated history record ID.", json_schema_extra={"example": 12})
 
 
+class ReportBulkRequest(SchemaBase):
+    report_type: Literal["scan", "history"] = Field(
+        default="scan",
+        description="Report source type.",
+        json_schema_extra={"example": "history"},
+    )
+    locale: str = Field(
+        default="zh-CN",
+        description="Report locale.",
+        json_schema_extra={"example": "zh-CN"},
+    )
+    history_ids: list[int] = Field(
+        ...,
+        min_length=1,
+        description="History record IDs to export; at most REPORT_BULK_MAX_ITEMS distinct IDs.",
+        json_schema_extra={"example": [12, 13, 14]},
+    )
+
+
 class ReportPdfContent(SchemaBase):
     report_type: Literal["scan", "history"] = Field(default="scan")
     generated_at: datetime | None = Field(default=None)
@@ -38,6 +38,9 @@ class TeamMemberResponse(SchemaBase):
 class TeamStatsItem(SchemaBase):
     day: date = Field(..., alias="date", json_schema_extra={"example": "2024-01-01"})
     detections: int = Field(..., json_schema_extra={"example": 5})
+    chars_used: int = Field(default=0, json_schema_extra={"example": 6000})
+    average_score: float | None = Field(default=None, json_schema_extra={"example": 0.62})
+    label_counts: dict[str, int] = Field(default_factory=dict, json_schema_extra={"example": {"ai": 3, "human": 2}})
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -1,16 +1,35 @@
 from __future__ import annotations
 
 import logging
+from bisect import bisect_right
+from collections.abc import Sequence
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException, status
-from sqlalchemy import String, cast, func, or_, select
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, String, cast, func, select
+from sqlalchemy.orm import Load, Session
+from sqlalchemy.sql.elements import ColumnElement
 
 from app.core.roles import UserRole
-from app.models.detection import Detection
+from app.models.detection import PAYLOAD_GROUP, Detection
+from app.models.usage_rollup import ROLLUP_DAY, ROLLUP_HOUR
 from app.models.user import User
+from app.services.list_counts import ListTotal, count_list
+from app.services.pagination import (
+    KeysetColumn,
+    invalid_cursor,
+    keyset_order_by,
+    paginate_keyset,
+)
+from app.services.search import (
+    highlight_snippet,
+    normalize_search_term,
+    search_condition,
+    search_rank,
+    snippet_source,
+)
+from app.services.usage_rollups import read_label_counts, read_usage_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +38,7 @@ logger = logging.getLogger(__name__)
 class DetectionWithUser:
     detection: Detection
     user: User | None
+    snippet: str | None = None
 
 
 @dataclass
@@ -39,7 +59,7 @@ class OverviewBucket:
 @dataclass
 class AdminOverviewData:
     period: dict[str, str | datetime]
-    summary: dict[str, int]
+    summary: dict[str, int | dict[str, int]]
     series: list[dict[str, str | int | datetime]]
     recent_users: list[User]
     recent_detections: list[DetectionWithUser]
@@ -56,12 +76,17 @@ class AdminService:
     def get_overview(self, *, preset: str = "week") -> AdminOverviewData:
         period = self._resolve_overview_period(preset)
 
+        series = self._build_series(period=period)
+        rollup_granularity = ROLLUP_HOUR if period.granularity == "hour" else ROLLUP_DAY
         summary = {
             "total_users": self._count_users(),
             "active_users": self._count_users(is_active=True),
-            "new_users": self._count_users(start=period.start, end=period.end),
-            "detections": self._count_detections(start=period.start, end=period.end),
-            "chars_used": self._sum_chars(start=period.start, end=period.end),
+            "new_users": sum(item["new_users"] for item in series),
+            "detections": sum(item["detections"] for item in series),
+            "chars_used": sum(item["chars_used"] for item in series),
+            "label_counts": read_label_counts(
+                self.db, granularity=rollup_granularity, start=period.start, end=period.end
+            ),
         }
 
         recent_users = list(
@@ -77,7 +102,7 @@ class AdminService:
                 "end_at": period.end,
             },
             summary=summary,
-            series=self._build_series(period=period),
+            series=series,
             recent_users=recent_users,
             recent_detections=recent_detections,
         )
@@ -93,17 +118,14 @@ class AdminService:
         plan_tier: str | None = None,
         sort: str = "createdAt",
         order: str = "desc",
-    ) -> tuple[list[User], int]:
+        cursor: str | None = None,
+        include_total: bool = True,
+    ) -> tuple[list[User], ListTotal | None, str | None]:
         query = select(User)
 
-        if search:
-            pattern = f"%{search.strip().lower()}%"
-            query = query.where(
-                or_(
-                    func.lower(User.email).like(pattern),
-                    func.lower(User.name).like(pattern),
-                )
-            )
+        term = normalize_search_term(search)
+        if term:
+            query = query.where(search_condition([User.email, User.name], term))
 
         if system_role is not None:
             query = query.where(User.role == system_role)
@@ -112,12 +134,27 @@ class AdminService:
         if plan_tier:
             query = query.where(User.plan_tier == plan_tier)
 
-        total = self._count_from_query(query)
-        order_by = self._resolve_user_sort(sort=sort, order=order)
-        records = list(
-            self.db.scalars(query.order_by(order_by).offset((page - 1) * page_size).limit(page_size)).all()
+        total = None
+        if include_total:
+            filters = (term.lower() if term else None, system_role, is_active, plan_tier)
+            total = count_list(
+                self.db,
+                query,
+                cache_key=("admin_users", filters),
+                table_name="users" if not any(value is not None for value in filters) else None,
+            )
+        rank = search_rank(self.db, [(User.email, 1.0), (User.name, 1.0)], term) if term and sort == "relevance" else None
+        records, next_cursor = self._paginate(
+            query,
+            self._resolve_user_sort(sort=sort, order=order),
+            rank=rank,
+            cursor=cursor,
+            page=page,
+            page_size=page_size,
+            sort=sort,
+            order=order,
         )
-        return records, total
+        return records, total, next_cursor
 
     def get_user(self, user_id: int) -> User | None:
         return self.db.get(User, user_id)
@@ -198,18 +235,112 @@ class AdminService:
         date_to: datetime | None = None,
         sort: str = "createdAt",
         order: str = "desc",
-    ) -> tuple[list[DetectionWithUser], int]:
+        cursor: str | None = None,
+        include_total: bool = True,
+    ) -> tuple[list[DetectionWithUser], ListTotal | None, str | None]:
         query = select(Detection, User).outerjoin(User, Detection.user_id == User.id)
+        term = normalize_search_term(search)
+        query = self._filter_detections(
+            query,
+            term=term,
+            user_id=user_id,
+            actor_type=actor_type,
+            label=label,
+            function_name=function_name,
+            date_from=date_from,
+            date_to=date_to,
+        )
+
+        total = None
+        if include_total:
+            filters = (
+                term.lower() if term else None,
+                user_id,
+                actor_type or None,
+                label or None,
+                function_name or None,
+                date_from.isoformat() if date_from else None,
+                date_to.isoformat() if date_to else None,
+            )
+            total = count_list(
+                self.db,
+                query,
+                cache_key=("admin_detections", filters),
+                table_name="detections" if not any(value is not None for value in filters) else None,
+            )
+        rank = None
+        if term and sort == "relevance":
+            weighted = [(Detection.input_text, 1.0), (Detection.actor_id, 0.6), (User.email, 0.6), (User.name, 0.6)]
+            rank = search_rank(self.db, weighted, term)
+        if term:
+            # 只取命中位置附近的片段，列表查询仍然不加载整段原文。
+            excerpt, offset, total_length = snippet_source(self.db, Detection.input_text, term)
+            query = query.add_columns(
+                excerpt.label("snippet_source"),
+                offset.label("snippet_offset"),
+                total_length.label("snippet_total_length"),
+            )
+        rows, next_cursor = self._paginate(
+            query,
+            self._resolve_detection_sort(sort=sort, order=order),
+            rank=rank,
+            cursor=cursor,
+            page=page,
+            page_size=page_size,
+            sort=sort,
+            order=order,
+            scalars=False,
+        )
+        return [
+            DetectionWithUser(
+                detection=row[0],
+                user=row[1],
+                snippet=highlight_snippet(row[2], term, offset=row[3], total_length=row[4]) if term else None,
+            )
+            for row in rows
+        ], total, next_cursor
 
-        if search:
-            pattern = f"%{search.strip().lower()}%"
+    def export_detections_statement(
+        self,
+        columns: Sequence[ColumnElement],
+        *,
+        search: str | None = None,
+        user_id: int | None = None,
+        actor_type: str | None = None,
+        label: str | None = None,
+        function_name: str | None = None,
+        date_from: datetime | None = None,
+        date_to: datetime | None = None,
+    ) -> Select:
+        """Same filters as :meth:`list_detections`, without count or paging; rows come in id order."""
+        query = select(*columns).select_from(Detection).outerjoin(User, Detection.user_id == User.id)
+        query = self._filter_detections(
+            query,
+            term=normalize_search_term(search),
+            user_id=user_id,
+            actor_type=actor_type,
+            label=label,
+            function_name=function_name,
+            date_from=date_from,
+            date_to=date_to,
+        )
+        return query.order_by(Detection.id)
+
+    @staticmethod
+    def _filter_detections(
+        query: Select,
+        *,
+        term: str | None,
+        user_id: int | None,
+        actor_type: str | None,
+        label: str | None,
+        function_name: str | None,
+        date_from: datetime | None,
+        date_to: datetime | None,
+    ) -> Select:
+        if term:
             query = query.where(
-                or_(
-                    func.lower(Detection.input_text).like(pattern),
-                    func.lower(Detection.actor_id).like(pattern),
-                    func.lower(func.coalesce(User.email, "")).like(pattern),
-                    func.lower(func.coalesce(User.name, "")).like(pattern),
-                )
+                search_condition([Detection.input_text, Detection.actor_id, User.email, User.name], term)
             )
         if user_id is not None:
             query = query.where(Detection.user_id == user_id)
@@ -223,15 +354,14 @@ class AdminService:
             query = query.where(Detection.created_at >= date_from)
         if date_to is not None:
             query = query.where(Detection.created_at <= date_to)
-
-        total = self._count_from_query(query)
-        order_by = self._resolve_detection_sort(sort=sort, order=order)
-        rows = self.db.execute(query.order_by(order_by).offset((page - 1) * page_size).limit(page_size)).all()
-        return [DetectionWithUser(detection=row[0], user=row[1]) for row in rows], total
+        return query
 
     def get_detection(self, detection_id: int) -> DetectionWithUser | None:
         row = self.db.execute(
-            select(Detection, User).outerjoin(User, Detection.user_id == User.id).where(Detection.id == detection_id)
+            select(Detection, User)
+            .options(Load(Detection).undefer_group(PAYLOAD_GROUP))
+            .outerjoin(User, Detection.user_id == User.id)
+            .where(Detection.id == detection_id)
         ).first()
         if row is None:
             return None
@@ -247,30 +377,21 @@ class AdminService:
 
     def _build_series(self, *, period: OverviewPeriodWindow) -> list[dict[str, str | int | datetime]]:
         buckets = self._build_buckets(start=period.start, end=period.end, granularity=period.granularity)
-        user_counts = {bucket.start: 0 for bucket in buckets}
-        detection_counts = {bucket.start: 0 for bucket in buckets}
-        chars_by_bucket = {bucket.start: 0 for bucket in buckets}
-
-        user_rows = self.db.scalars(
-            select(User.created_at).where(User.created_at >= period.start, User.created_at < period.end)
-        ).all()
-        detection_rows = self.db.execute(
-            select(Detection.created_at, Detection.chars_used).where(
-                Detection.created_at >= period.start,
-                Detection.created_at < period.end,
-            )
-        ).all()
-
-        for created_at in user_rows:
-            bucket = self._find_bucket(self._ensure_utc(created_at), buckets)
-            if bucket is not None:
-                user_counts[bucket.start] += 1
-
-        for created_at, chars_used in detection_rows:
-            bucket = self._find_bucket(self._ensure_utc(created_at), buckets)
-            if bucket is not None:
-                detection_counts[bucket.start] += 1
-                chars_by_bucket[bucket.start] += int(chars_used or 0)
+        bucket_starts = [bucket.start for bucket in buckets]
+        user_counts = dict.fromkeys(bucket_starts, 0)
+        detection_counts = dict.fromkeys(bucket_starts, 0)
+        chars_by_bucket = dict.fromkeys(bucket_starts, 0)
+
+        # 只读预聚合表：today 用小时行，其余预设用天行再归并到周/月桶，行数与明细量无关。
+        rollup_granularity = ROLLUP_HOUR if period.granularity == "hour" else ROLLUP_DAY
+        for rollup in read_usage_rollups(self.db, granularity=rollup_granularity, start=period.start, end=period.end):
+            index = bisect_right(bucket_starts, self._ensure_utc(rollup.bucket_start)) - 1
+            if index < 0:
+                continue
+            key = bucket_starts[index]
+            user_counts[key] += rollup.new_users
+            detection_counts[key] += rollup.detections
+            chars_by_bucket[key] += int(rollup.chars_used)
 
         return [
             {
@@ -307,12 +428,6 @@ class AdminService:
 
         return buckets
 
-    def _find_bucket(self, value: datetime, buckets: list[OverviewBucket]) -> OverviewBucket | None:
-        for bucket in buckets:
-            if bucket.start <= value < bucket.end:
-                return bucket
-        return None
-
     def _list_recent_detections(self, *, limit: int) -> list[DetectionWithUser]:
         rows = self.db.execute(
             select(Detection, User)
@@ -322,59 +437,68 @@ class AdminService:
         ).all()
         return [DetectionWithUser(detection=row[0], user=row[1]) for row in rows]
 
-    def _count_users(
-        self,
-        *,
-        is_active: bool | None = None,
-        start: datetime | None = None,
-        end: datetime | None = None,
-    ) -> int:
+    def _count_users(self, *, is_active: bool | None = None) -> int:
         stmt = select(func.count(User.id))
         if is_active is not None:
             stmt = stmt.where(User.is_active.is_(is_active))
-        if start is not None:
-            stmt = stmt.where(User.created_at >= start)
-        if end is not None:
-            stmt = stmt.where(User.created_at < end)
-        return int(self.db.scalar(stmt) or 0)
-
-    def _count_detections(self, *, start: datetime | None = None, end: datetime | None = None) -> int:
-        stmt = select(func.count(Detection.id))
-        if start is not None:
-            stmt = stmt.where(Detection.created_at >= start)
-        if end is not None:
-            stmt = stmt.where(Detection.created_at < end)
-        return int(self.db.scalar(stmt) or 0)
-
-    def _sum_chars(self, *, start: datetime | None = None, end: datetime | None = None) -> int:
-        stmt = select(func.coalesce(func.sum(Detection.chars_used), 0))
-        if start is not None:
-            stmt = stmt.where(Detection.created_at >= start)
-        if end is not None:
-            stmt = stmt.where(Detection.created_at < end)
         return int(self.db.scalar(stmt) or 0)
 
-    def _count_from_query(self, query) -> int:
-        return int(self.db.scalar(select(func.count()).select_from(query.subquery())) or 0)
+    def _paginate(
+        self,
+        query,
+        keys: list[KeysetColumn],
+        *,
+        rank,
+        cursor: str | None,
+        page: int,
+        page_size: int,
+        sort: str,
+        order: str,
+        scalars: bool = True,
+    ) -> tuple[list, str | None]:
+        if rank is not None:
+            # 相关度排序没有稳定的游标键，只支持 page 偏移。
+            if cursor:
+                raise invalid_cursor("cursor is not supported for relevance sort")
+            statement = query.order_by(rank.desc(), *(keyset_order_by(self.db, key) for key in keys))
+            statement = statement.offset((page - 1) * page_size).limit(page_size)
+            result = self.db.scalars(statement) if scalars else self.db.execute(statement)
+            return list(result.all()), None
+
+        if not cursor:
+            query = query.offset((page - 1) * page_size)
+        result = paginate_keyset(
+            self.db,
+            query,
+            keys,
+            cursor=cursor,
+            limit=page_size,
+            sort=sort,
+            order=order,
+            scalars=scalars,
+        )
+        return result.rows, result.next_cursor
 
-    def _resolve_user_sort(self, *, sort: str, order: str):
+    def _resolve_user_sort(self, *, sort: str, order: str) -> list[KeysetColumn]:
         credits_remaining = User.credits_total - User.credits_used
         mapping = {
-            "createdAt": User.created_at,
-            "email": User.email,
-            "creditsRemaining": credits_remaining,
+            "createdAt": (User.created_at, lambda user: user.created_at),
+            "email": (User.email, lambda user: user.email),
+            "creditsRemaining": (credits_remaining, lambda user: user.credits_total - user.credits_used),
         }
-        column = mapping.get(sort, User.created_at)
-        return column.asc() if order == "asc" else column.desc()
+        expression, getter = mapping.get(sort, mapping["createdAt"])
+        descending = order != "asc"
+        return [KeysetColumn(expression, descending, getter), KeysetColumn(User.id, descending, lambda user: user.id)]
 
-    def _resolve_detection_sort(self, *, sort: str, order: str):
+    def _resolve_detection_sort(self, *, sort: str, order: str) -> list[KeysetColumn]:
         mapping = {
-            "createdAt": Detection.created_at,
-            "score": Detection.score,
-            "charsUsed": Detection.chars_used,
+            "createdAt": (Detection.created_at, lambda row: row[0].created_at),
+            "score": (Detection.score, lambda row: row[0].score),
+            "charsUsed": (Detection.chars_used, lambda row: row[0].chars_used),
         }
-        column = mapping.get(sort, Detection.created_at)
-        return column.asc() if order == "asc" else column.desc()
+        expression, getter = mapping.get(sort, mapping["createdAt"])
+        descending = order != "asc"
+        return [KeysetColumn(expression, descending, getter), KeysetColumn(Detection.id, descending, lambda row: row[0].id)]
 
     def _resolve_overview_period(self, preset: str) -> OverviewPeriodWindow:
         today_start = self._day_start()
@@ -0,0 +1,146 @@
+"""Per-worker cache for ``X-API-Key`` authentication.
+
+``get_current_user`` used to select the key by hash and commit a
+``last_used_at`` write on every API-key request. Key lookups are now cached for
+``API_KEY_CACHE_TTL_SECONDS`` (deactivating a key evicts it in the worker that
+handled the request; other workers pick it up when the TTL expires). Only the
+key itself is cached: the owner's ``is_active`` and role are read through the
+principal cache, which drops a user as soon as a change to it commits.
+``last_used_at`` is collected in memory and written in one statement every
+``API_KEY_LAST_USED_FLUSH_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import metrics_registry
+from app.models.api_key import APIKey, APIKeyStatus
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CachedAPIKey:
+    key_id: int
+    user_id: int
+    status: APIKeyStatus
+
+    @property
+    def is_active(self) -> bool:
+        return self.status == APIKeyStatus.ACTIVE
+
+
+class APIKeyCache:
+    def __init__(self) -> None:
+        self._entries: dict[str, tuple[CachedAPIKey, float]] = {}
+        self._lock = Lock()
+        self._counters = dict.fromkeys(("hits", "misses", "invalidations"), 0)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.api_key_cache_ttl_seconds > 0
+
+    def get(self, key_hash: str) -> CachedAPIKey | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None or entry[1] <= monotonic():
+                self._entries.pop(key_hash, None)
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def set(self, key_hash: str, value: CachedAPIKey) -> CachedAPIKey:
+        # 只缓存库里存在的 key（含已禁用的），随机伪造的 key 不会撑大缓存。
+        if self.enabled:
+            with self._lock:
+                self._entries[key_hash] = (value, monotonic() + settings.api_key_cache_ttl_seconds)
+        return value
+
+    def invalidate(self, key_hash: str) -> None:
+        with self._lock:
+            self._entries.pop(key_hash, None)
+            self._counters["invalidations"] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+
+class LastUsedRecorder:
+    """Coalesces ``api_keys.last_used_at`` writes; only the latest timestamp per key is kept."""
+
+    def __init__(self) -> None:
+        self._pending: dict[int, datetime] = {}
+        self._lock = Lock()
+        self._counters = dict.fromkeys(("touches", "flushes", "rows_written"), 0)
+
+    def touch(self, key_id: int, used_at: datetime) -> None:
+        with self._lock:
+            current = self._pending.get(key_id)
+            if current is None or used_at > current:
+                self._pending[key_id] = used_at
+            self._counters["touches"] += 1
+
+    def flush(self, session_factory: Callable[[], Session]) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = APIKey.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("key_id"))
+            .where(or_(table.c.last_used_at.is_(None), table.c.last_used_at < bindparam("used_at")))
+            .values(last_used_at=bindparam("used_at"))
+        )
+        params = [{"key_id": key_id, "used_at": used_at} for key_id, used_at in sorted(pending.items())]
+        try:
+            with session_factory() as db:
+                db.connection().execute(stmt, params)
+                db.commit()
+        except Exception:
+            # 写失败时放回队列，下一轮重试；期间新的使用时间更晚则以新的为准。
+            with self._lock:
+                for key_id, used_at in pending.items():
+                    current = self._pending.get(key_id)
+                    if current is None or used_at > current:
+                        self._pending[key_id] = used_at
+            raise
+        with self._lock:
+            self._counters["flushes"] += 1
+            self._counters["rows_written"] += len(params)
+        return len(params)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "pending": len(self._pending)}
+
+
+api_key_cache = APIKeyCache()
+last_used_recorder = LastUsedRecorder()
+metrics_registry.register("api_key_auth", lambda: {**api_key_cache.stats(), **last_used_recorder.stats()})
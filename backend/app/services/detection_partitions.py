@@ -0,0 +1,232 @@
+"""Monthly range partitions of ``detections`` (PostgreSQL only).
+
+Migration ``20240923_0019`` turns ``detections`` into a table partitioned by
+``created_at``. A periodic job keeps ``DETECTION_PARTITION_MONTHS_AHEAD``
+future months created so that inserts never fall into ``detections_default``;
+a month whose rows already landed there is created empty, filled from the
+default partition and attached in one transaction. Old months are removed with
+:func:`detach_detection_partitions`, a metadata operation instead of a large
+``DELETE``; the month's usage rollups, team stats and history counters are
+subtracted in the same transaction, since no ORM hook sees those rows go.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Connection, func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import get_settings
+from app.models.detection import Detection
+from app.models.team import TeamDailyStat, TeamMember
+from app.services.history_counters import apply_history_deltas
+from app.services.usage_rollups import (
+    GRANULARITIES,
+    UsageDeltas,
+    apply_increments,
+    apply_usage_deltas,
+    bucket_start,
+    ensure_utc,
+    notify_usage_changed,
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+PARENT_TABLE = "detections"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_NAME_RE = re.compile(r"^detections_p(\d{4})(\d{2})$")
+LIST_PARTITIONS_SQL = text(
+    """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = :parent
+    """
+)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.month - 1 + months
+    return date(value.year + index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+
+def month_range(month: date) -> tuple[datetime, datetime]:
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end_month = add_months(month, 1)
+    return start, datetime(end_month.year, end_month.month, 1, tzinfo=timezone.utc)
+
+
+def partition_month(name: str) -> date | None:
+    match = PARTITION_NAME_RE.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def is_partitioned(engine: Engine) -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": PARENT_TABLE})
+        return kind.scalar() == "p"
+
+
+def list_detection_partitions(engine: Engine) -> list[str]:
+    with engine.connect() as conn:
+        return sorted(conn.execute(LIST_PARTITIONS_SQL, {"parent": PARENT_TABLE}).scalars())
+
+
+def ensure_detection_partitions(engine: Engine, *, months_ahead: int | None = None, today: date | None = None) -> list[str]:
+    """Create missing partitions from the current month up to ``months_ahead`` months ahead."""
+
+    if not is_partitioned(engine):
+        return []
+    months_ahead = settings.detection_partition_months_ahead if months_ahead is None else months_ahead
+    current = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    existing = set(list_detection_partitions(engine))
+
+    created: list[str] = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        try:
+            with engine.begin() as conn:
+                # 建分区需要父表上的排他锁；拿不到就等下一轮，不在长查询后面排队阻塞写入。
+                conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+                _create_partition(conn, month)
+        except SQLAlchemyError:
+            logger.exception("Could not create detection partition", extra={"partition": name})
+            continue
+        created.append(name)
+    if created:
+        logger.info("Created detection partitions", extra={"partitions": created})
+    return created
+
+
+def _create_partition(conn: Connection, month: date) -> None:
+    name = partition_name(month)
+    start, end = month_range(month)
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    stranded = 0
+    if conn.execute(text("SELECT to_regclass(:table)"), {"table": DEFAULT_PARTITION}).scalar() is not None:
+        stranded = conn.execute(
+            text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end"),
+            {"start": start, "end": end},
+        ).scalar()
+    if not stranded:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}"))
+        return
+
+    # 兜底分区里已有这个月的行时直接 PARTITION OF 会失败：先建独立表，把行挪过去再挂上。
+    # 行只是换了分区，用量和计数不变。
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+    conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"start": start, "end": end},
+    )
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    logger.warning(
+        "Moved detections out of the default partition",
+        extra={"partition": name, "rows": stranded},
+    )
+
+
+def _subtract_month_aggregates(conn: Connection, month: date) -> None:
+    """Remove the month's detections from usage rollups, team stats and history counters."""
+
+    start, end = month_range(month)
+    detections = Detection.__table__
+    in_month = (detections.c.created_at >= start, detections.c.created_at < end)
+
+    usage = UsageDeltas()
+    hour = func.date_trunc("hour", detections.c.created_at, "UTC")
+    usage_rows = conn.execute(
+        select(hour, detections.c.result_label, func.count(), func.coalesce(func.sum(detections.c.chars_used), 0))
+        .where(*in_month)
+        .group_by(hour, detections.c.result_label)
+    )
+    for bucket, label, count, chars in usage_rows:
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(ensure_utc(bucket), granularity))
+            usage.usage[key][0] -= int(count)
+            usage.usage[key][1] -= int(chars)
+            usage.labels[(*key, label)] -= int(count)
+    apply_usage_deltas(conn, usage)
+
+    members = TeamMember.__table__
+    day = func.date(func.timezone("UTC", detections.c.created_at))
+    team_rows = conn.execute(
+        select(
+            members.c.team_id,
+            day,
+            detections.c.result_label,
+            func.count(),
+            func.coalesce(func.sum(detections.c.chars_used), 0),
+            func.coalesce(func.sum(detections.c.score), 0.0),
+        )
+        .select_from(detections.join(members, members.c.user_id == detections.c.user_id))
+        .where(*in_month, members.c.joined_at <= detections.c.created_at)
+        .group_by(members.c.team_id, day, detections.c.result_label)
+        .order_by(members.c.team_id, day, detections.c.result_label)
+    )
+    apply_increments(
+        conn,
+        TeamDailyStat.__table__,
+        [
+            {"team_id": team_id, "day": stat_day, "label": label, "detections": -count, "chars_used": -chars, "score_sum": -score}
+            for team_id, stat_day, label, count, chars, score in team_rows
+        ],
+        ["team_id", "day", "label"],
+        ["detections", "chars_used", "score_sum"],
+    )
+
+    user_rows = conn.execute(
+        select(detections.c.user_id, func.count())
+        .where(*in_month, detections.c.user_id.is_not(None))
+        .group_by(detections.c.user_id)
+    )
+    apply_history_deltas(conn, {user_id: -count for user_id, count in user_rows})
+
+
+def detach_detection_partitions(engine: Engine, *, before: date, drop: bool = False) -> list[str]:
+    """Detach (and optionally drop) monthly partitions that end on or before ``before``.
+
+    ``DETACH PARTITION ... CONCURRENTLY`` is rejected while the table has a default
+    partition, so each month is detached in its own short transaction instead;
+    ``lock_timeout`` keeps it from queueing behind long queries and blocking writes.
+    """
+
+    if not is_partitioned(engine):
+        return []
+    detached: list[str] = []
+    for name in list_detection_partitions(engine):
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > before:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            # 先扣减汇总再摘分区，两者同一事务提交；扣减失败时分区保持挂载。
+            _subtract_month_aggregates(conn, month)
+            conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+        detached.append(name)
+    if detached:
+        notify_usage_changed()
+        logger.info("Detached detection partitions", extra={"partitions": detached, "dropped": drop})
+    return detached
@@ -1,13 +1,34 @@
 from __future__ import annotations
 
+import logging
 from collections.abc import Mapping
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Any
 
-from sqlalchemy import func, select
-from sqlalchemy.orm import Session
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, undefer
 
-from app.models.detection import Detection
+from app.models.detection import Detection, has_displayable_payload
+from app.services.detection_writer import get_detection_writer
+from app.services.pagination import KeysetColumn, paginate_keyset
+
+logger = logging.getLogger(__name__)
+
+PENDING_SPOOL_KEY = "detection_spool_pending"
+
+
+def _spool_pending_detections(session: Session) -> None:
+    for writer, row in session.info.pop(PENDING_SPOOL_KEY, None) or []:
+        try:
+            writer.enqueue(row)
+        except Exception as exc:
+            # 事务已经提交，这里再抛异常只会让调用方误以为请求失败。
+            logger.error("Failed to spool committed detection", exc_info=exc, extra={"detection_id": row.get("id")})
+
+
+def _discard_pending_detections(session: Session) -> None:
+    session.info.pop(PENDING_SPOOL_KEY, None)
 
 
 @dataclass
@@ -88,6 +109,7 @@ class DetectionService:
         actor_id: str | None = None,
         chars_used: int | None = None,
         analysis: dict[str, Any] | None = None,
+        write_behind: bool = False,
     ) -> Detection:
         # 如果外部没传，用启发式兜底
         if score is None or label is None:
@@ -122,6 +144,10 @@ class DetectionService:
             meta_json=merged_meta,
         )
 
+        writer = get_detection_writer() if write_behind else None
+        if writer is not None and writer.accepts(self.db):
+            return self._enqueue_detection(writer, detection, commit=commit)
+
         self.db.add(detection)
         if commit:
             self.db.commit()
@@ -131,6 +157,24 @@ class DetectionService:
             self.db.refresh(detection)
         return detection
 
+    def _enqueue_detection(self, writer, detection: Detection, *, commit: bool) -> Detection:
+        # id 先从序列里取出，行本身交给后台批量写入。
+        detection.id = writer.allocate_id(self.db)
+        detection.created_at = datetime.now(timezone.utc)
+        if detection.is_pinned is None:
+            detection.is_pinned = False
+        # 不经过 flush，before_insert 钩子不会触发，这里手动维护展示标记。
+        detection.is_displayable = has_displayable_payload(detection.input_text, detection.meta_json)
+        row = {column.key: getattr(detection, column.key) for column in Detection.__table__.columns}
+        # 配额扣减提交成功后才写 spool；提交失败或回滚时这条检测记录随之丢弃，不会出现未计费的记录。
+        if not event.contains(self.db, "after_commit", _spool_pending_detections):
+            event.listen(self.db, "after_commit", _spool_pending_detections)
+            event.listen(self.db, "after_rollback", _discard_pending_detections)
+        self.db.info.setdefault(PENDING_SPOOL_KEY, []).append((writer, row))
+        if commit:
+            self.db.commit()
+        return detection
+
     def list_detections(
         self,
         actor_type: str,
@@ -139,7 +183,9 @@ class DetectionService:
         page_size: int,
         from_time: Any | None,
         to_time: Any | None,
-    ) -> tuple[list[Detection], int]:
+        cursor: str | None = None,
+        include_total: bool = True,
+    ) -> tuple[list[Detection], int | None, str | None]:
         query = select(Detection).where(
             Detection.actor_type == actor_type,
             Detection.actor_id == actor_id,
@@ -150,8 +196,24 @@ class DetectionService:
         if to_time:
             query = query.where(Detection.created_at <= to_time)
 
-        total = self.db.scalar(select(func.count()).select_from(query.subquery())) or 0
-
-        paginated_query = query.order_by(Detection.created_at.desc()).offset((page - 1) * page_size).limit(page_size)
-        records = self.db.scalars(paginated_query).all()
-        return records, total
+        total = None
+        if include_total:
+            total = self.db.scalar(select(func.count()).select_from(query.subquery())) or 0
+
+        # 走 (actor_type, actor_id, created_at, id) 复合索引；没有 cursor 时兼容旧的 page 偏移。
+        keys = [
+            KeysetColumn(Detection.created_at, True, lambda record: record.created_at),
+            KeysetColumn(Detection.id, True, lambda record: record.id),
+        ]
+        if not cursor:
+            query = query.offset((page - 1) * page_size)
+        result = paginate_keyset(
+            self.db,
+            query.options(undefer(Detection.input_text), undefer(Detection.meta_json)),
+            keys,
+            cursor=cursor,
+            limit=page_size,
+            sort="createdAt",
+            order="desc",
+        )
+        return result.rows, total, result.next_cursor
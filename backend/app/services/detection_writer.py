@@ -0,0 +1,364 @@
+"""Opt-in write-behind persistence for detection records.
+
+``/detect`` pre-allocates the detection id from ``detections_id_seq`` and hands
+the row to this writer instead of inserting it inline. Every row is appended to
+a local spool file (fsync'd) once the request transaction has committed, so a
+crash between the response and the batch insert does not lose records: spool
+files left behind by a dead worker are replayed on the next start. Inserts are
+idempotent (``ON CONFLICT (id) DO NOTHING``) because ids are allocated up front.
+Rows the database rejects permanently are moved to a dead-letter file instead
+of blocking the rest of their segment.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+from time import monotonic
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics_registry
+from app.models.detection import Detection
+from app.services.history_counters import apply_history_deltas, history_deltas
+from app.services.team_stats import apply_team_stat_rows
+from app.services.usage_rollups import (
+    apply_usage_deltas,
+    detection_deltas,
+    mark_usage_changed,
+)
+
+try:  # pragma: no cover - Windows 本地开发环境没有 fcntl
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DETECTION_ID_SEQUENCE = "detections_id_seq"
+SPOOL_SUFFIX = ".spool"
+SEGMENT_SUFFIX = ".segment"
+LOCK_SUFFIX = ".lock"
+LOCK_TEMP_SUFFIX = ".locktmp"
+DEAD_LETTER_SUFFIX = ".deadletter"
+
+
+def _encode_row(row: dict[str, Any]) -> str:
+    payload = dict(row)
+    created_at = payload.get("created_at")
+    if isinstance(created_at, datetime):
+        payload["created_at"] = created_at.isoformat()
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode_row(line: str) -> dict[str, Any]:
+    row = json.loads(line)
+    if isinstance(row.get("created_at"), str):
+        row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
+
+
+def _read_rows(path: Path) -> list[dict[str, Any]]:
+    rows: list[dict[str, Any]] = []
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(_decode_row(line))
+            except ValueError:
+                # 崩溃时最后一行可能只写了一半，丢弃这一行即可：对应请求没有拿到响应。
+                logger.warning("Skipping truncated spool line", extra={"path": str(path)})
+    return rows
+
+
+class DetectionWriteBehind:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        spool_dir: str | Path,
+        *,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.session_factory = session_factory
+        self.spool_dir = Path(spool_dir)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(flush_interval, 0.05)
+        self.owner = f"{os.getpid()}-{uuid4().hex[:8]}"
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._spool_handle = None
+        self._lock_handle = None
+        self._segment_seq = 0
+
+        self._queued: list[tuple[float, dict[str, Any]]] = []
+        self._segments: dict[Path, list[tuple[float, dict[str, Any]]]] = {}
+
+        self.written_total = 0
+        self.enqueued_total = 0
+        self.failed_batches = 0
+        self.recovered_rows = 0
+        self.dead_lettered_rows = 0
+        self.last_flush_at: datetime | None = None
+        self.last_error: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def accepts(self, db: Session) -> bool:
+        return self.running and db.get_bind().dialect.name == "postgresql"
+
+    def allocate_id(self, db: Session) -> int:
+        return int(db.scalar(select(func.nextval(DETECTION_ID_SEQUENCE))))
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        # 先在临时文件上拿到锁再改名，其他 worker 看到的 .lock 文件一定已经被持有。
+        temp_lock_path = self.spool_dir / f"{self.owner}{LOCK_TEMP_SUFFIX}"
+        self._lock_handle = temp_lock_path.open("w")
+        if fcntl is not None:
+            fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_EX)
+        temp_lock_path.rename(self.spool_dir / f"{self.owner}{LOCK_SUFFIX}")
+        self._adopt_orphaned_files()
+        self._spool_handle = self._spool_path().open("a", encoding="utf-8")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="detection-write-behind", daemon=True)
+        self._thread.start()
+        logger.info("Detection write-behind started", extra={"spool_dir": str(self.spool_dir), "owner": self.owner})
+
+    def stop(self, timeout: float = 30.0) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+        if self._spool_handle is not None:
+            self._spool_handle.close()
+            self._spool_handle = None
+        if not self._queued and not self._segments:
+            self._spool_path().unlink(missing_ok=True)
+        if self._lock_handle is not None:
+            self._lock_handle.close()
+            self._lock_handle = None
+            (self.spool_dir / f"{self.owner}{LOCK_SUFFIX}").unlink(missing_ok=True)
+
+    def enqueue(self, row: dict[str, Any]) -> None:
+        line = _encode_row(row) + "\n"
+        with self._lock:
+            self._spool_handle.write(line)
+            self._spool_handle.flush()
+            os.fsync(self._spool_handle.fileno())
+            self._queued.append((monotonic(), row))
+            self.enqueued_total += 1
+            queued = len(self._queued)
+        if queued >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Rotate the spool into a segment and insert every pending segment."""
+
+        with self._flush_lock:
+            self._rotate_spool()
+            written = 0
+            for segment_path in sorted(self._segments, key=lambda path: path.name):
+                written += self._write_segment(segment_path)
+            return written
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            pending = [item for items in self._segments.values() for item in items] + list(self._queued)
+        oldest = min((enqueued_at for enqueued_at, _ in pending), default=None)
+        return {
+            "enabled": self.running,
+            "queue_depth": len(pending),
+            "lag_seconds": round(monotonic() - oldest, 3) if oldest is not None else 0.0,
+            "pending_segments": len(self._segments),
+            "enqueued_total": self.enqueued_total,
+            "written_total": self.written_total,
+            "recovered_rows": self.recovered_rows,
+            "dead_lettered_rows": self.dead_lettered_rows,
+            "failed_batches": self.failed_batches,
+            "last_flush_at": self.last_flush_at.isoformat() if self.last_flush_at else None,
+            "last_error": self.last_error,
+        }
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.error("Detection write-behind flush failed", exc_info=exc)
+
+    def _spool_path(self) -> Path:
+        return self.spool_dir / f"{self.owner}{SPOOL_SUFFIX}"
+
+    def _rotate_spool(self) -> None:
+        with self._lock:
+            if not self._queued:
+                return
+            self._spool_handle.close()
+            self._segment_seq += 1
+            segment_path = self.spool_dir / f"{self.owner}.{self._segment_seq:08d}{SEGMENT_SUFFIX}"
+            self._spool_path().rename(segment_path)
+            self._spool_handle = self._spool_path().open("a", encoding="utf-8")
+            self._segments[segment_path] = self._queued
+            self._queued = []
+
+    def _write_segment(self, segment_path: Path) -> int:
+        items = self._segments[segment_path]
+        rows = [row for _, row in items]
+        dead_letters: list[dict[str, Any]] = []
+        try:
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset : offset + self.batch_size]
+                try:
+                    self._insert_rows(batch)
+                except (IntegrityError, DataError):
+                    # 批次里可能只有个别坏行（例如用户已被删除导致外键失败），逐行重试把它们挑出来。
+                    dead_letters.extend(self._insert_rows_one_by_one(batch))
+        except Exception as exc:
+            self.failed_batches += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"[:300]
+            logger.error("Detection batch insert failed; segment kept for retry", exc_info=exc)
+            return 0
+
+        if dead_letters:
+            self._write_dead_letters(dead_letters)
+        segment_path.unlink(missing_ok=True)
+        with self._lock:
+            self._segments.pop(segment_path, None)
+        written = len(rows) - len(dead_letters)
+        self.written_total += written
+        self.last_flush_at = datetime.now(timezone.utc)
+        self.last_error = None
+        return written
+
+    def _insert_rows_one_by_one(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        rejected: list[dict[str, Any]] = []
+        for row in rows:
+            try:
+                self._insert_rows([row])
+            except (IntegrityError, DataError) as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"[:300]
+                logger.error("Detection row rejected; moved to dead letter", extra={"detection_id": row.get("id")})
+                rejected.append(row)
+        return rejected
+
+    def _write_dead_letters(self, rows: list[dict[str, Any]]) -> None:
+        path = self.spool_dir / f"{self.owner}{DEAD_LETTER_SUFFIX}"
+        with path.open("a", encoding="utf-8") as handle:
+            for row in rows:
+                handle.write(_encode_row(row) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self.dead_lettered_rows += len(rows)
+
+    def _insert_rows(self, rows: list[dict[str, Any]]) -> None:
+        if not rows:
+            return
+        with self.session_factory() as db:
+            table = Detection.__table__
+            if db.get_bind().dialect.name == "postgresql":
+                # 不指定冲突列：分区后主键变为 (id, created_at)，迁移前后都能按主键去重。
+                stmt = pg_insert(table).on_conflict_do_nothing()
+            else:
+                stmt = table.insert()
+            # 传入参数列表时 SQLAlchemy 走 executemany（psycopg2 下为批量 VALUES）。
+            # RETURNING 只带回真正插入的行，重放时已存在的 id 不会重复计入用量汇总。
+            inserted = db.execute(
+                stmt.returning(
+                    table.c.user_id, table.c.created_at, table.c.chars_used, table.c.result_label, table.c.score
+                ),
+                rows,
+            ).all()
+            apply_usage_deltas(db.connection(), detection_deltas(inserted))
+            apply_team_stat_rows(db.connection(), inserted)
+            apply_history_deltas(db.connection(), history_deltas(row.user_id for row in inserted))
+            mark_usage_changed(db)
+            db.commit()
+
+    def _adopt_orphaned_files(self) -> None:
+        if fcntl is None:
+            # 没有 flock 就无法判断其他 worker 是否还活着，宁可不接管。
+            return
+        owners = {
+            path.name.split(".", 1)[0]
+            for suffix in (LOCK_SUFFIX, SPOOL_SUFFIX, SEGMENT_SUFFIX)
+            for path in self.spool_dir.glob(f"*{suffix}")
+        }
+        owners.discard(self.owner)
+        for owner in sorted(owners):
+            self._adopt_owner(owner)
+
+    def _adopt_owner(self, owner: str) -> None:
+        lock_path = self.spool_dir / f"{owner}{LOCK_SUFFIX}"
+        with lock_path.open("a") as handle:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return  # 还活着，或者另一个 worker 正在接管它
+            # 接管期间一直持有该 owner 的锁，并发重启的其他 worker 会直接跳过。
+            for path in sorted(self.spool_dir.glob(f"{owner}.*")):
+                if path.suffix in {SPOOL_SUFFIX, SEGMENT_SUFFIX}:
+                    self._adopt_file(path)
+            lock_path.unlink(missing_ok=True)
+
+    def _adopt_file(self, path: Path) -> None:
+        self._segment_seq += 1
+        segment_path = self.spool_dir / f"{self.owner}.{self._segment_seq:08d}{SEGMENT_SUFFIX}"
+        try:
+            path.rename(segment_path)
+        except FileNotFoundError:
+            return
+        rows = _read_rows(segment_path)
+        now = monotonic()
+        self._segments[segment_path] = [(now, row) for row in rows]
+        self.recovered_rows += len(rows)
+        logger.info("Recovered spooled detections", extra={"path": str(path), "rows": len(rows)})
+
+detection_writer: DetectionWriteBehind | None = None
+
+
+def configure_detection_writer(
+    session_factory: Callable[[], Session],
+    spool_dir: str | Path,
+    *,
+    batch_size: int,
+    flush_interval: float,
+) -> DetectionWriteBehind:
+    global detection_writer
+    detection_writer = DetectionWriteBehind(
+        session_factory,
+        spool_dir,
+        batch_size=batch_size,
+        flush_interval=flush_interval,
+    )
+    metrics_registry.register("detection_write_behind", detection_writer.stats)
+    return detection_writer
+
+
+def get_detection_writer() -> DetectionWriteBehind | None:
+    return detection_writer
@@ -0,0 +1,166 @@
+"""Streaming NDJSON / CSV export of detection rows.
+
+An export is a single ``SELECT`` of the requested columns, read with
+``yield_per`` (a server-side cursor on PostgreSQL) and encoded batch by batch,
+so neither the count query nor ``OFFSET`` paging is involved and memory stays
+flat however many rows match. ``gzip=true`` compresses the stream with one
+incremental ``zlib`` compressor as it is produced.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from collections.abc import Iterator, Mapping, Sequence
+from datetime import datetime
+from typing import Any, Literal
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.config import get_settings
+from app.models.detection import Detection
+from app.models.user import User
+
+settings = get_settings()
+
+ExportFormat = Literal["ndjson", "csv"]
+EXPORT_CHUNK_BYTES = 64 * 1024
+MEDIA_TYPES: dict[str, str] = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# 列名与列表接口的 camelCase 字段保持一致；原文体积大，默认不导出，需要时显式选择。
+HISTORY_EXPORT_COLUMNS: dict[str, ColumnElement] = {
+    "id": Detection.id,
+    "title": Detection.title,
+    "createdAt": Detection.created_at,
+    "isPinned": Detection.is_pinned,
+    "label": Detection.result_label,
+    "score": Detection.score,
+    "charsUsed": Detection.chars_used,
+    "functions": Detection.functions_used,
+    "inputText": Detection.input_text,
+}
+HISTORY_DEFAULT_COLUMNS = ("id", "title", "createdAt", "isPinned", "label", "score", "charsUsed", "functions")
+
+ADMIN_DETECTION_EXPORT_COLUMNS: dict[str, ColumnElement] = {
+    "id": Detection.id,
+    "userId": Detection.user_id,
+    "userEmail": User.email,
+    "userName": User.name,
+    "actorType": Detection.actor_type,
+    "actorId": Detection.actor_id,
+    "title": Detection.title,
+    "label": Detection.result_label,
+    "score": Detection.score,
+    "charsUsed": Detection.chars_used,
+    "functionsUsed": Detection.functions_used,
+    "createdAt": Detection.created_at,
+    "inputText": Detection.input_text,
+}
+ADMIN_DETECTION_DEFAULT_COLUMNS = (
+    "id",
+    "userId",
+    "userEmail",
+    "userName",
+    "actorType",
+    "actorId",
+    "label",
+    "score",
+    "charsUsed",
+    "functionsUsed",
+    "createdAt",
+)
+
+
+def resolve_columns(
+    requested: str | None,
+    available: Mapping[str, ColumnElement],
+    defaults: Sequence[str],
+) -> list[str]:
+    """Parse a comma-separated ``columns`` parameter; unknown names are rejected with 422."""
+    if requested is None or not requested.strip():
+        return list(defaults)
+    names = list(dict.fromkeys(name.strip() for name in requested.split(",") if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail={
+                "code": "INVALID_EXPORT_COLUMNS",
+                "message": f"Unknown export columns; choose from {', '.join(available)}",
+                "detail": unknown,
+            },
+        )
+    return names
+
+
+def export_filename(prefix: str, export_format: ExportFormat, compress: bool) -> str:
+    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    return f"{prefix}-{timestamp}.{export_format}{'.gz' if compress else ''}"
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(str(item) for item in value)
+    return value
+
+
+def _encode_batch(rows: Sequence[Sequence[Any]], columns: Sequence[str], export_format: ExportFormat) -> str:
+    if export_format == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(columns, map(_json_value, row), strict=True)), ensure_ascii=False) + "\n" for row in rows
+        )
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def stream_export(
+    db: Session,
+    stmt: Select,
+    columns: Sequence[str],
+    export_format: ExportFormat,
+    compress: bool = False,
+) -> Iterator[bytes]:
+    """Yield the encoded rows of ``stmt`` in chunks of about :data:`EXPORT_CHUNK_BYTES`."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    pending: list[bytes] = []
+    pending_size = 0
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor is not None else data
+
+    if export_format == "csv":
+        pending.append(_encode_batch([columns], columns, "csv").encode("utf-8"))
+        pending_size = len(pending[0])
+
+    result = db.execute(stmt.execution_options(yield_per=settings.export_batch_size))
+    for partition in result.partitions():
+        encoded = _encode_batch(partition, columns, export_format).encode("utf-8")
+        pending.append(encoded)
+        pending_size += len(encoded)
+        if pending_size >= EXPORT_CHUNK_BYTES:
+            chunk = emit(b"".join(pending))
+            pending, pending_size = [], 0
+            if chunk:
+                yield chunk
+
+    tail = emit(b"".join(pending))
+    if compressor is not None:
+        tail += compressor.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,365 @@
+"""Off-loop parsing of uploaded PDF / DOCX files for ``/parse-files``.
+
+pypdf and python-docx are pure-Python and CPU bound, so a large upload used to
+block the event loop for seconds. Each file is now parsed in its own short-lived
+child of a ``forkserver`` (parser modules preloaded, so a fork costs a few ms),
+at most ``FILE_PARSE_WORKERS`` at a time per worker process. The slot is an
+``asyncio.Semaphore`` awaited on the event loop before the parse is handed to a
+thread, so queued uploads wait as coroutines instead of holding threads of the
+default executor that the rest of the app shares. A child that runs
+past ``FILE_PARSE_CPU_SECONDS`` of CPU is stopped by the kernel (``RLIMIT_CPU``)
+and one that outlives ``FILE_PARSE_TIMEOUT_SECONDS`` wall time is killed, without
+affecting the other files of the request. Cancelling :func:`parse_file` (client
+gone, request failed) sets an event that the waiting thread polls, so the child
+is killed instead of running on to its limits.
+
+Uploads are spooled to a temporary file in fixed-size chunks and abandoned as
+soon as they pass the size limit; parsers read from that file and stop once
+``max_chars`` of text has been produced, so memory stays flat however large
+the document is.
+
+Successful parses are cached per worker under the SHA-256 of the upload (taken
+while spooling) plus :data:`PARSER_VERSION`, zlib-compressed, with LRU eviction
+bounded by ``FILE_PARSE_CACHE_MAX_BYTES`` and ``FILE_PARSE_CACHE_TTL_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import multiprocessing
+import signal
+import weakref
+import zlib
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import AbstractAsyncContextManager, nullcontext
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from pathlib import Path
+from statistics import median
+from threading import Event, Lock
+from time import monotonic, perf_counter
+from typing import BinaryIO
+
+import docx
+import pypdf
+from docx import Document
+from pypdf import PdfReader
+
+from app.core.config import get_settings
+from app.core.metrics import metrics_registry
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows 没有 RLIMIT_CPU，只保留墙钟超时
+    resource = None
+
+settings = get_settings()
+
+LATENCY_SAMPLES = 512
+SPOOL_CHUNK_BYTES = 64 * 1024
+CANCEL_POLL_SECONDS = 0.1
+# 解析逻辑或依赖升级会改变提取结果，缓存键里带上版本，升级后旧条目自然失效。
+PARSER_VERSION = f"1/pypdf-{pypdf.__version__}/python-docx-{docx.__version__}"
+
+
+class FileParseError(Exception):
+    """The parser failed or its process died; the message is safe to return to the client."""
+
+
+class FileParseTimeoutError(FileParseError):
+    pass
+
+
+class FileTooLargeError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ParsedText:
+    content: str
+    truncated: bool = False
+    cached: bool = False
+
+
+def spool_upload(source: BinaryIO, target: Path, max_bytes: int) -> str:
+    """Copy ``source`` to ``target`` chunk by chunk and return its SHA-256 hex digest.
+
+    Raises :class:`FileTooLargeError` once more than ``max_bytes`` have been read.
+    """
+    written = 0
+    digest = hashlib.sha256()
+    with target.open("wb") as output:
+        while chunk := source.read(SPOOL_CHUNK_BYTES):
+            written += len(chunk)
+            if written > max_bytes:
+                raise FileTooLargeError(f"File too large. Max {max_bytes} bytes.")
+            digest.update(chunk)
+            output.write(chunk)
+    return digest.hexdigest()
+
+
+def iter_pdf_pages(path: Path) -> Iterator[str]:
+    # PdfReader 按需解析对象，逐页产出文本，已处理的页不会留在内存里。
+    reader = PdfReader(path)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def iter_docx_paragraphs(path: Path) -> Iterator[str]:
+    for paragraph in Document(path).paragraphs:
+        yield paragraph.text
+
+
+def iter_txt_chunks(path: Path) -> Iterator[str]:
+    with path.open(encoding="utf-8") as handle:
+        while chunk := handle.read(SPOOL_CHUNK_BYTES):
+            yield chunk
+
+
+def collect_text(pieces: Iterable[str], max_chars: int, separator: str = "\n") -> ParsedText:
+    """Join ``pieces`` until the text passes ``max_chars``; the rest of the generator is never consumed."""
+    parts: list[str] = []
+    size = -len(separator)
+    for piece in pieces:
+        if not parts and not piece.strip():
+            continue
+        parts.append(piece)
+        size += len(separator) + len(piece)
+        if size > max_chars:
+            return ParsedText(separator.join(parts).strip()[:max_chars], truncated=True)
+    return ParsedText(separator.join(parts).strip())
+
+
+def _parse_txt(path: Path, max_chars: int) -> ParsedText:
+    return collect_text(iter_txt_chunks(path), max_chars, separator="")
+
+
+def _parse_pdf(path: Path, max_chars: int) -> ParsedText:
+    return collect_text(iter_pdf_pages(path), max_chars)
+
+
+def _parse_docx(path: Path, max_chars: int) -> ParsedText:
+    return collect_text(iter_docx_paragraphs(path), max_chars)
+
+
+PARSERS: dict[str, Callable[[Path, int], ParsedText]] = {".txt": _parse_txt, ".pdf": _parse_pdf, ".docx": _parse_docx}
+# .txt 只是解码，放进子进程反而更慢。
+INLINE_EXTENSIONS = {".txt"}
+
+
+def _parse_in_child(conn: Connection, extension: str, path: Path, max_chars: int, cpu_seconds: int) -> None:
+    if resource is not None and cpu_seconds:
+        # 软限制到点发 SIGXCPU 结束进程，硬限制再多给 1 秒兜底 SIGKILL。
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    try:
+        conn.send((True, PARSERS[extension](path, max_chars)))
+    except Exception as exc:  # noqa: BLE001
+        conn.send((False, str(exc) or exc.__class__.__name__))
+    finally:
+        conn.close()
+
+
+class FileParseMetrics:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._by_type: dict[str, dict[str, float]] = {}
+        self._samples: dict[str, deque[float]] = {}
+
+    def record(self, extension: str, elapsed_ms: float, outcome: str) -> None:
+        with self._lock:
+            stats = self._by_type.setdefault(extension, dict.fromkeys(("count", "errors", "timeouts", "total_ms", "max_ms"), 0))
+            stats["count"] += 1
+            if outcome != "ok":
+                stats[outcome] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            self._samples.setdefault(extension, deque(maxlen=LATENCY_SAMPLES)).append(elapsed_ms)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_type.clear()
+            self._samples.clear()
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            snapshot = {}
+            for extension, stats in self._by_type.items():
+                samples = sorted(self._samples[extension])
+                snapshot[extension] = {
+                    "count": int(stats["count"]),
+                    "errors": int(stats["errors"]),
+                    "timeouts": int(stats["timeouts"]),
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 2),
+                    "p50_ms": round(median(samples), 2),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+                    "max_ms": round(stats["max_ms"], 2),
+                }
+            return snapshot
+
+
+class ParsedTextCache:
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, tuple[bytes, bool, float]] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self._counters = dict.fromkeys(("hits", "misses", "evictions"), 0)
+
+    @staticmethod
+    def key(sha256: str, extension: str, max_chars: int) -> str:
+        return f"{sha256}:{extension}:{max_chars}:{PARSER_VERSION}"
+
+    def get(self, key: str) -> ParsedText | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+        return ParsedText(zlib.decompress(entry[0]).decode("utf-8"), truncated=entry[1], cached=True)
+
+    def set(self, key: str, parsed: ParsedText) -> None:
+        max_bytes = settings.file_parse_cache_max_bytes
+        if max_bytes == 0 or settings.file_parse_cache_ttl_seconds == 0:
+            return
+        compressed = zlib.compress(parsed.content.encode("utf-8"), 6)
+        if len(compressed) > max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (compressed, parsed.truncated, monotonic() + settings.file_parse_cache_ttl_seconds)
+            self._size += len(compressed)
+            while self._size > max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        compressed, _, _ = self._entries.pop(key)
+        self._size -= len(compressed)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "bytes": self._size}
+
+
+class FileParserPool:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._context: multiprocessing.context.BaseContext | None = None
+        self._slots: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = weakref.WeakKeyDictionary()
+
+    def _acquire_context(self) -> multiprocessing.context.BaseContext:
+        with self._lock:
+            if self._context is None:
+                # forkserver 不继承 API 进程里的线程和连接池，fork 出的子进程只带解析库。
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                context = multiprocessing.get_context(method)
+                if method == "forkserver":
+                    context.set_forkserver_preload(["pypdf", "docx", __name__])
+                self._context = context
+            return self._context
+
+    def uses_process(self, extension: str) -> bool:
+        return extension not in INLINE_EXTENSIONS and settings.file_parse_workers > 0
+
+    def slot(self, extension: str) -> AbstractAsyncContextManager:
+        """The per-event-loop child-process slot for ``extension``; inline parses need none."""
+        if not self.uses_process(extension):
+            return nullcontext()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._slots.get(loop)
+            if slots is None:
+                slots = self._slots[loop] = asyncio.Semaphore(settings.file_parse_workers)
+            return slots
+
+    def _run_in_process(self, extension: str, path: Path, max_chars: int, cancel: Event | None = None) -> ParsedText:
+        context = self._acquire_context()
+        timeout = settings.file_parse_timeout_seconds
+        cpu_seconds = settings.file_parse_cpu_seconds
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_parse_in_child, args=(sender, extension, path, max_chars, cpu_seconds), daemon=True)
+        process.start()
+        sender.close()
+        deadline = monotonic() + timeout
+        try:
+            # 分段等待结果，每段之前检查取消标记；子进程退出时 poll 也会返回（随后 recv 得到 EOF）。
+            while True:
+                if cancel is not None and cancel.is_set():
+                    process.kill()
+                    raise FileParseError("Parsing was cancelled")
+                if receiver.poll(max(0.0, min(CANCEL_POLL_SECONDS, deadline - monotonic()))):
+                    break
+                if monotonic() >= deadline:
+                    process.kill()
+                    raise FileParseTimeoutError(f"Parsing exceeded the {timeout:g}s time limit")
+            try:
+                ok, payload = receiver.recv()
+            except EOFError:
+                process.join()
+                if process.exitcode in (-signal.SIGXCPU, -signal.SIGKILL):
+                    raise FileParseTimeoutError(f"Parsing exceeded the {cpu_seconds}s CPU time limit") from None
+                raise FileParseError(f"Parser process exited with code {process.exitcode}") from None
+        finally:
+            receiver.close()
+            process.join()
+        if not ok:
+            raise FileParseError(payload)
+        return payload
+
+    def parse(self, extension: str, path: Path, max_chars: int, cancel: Event | None = None) -> ParsedText:
+        """Blocking parse; run it in a thread while holding :meth:`slot` (see :func:`parse_file`)."""
+        started = perf_counter()
+        outcome = "errors"
+        try:
+            if not self.uses_process(extension):
+                try:
+                    parsed = PARSERS[extension](path, max_chars)
+                except Exception as exc:
+                    raise FileParseError(str(exc) or exc.__class__.__name__) from exc
+            else:
+                parsed = self._run_in_process(extension, path, max_chars, cancel)
+            outcome = "ok"
+            return parsed
+        except FileParseTimeoutError:
+            outcome = "timeouts"
+            raise
+        finally:
+            parse_metrics.record(extension, (perf_counter() - started) * 1000, outcome)
+
+
+parse_metrics = FileParseMetrics()
+parsed_text_cache = ParsedTextCache()
+file_parser_pool = FileParserPool()
+metrics_registry.register("file_parsing", lambda: {**parse_metrics.stats(), "cache": parsed_text_cache.stats()})
+
+
+async def parse_file(extension: str, path: Path, max_chars: int, sha256: str | None = None) -> ParsedText:
+    """Parse the spooled upload at ``path``; with ``sha256`` an identical earlier upload is served from cache."""
+    key = ParsedTextCache.key(sha256, extension, max_chars) if sha256 else None
+    if key is not None:
+        cached = parsed_text_cache.get(key)
+        if cached is not None:
+            return cached
+    cancel = Event()
+    async with file_parser_pool.slot(extension):
+        try:
+            parsed = await asyncio.to_thread(file_parser_pool.parse, extension, path, max_chars, cancel)
+        except asyncio.CancelledError:
+            # 取消任务不会停下 to_thread 里的线程，由它在下一次轮询时杀掉子进程。
+            cancel.set()
+            raise
+    if key is not None:
+        parsed_text_cache.set(key, parsed)
+    return parsed
@@ -0,0 +1,92 @@
+"""Per-user history counters (``user_history_counters``).
+
+The counters move in the same transaction as the detections they count. ORM
+inserts, deletes and ``user_id`` changes are folded in from the flush. Core
+statements (write-behind inserts, set-based deletes, guest claims, retention)
+pass their returned ``user_id`` values to :func:`apply_history_deltas`. Rows
+removed behind the ORM's back (``ON DELETE CASCADE``, manual SQL) are repaired by
+the periodic :func:`reconcile_history_counters` job.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from collections.abc import Iterable
+
+from sqlalchemy import Connection, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models.detection import Detection
+from app.models.history_counter import UserHistoryCounter
+from app.services.usage_rollups import apply_increments
+
+logger = logging.getLogger(__name__)
+
+
+def apply_history_deltas(connection: Connection, deltas: Counter[int] | dict[int, int]) -> None:
+    rows = [{"user_id": user_id, "records": delta} for user_id, delta in sorted(deltas.items()) if delta]
+    apply_increments(connection, UserHistoryCounter.__table__, rows, ["user_id"], ["records"])
+
+
+def history_deltas(user_ids: Iterable[int | None], *, sign: int = 1) -> Counter[int]:
+    deltas: Counter[int] = Counter()
+    for user_id in user_ids:
+        if user_id is not None:
+            deltas[user_id] += sign
+    return deltas
+
+
+def read_history_count(db: Session, user_id: int) -> int:
+    return db.scalar(select(UserHistoryCounter.records).where(UserHistoryCounter.user_id == user_id)) or 0
+
+
+def reconcile_history_counters(db: Session) -> int:
+    """Repair counters that drifted away from ``detections``; returns the number of corrected users.
+
+    Drift is found with one grouped count. Each drifted user is then recounted
+    with its counter row locked (``FOR UPDATE`` on PostgreSQL), so a concurrent
+    insert either lands before the recount or applies its ``+1`` after it.
+    """
+
+    actual = dict(
+        db.execute(
+            select(Detection.user_id, func.count()).where(Detection.user_id.is_not(None)).group_by(Detection.user_id)
+        ).all()
+    )
+    stored = dict(db.execute(select(UserHistoryCounter.user_id, UserHistoryCounter.records)).all())
+    drifted = sorted(user_id for user_id in actual.keys() | stored.keys() if actual.get(user_id, 0) != stored.get(user_id, 0))
+
+    repaired = 0
+    for user_id in drifted:
+        locked = db.scalar(
+            select(UserHistoryCounter.records).where(UserHistoryCounter.user_id == user_id).with_for_update()
+        )
+        count = db.scalar(select(func.count()).select_from(Detection).where(Detection.user_id == user_id)) or 0
+        if count != (locked or 0):
+            apply_history_deltas(db.connection(), {user_id: count - (locked or 0)})
+            repaired += 1
+        db.commit()
+
+    if repaired:
+        logger.info("Reconciled history counters", extra={"repaired": repaired})
+    return repaired
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_history_counts(session: Session, flush_context, instances) -> None:
+    deltas: Counter[int] = Counter()
+    for obj in session.new:
+        if isinstance(obj, Detection):
+            deltas.update(history_deltas([obj.__dict__.get("user_id")]))
+    for obj in session.deleted:
+        if isinstance(obj, Detection):
+            deltas.update(history_deltas([obj.user_id], sign=-1))
+    for obj in session.dirty:
+        if isinstance(obj, Detection):
+            history = inspect(obj).attrs.user_id.history
+            if history.has_changes():
+                deltas.update(history_deltas(history.deleted, sign=-1))
+                deltas.update(history_deltas(history.added))
+    if any(deltas.values()):
+        apply_history_deltas(session.connection(), deltas)
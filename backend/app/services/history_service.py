@@ -2,13 +2,29 @@
 
 from __future__ import annotations
 
+from collections.abc import Sequence
 from math import ceil
 from typing import Any
 
-from sqlalchemy import delete, func, or_, select
-from sqlalchemy.orm import Session
-
-from app.models.detection import Detection
+from sqlalchemy import Integer, Select, any_, bindparam, delete, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session, undefer_group
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.detection import PAYLOAD_GROUP, Detection
+from app.services.history_counters import (
+    apply_history_deltas,
+    history_deltas,
+    read_history_count,
+)
+from app.services.pagination import KeysetColumn, invalid_cursor, paginate_keyset
+from app.services.search import normalize_search_term, search_condition, search_rank
+from app.services.team_stats import apply_team_stat_rows
+from app.services.usage_rollups import (
+    apply_usage_deltas,
+    detection_deltas,
+    mark_usage_changed,
+)
 
 
 class HistoryService:
@@ -32,8 +48,6 @@ class HistoryService:
         if not input_text or not input_text.strip():
             raise ValueError("input_text cannot be empty")
 
-        self._enforce_limit(user_id)
-
         meta_json: dict[str, Any] = {}
         if analysis:
             meta_json["analysis"] = analysis
@@ -54,6 +68,9 @@ class HistoryService:
         )
 
         self.db.add(detection)
+        # flush 时计数器随插入一起 +1（PostgreSQL 上同时锁住该用户的计数行），裁剪与插入在同一事务提交。
+        self.db.flush()
+        self._enforce_limit(user_id, keep_id=detection.id)
         self.db.commit()
         self.db.refresh(detection)
         return detection
@@ -62,36 +79,45 @@ class HistoryService:
         if not guest_id:
             return 0
 
+        # 单条 UPDATE 完成认领，不把 meta_json 等大字段读进内存；user_id IS NULL 保证并发认领只成功一次。
         stmt = (
-            select(Detection)
+            update(Detection)
             .where(
                 Detection.actor_type == "guest",
                 Detection.actor_id == guest_id,
                 Detection.user_id.is_(None),
+                Detection.is_displayable.is_(True),
             )
-            .order_by(Detection.created_at.asc(), Detection.id.asc())
+            .values(user_id=user_id)
+            .execution_options(synchronize_session="fetch")
         )
-        records = list(self.db.scalars(stmt).all())
-        if not records:
-            return 0
-
-        claimed_count = 0
-        for record in records:
-            if not self._is_displayable_history(record):
-                continue
-            record.user_id = user_id
-            claimed_count += 1
-
+        claimed_count = self.db.execute(stmt).rowcount or 0
+        if claimed_count:
+            apply_history_deltas(self.db.connection(), {user_id: claimed_count})
         self.db.commit()
         return claimed_count
 
     def get_history(self, user_id: int, history_id: int) -> Detection | None:
-        stmt = select(Detection).where(
-            Detection.id == history_id,
-            Detection.user_id == user_id,
+        stmt = (
+            select(Detection)
+            .options(undefer_group(PAYLOAD_GROUP))
+            .where(
+                Detection.id == history_id,
+                Detection.user_id == user_id,
+            )
         )
         return self.db.scalar(stmt)
 
+    def get_histories(self, user_id: int, ids: list[int]) -> dict[int, Detection]:
+        if not ids:
+            return {}
+        stmt = (
+            select(Detection)
+            .options(undefer_group(PAYLOAD_GROUP))
+            .where(Detection.user_id == user_id, self._id_in(ids))
+        )
+        return {detection.id: detection for detection in self.db.scalars(stmt)}
+
     def list_histories(
         self,
         user_id: int,
@@ -101,33 +127,81 @@ class HistoryService:
         order: str = "desc",
         q: str | None = None,
         pinned: bool | None = None,
-    ) -> tuple[list[Detection], int, int]:
+        cursor: str | None = None,
+        include_total: bool = True,
+    ) -> tuple[list[Detection], int | None, int | None, str | None]:
         per_page = min(per_page, 100)
 
-        query = select(Detection).where(Detection.user_id == user_id)
+        query = select(Detection).where(
+            Detection.user_id == user_id,
+            Detection.is_displayable.is_(True),
+        )
 
-        search = (q or "").strip()
+        search = normalize_search_term(q)
         if search:
-            pattern = f"%{search}%"
-            query = query.where(
-                or_(
-                    Detection.title.ilike(pattern),
-                    Detection.input_text.ilike(pattern),
-                )
-            )
+            query = query.where(search_condition([Detection.title, Detection.input_text], search))
 
         if pinned is not None:
             query = query.where(Detection.is_pinned.is_(pinned))
 
-        created_order = Detection.created_at.desc() if sort == "created_at" and order == "desc" else Detection.created_at.asc()
-        ordered_records = list(self.db.scalars(query.order_by(Detection.is_pinned.desc(), created_order)).all())
-        valid_records = [record for record in ordered_records if self._is_displayable_history(record)]
+        total = total_pages = None
+        if include_total:
+            total = self.db.scalar(select(func.count()).select_from(query.subquery())) or 0
+            total_pages = ceil(total / per_page) if per_page > 0 else 0
+
+        query = query.options(undefer_group(PAYLOAD_GROUP))
+        if search and sort == "relevance":
+            # 相关度不是行上的稳定值，不支持游标，只按 page 偏移翻页。
+            if cursor:
+                raise invalid_cursor("cursor is not supported for relevance sort")
+            rank = search_rank(self.db, [(Detection.title, 1.0), (Detection.input_text, 0.8)], search)
+            descending = order == "desc"
+            page_query = (
+                query.order_by(
+                    Detection.is_pinned.desc(),
+                    rank.desc(),
+                    Detection.created_at.desc() if descending else Detection.created_at.asc(),
+                    Detection.id.desc() if descending else Detection.id.asc(),
+                )
+                .offset((page - 1) * per_page)
+                .limit(per_page)
+            )
+            return list(self.db.scalars(page_query).all()), total, total_pages, None
+
+        descending = order == "desc"
+        keys = [
+            KeysetColumn(Detection.is_pinned, True, lambda record: record.is_pinned),
+            KeysetColumn(Detection.created_at, descending, lambda record: record.created_at),
+            KeysetColumn(Detection.id, descending, lambda record: record.id),
+        ]
+        if not cursor:
+            query = query.offset((page - 1) * per_page)
+        result = paginate_keyset(
+            self.db,
+            query,
+            keys,
+            cursor=cursor,
+            limit=per_page,
+            sort="created_at",
+            order=order,
+        )
+        return result.rows, total, total_pages, result.next_cursor
 
-        total = len(valid_records)
-        total_pages = ceil(total / per_page) if per_page > 0 else 0
-        offset = (page - 1) * per_page
-        records = valid_records[offset : offset + per_page]
-        return records, total, total_pages
+    def export_statement(
+        self,
+        user_id: int,
+        columns: Sequence[ColumnElement],
+        q: str | None = None,
+        pinned: bool | None = None,
+    ) -> Select:
+        """The records :meth:`list_histories` would page through, as one statement in id order."""
+        query = select(*columns).where(Detection.user_id == user_id, Detection.is_displayable.is_(True))
+        search = normalize_search_term(q)
+        if search:
+            query = query.where(search_condition([Detection.title, Detection.input_text], search))
+        if pinned is not None:
+            query = query.where(Detection.is_pinned.is_(pinned))
+        return query.order_by(Detection.id)
 
     def update_history(
         self,
@@ -162,56 +236,73 @@ class HistoryService:
         user_id: int,
         ids: list[int],
     ) -> tuple[int, list[int]]:
+        if not ids:
+            return 0, []
+
+        deleted_rows = self._delete_where(Detection.user_id == user_id, self._id_in(ids))
+        self.db.commit()
+
+        # 与逐条删除的结果保持一致：不存在、不属于当前用户或重复出现的 id 记为失败。
+        deleted_ids = {row.id for row in deleted_rows}
         deleted_count = 0
         failed_ids = []
-
         for history_id in ids:
-            success = self.delete_history(user_id, history_id)
-            if success:
+            if history_id in deleted_ids:
+                deleted_ids.discard(history_id)
                 deleted_count += 1
             else:
                 failed_ids.append(history_id)
 
         return deleted_count, failed_ids
 
+    def _id_in(self, ids: list[int]):
+        if self.db.get_bind().dialect.name == "postgresql":
+            # id = ANY(:ids) 只绑定一个数组参数，批量大小变化时语句文本不变。
+            return Detection.id == any_(bindparam("history_ids", list(ids), type_=ARRAY(Integer)))
+        return Detection.id.in_(ids)
+
     def clear_all_histories(self, user_id: int) -> int:
-        stmt = delete(Detection).where(Detection.user_id == user_id)
-        result = self.db.execute(stmt)
+        deleted_rows = self._delete_where(Detection.user_id == user_id)
         self.db.commit()
-        return result.rowcount or 0
-
-    def _enforce_limit(self, user_id: int) -> None:
-        count_stmt = select(func.count()).select_from(Detection).where(Detection.user_id == user_id)
-        total = self.db.scalar(count_stmt) or 0
-
-        if total >= self.MAX_HISTORY_RECORDS:
-            to_delete = total - self.MAX_HISTORY_RECORDS + 1
-            oldest_stmt = (
-                select(Detection.id)
-                .where(
-                    Detection.user_id == user_id,
-                    Detection.is_pinned.is_(False),
-                )
-                .order_by(Detection.created_at.asc())
-                .limit(to_delete)
-            )
-            oldest_ids = list(self.db.scalars(oldest_stmt).all())
+        return len(deleted_rows)
 
-            if oldest_ids:
-                delete_stmt = delete(Detection).where(Detection.id.in_(oldest_ids))
-                self.db.execute(delete_stmt)
-                self.db.commit()
-
-    @staticmethod
-    def _is_displayable_history(record: Detection) -> bool:
-        if not record.input_text or not record.input_text.strip():
-            return False
-
-        analysis = (record.meta_json or {}).get("analysis")
-        if not isinstance(analysis, dict):
-            return False
-
-        if not analysis.get("summary") and not analysis.get("sentences"):
-            return False
-
-        return True
+    def _delete_where(self, *conditions) -> list:
+        stmt = (
+            delete(Detection)
+            .where(*conditions)
+            .returning(
+                Detection.id,
+                Detection.user_id,
+                Detection.created_at,
+                Detection.chars_used,
+                Detection.result_label,
+                Detection.score,
+            )
+            .execution_options(synchronize_session="fetch")
+        )
+        deleted_rows = self.db.execute(stmt).all()
+        # 绕过了 ORM 的 flush 钩子，这里按 RETURNING 的行同事务扣减用量、团队汇总和历史计数。
+        if deleted_rows:
+            connection = self.db.connection()
+            apply_usage_deltas(connection, detection_deltas(deleted_rows, sign=-1))
+            apply_team_stat_rows(connection, deleted_rows, sign=-1)
+            apply_history_deltas(connection, history_deltas((row.user_id for row in deleted_rows), sign=-1))
+            mark_usage_changed(self.db)
+        return deleted_rows
+
+    def _enforce_limit(self, user_id: int, *, keep_id: int) -> None:
+        total = read_history_count(self.db, user_id)
+        if total <= self.MAX_HISTORY_RECORDS:
+            return
+
+        # 计数器只决定要不要裁剪；删哪些按实际行决定：按保留顺序跳过前 MAX 条，余下未置顶的删掉，
+        # 计数器偏高时不会多删。只在超限时走一次 (user_id, is_pinned, created_at) 索引。
+        excess_stmt = (
+            select(Detection.id, Detection.is_pinned)
+            .where(Detection.user_id == user_id)
+            .order_by(Detection.is_pinned.desc(), Detection.created_at.desc(), Detection.id.desc())
+            .offset(self.MAX_HISTORY_RECORDS)
+        )
+        oldest_ids = [row.id for row in self.db.execute(excess_stmt) if not row.is_pinned and row.id != keep_id]
+        if oldest_ids:
+            self._delete_where(Detection.user_id == user_id, Detection.id.in_(oldest_ids))
@@ -0,0 +1,139 @@
+"""Count strategy for large list endpoints.
+
+Small result sets are counted exactly with a ``LIMIT``-bounded subquery. An
+unfiltered list over a large PostgreSQL table reports ``pg_class.reltuples``
+(summed over the partitions for a partitioned table such as ``detections``).
+Any other large filtered count runs once and is then served from a per-worker
+cache keyed by the normalized filter for a few seconds. Callers get a
+:class:`ListTotal`, so responses can tell exact totals from estimates.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Hashable
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import metrics_registry
+
+settings = get_settings()
+
+# 分区父表自身的 reltuples 不随子分区 ANALYZE 更新，按 pg_inherits 汇总各分区的估算值；未 ANALYZE 的分区（-1）跳过。
+RELTUPLES_SQL = text(
+    """
+    SELECT CASE
+        WHEN parent.relkind = 'p' THEN (
+            SELECT sum(child.reltuples) FILTER (WHERE child.reltuples >= 0)::bigint
+            FROM pg_inherits
+            JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = parent.oid
+        )
+        ELSE parent.reltuples::bigint
+    END
+    FROM pg_class AS parent
+    WHERE parent.oid = to_regclass(:table_name)
+    """
+)
+
+
+@dataclass(frozen=True)
+class ListTotal:
+    value: int
+    exact: bool
+
+
+class ListCountCache:
+    def __init__(self) -> None:
+        self._values: dict[Hashable, tuple[int, float]] = {}
+        self._lock = Lock()
+        self._counters = {"exact": 0, "estimated": 0, "cache_hits": 0, "full_counts": 0}
+
+    def get(self, key: Hashable) -> int | None:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: int, ttl_seconds: float) -> None:
+        with self._lock:
+            # 过滤组合是无界的，顺手清掉已过期的条目，避免字典只增不减。
+            now = monotonic()
+            for stale in [stale for stale, (_, expires_at) in self._values.items() if expires_at <= now]:
+                del self._values[stale]
+            self._values[key] = (int(value), now + ttl_seconds)
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "cached_keys": len(self._values)}
+
+
+list_count_cache = ListCountCache()
+metrics_registry.register("list_counts", list_count_cache.stats)
+
+
+def _estimated_rows(db: Session, table_name: str) -> int | None:
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    estimate = db.scalar(RELTUPLES_SQL, {"table_name": table_name})
+    # 从未 ANALYZE 过的表 reltuples 为 -1；分区全部未 ANALYZE 时汇总结果为 NULL。
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def count_list(
+    db: Session,
+    query: Select,
+    *,
+    cache_key: Hashable,
+    table_name: str | None = None,
+) -> ListTotal:
+    """Return the total for ``query``.
+
+    Pass ``table_name`` only when ``query`` has no filters; its planner estimate is
+    then used once the table is above the exact-count threshold.
+    """
+
+    threshold = settings.list_count_exact_threshold
+    if table_name is not None:
+        estimate = _estimated_rows(db, table_name)
+        if estimate is not None and estimate > threshold:
+            list_count_cache.record("estimated")
+            return ListTotal(value=estimate, exact=False)
+
+    bounded = int(db.scalar(select(func.count()).select_from(query.limit(threshold + 1).subquery())) or 0)
+    if bounded <= threshold:
+        list_count_cache.record("exact")
+        return ListTotal(value=bounded, exact=True)
+
+    ttl = settings.list_count_cache_ttl_seconds
+    if ttl > 0:
+        cached = list_count_cache.get(cache_key)
+        if cached is not None:
+            list_count_cache.record("cache_hits")
+            return ListTotal(value=cached, exact=False)
+
+    total = int(db.scalar(select(func.count()).select_from(query.subquery())) or 0)
+    list_count_cache.record("full_counts")
+    if ttl > 0:
+        list_count_cache.set(cache_key, total, ttl)
+    return ListTotal(value=total, exact=True)
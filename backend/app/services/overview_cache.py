@@ -0,0 +1,152 @@
+"""Per-worker cache for ``GET /admin/overview`` responses.
+
+Entries are keyed by preset. Concurrent misses for the same preset share one
+computation (single-flight). Once an entry is older than the TTL, or after a
+commit that wrote detections or users, it is served stale for up to
+``ADMIN_OVERVIEW_STALE_SECONDS`` while one background task recomputes it with
+its own session.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+from typing import Generic, TypeVar
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import metrics_registry
+from app.services.usage_rollups import on_usage_change
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+Loader = Callable[[Session], T]
+
+
+@dataclass
+class _Entry(Generic[T]):
+    value: T
+    stored_at: float
+    invalidated: bool = False
+
+
+class OverviewCache(Generic[T]):
+    def __init__(self) -> None:
+        self.session_factory: Callable[[], Session] | None = None
+        self._entries: dict[str, _Entry[T]] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._refreshing: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._invalidated_at = 0.0
+        self._lock = Lock()
+        self._counters = dict.fromkeys(("hits", "stale_hits", "misses", "coalesced", "refreshes", "invalidations"), 0)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.admin_overview_cache_ttl_seconds > 0
+
+    def configure(self, session_factory: Callable[[], Session] | None) -> None:
+        self.session_factory = session_factory
+
+    def invalidate(self) -> None:
+        # 只打标记不删除：下一次读取先拿旧值，再由后台刷新。
+        with self._lock:
+            self._invalidated_at = monotonic()
+            for entry in self._entries.values():
+                entry.invalidated = True
+            self._counters["invalidations"] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._refreshing.clear()
+            self._invalidated_at = 0.0
+            self._counters = dict.fromkeys(self._counters, 0)
+        self._inflight.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+    async def get(self, key: str, db: Session, loader: Loader[T]) -> T:
+        if not self.enabled:
+            return loader(db)
+
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            age = now - entry.stored_at
+            if not entry.invalidated and age < settings.admin_overview_cache_ttl_seconds:
+                self._count("hits")
+                return entry.value
+            if self.session_factory is not None and age < settings.admin_overview_stale_seconds:
+                self._count("stale_hits")
+                self._schedule_refresh(key, loader)
+                return entry.value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count("coalesced")
+            return await asyncio.shield(inflight)
+
+        self._count("misses")
+        future = asyncio.ensure_future(asyncio.to_thread(self._load, key, db, loader))
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _load(self, key: str, db: Session, loader: Loader[T]) -> T:
+        started_at = monotonic()
+        value = loader(db)
+        with self._lock:
+            current = self._entries.get(key)
+            # 计算期间若有更新的结果先写入，就不要用旧快照覆盖它。
+            if current is None or current.stored_at <= started_at:
+                # 计算开始后又有写入提交时，结果照常返回，但入缓存即标记失效。
+                invalidated = self._invalidated_at >= started_at
+                self._entries[key] = _Entry(value=value, stored_at=started_at, invalidated=invalidated)
+        return value
+
+    def _schedule_refresh(self, key: str, loader: Loader[T]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self._counters["refreshes"] += 1
+        task = asyncio.get_running_loop().create_task(self._refresh(key, loader), name=f"overview-refresh-{key}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: str, loader: Loader[T]) -> None:
+        try:
+            await asyncio.to_thread(self._refresh_sync, key, loader)
+        except Exception as exc:
+            logger.error("Admin overview refresh failed", exc_info=exc, extra={"preset": key})
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh_sync(self, key: str, loader: Loader[T]) -> None:
+        assert self.session_factory is not None
+        with self.session_factory() as db:
+            self._load(key, db, loader)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+
+overview_cache: OverviewCache = OverviewCache()
+on_usage_change(overview_cache.invalidate)
+metrics_registry.register("admin_overview_cache", overview_cache.stats)
@@ -0,0 +1,172 @@
+"""Keyset (cursor) pagination shared by detection, history and admin lists.
+
+A cursor is an opaque URL-safe token holding the sort key values of the last
+row on the previous page plus the sort/order it was issued for. The next page
+is fetched with a ``WHERE (k1, k2, ...) > / < (v1, v2, ...)`` predicate, so deep
+pages cost the same as the first one as long as an index matches the keys.
+Every key list must end with a unique column (``id``) to make the order total.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, Select, and_, func, or_, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+DATETIME_TAG = "$dt"
+# SQLite 把时间存成文本：server_default 写入的是 "YYYY-MM-DD HH:MM:SS"，ORM 绑定的是带 6 位微秒的格式，
+# 直接比较文本会把同一秒的行判错顺序。两边都规整成毫秒精度的同一格式再比较和排序。
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%f"
+
+
+@dataclass(frozen=True)
+class KeysetColumn:
+    expression: ColumnElement
+    descending: bool
+    getter: Callable[[Any], Any]
+
+    @property
+    def python_type(self) -> type | None:
+        try:
+            return self.expression.type.python_type
+        except NotImplementedError:
+            return None
+
+    def accepts(self, value: Any) -> bool:
+        expected = self.python_type
+        if expected is None or value is None:
+            return expected is None
+        if expected is bool:
+            return isinstance(value, bool)
+        if isinstance(value, bool):
+            return False
+        if expected is float:
+            return isinstance(value, (int, float))
+        return isinstance(value, expected)
+
+
+@dataclass
+class KeysetPage:
+    rows: list[Any]
+    next_cursor: str | None
+
+
+def invalid_cursor(reason: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+        detail={"code": "INVALID_CURSOR", "message": "Cursor is invalid for this query", "detail": reason},
+    )
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {DATETIME_TAG: value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and DATETIME_TAG in value:
+        return datetime.fromisoformat(value[DATETIME_TAG])
+    return value
+
+
+def encode_cursor(values: Sequence[Any], *, sort: str, order: str) -> str:
+    payload = {"s": sort, "o": order, "v": [_encode_value(value) for value in values]}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, *, sort: str, order: str, keys: Sequence[KeysetColumn]) -> list[Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload["v"], list):
+            raise TypeError("values must be a list")
+        values = [_decode_value(value) for value in payload["v"]]
+        issued_sort, issued_order = payload["s"], payload["o"]
+    except (ValueError, KeyError, TypeError, binascii.Error, UnicodeError) as exc:
+        raise invalid_cursor("malformed") from exc
+
+    if issued_sort != sort or issued_order != order:
+        raise invalid_cursor("sort or order changed")
+    if len(values) != len(keys):
+        raise invalid_cursor("key count mismatch")
+    if not all(key.accepts(value) for key, value in zip(keys, values, strict=True)):
+        raise invalid_cursor("value type mismatch")
+    return values
+
+
+def _is_sqlite_datetime(db: Session, key: KeysetColumn) -> bool:
+    return db.get_bind().dialect.name == "sqlite" and isinstance(key.expression.type, DateTime)
+
+
+def _comparable_expression(db: Session, key: KeysetColumn) -> ColumnElement:
+    if _is_sqlite_datetime(db, key):
+        return func.strftime(SQLITE_DATETIME_FORMAT, key.expression)
+    return key.expression
+
+
+def _comparable_value(db: Session, key: KeysetColumn, value: Any) -> Any:
+    if _is_sqlite_datetime(db, key) and isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return value
+
+
+def keyset_order_by(db: Session, key: KeysetColumn) -> ColumnElement:
+    expression = _comparable_expression(db, key)
+    return expression.desc() if key.descending else expression.asc()
+
+
+def keyset_condition(db: Session, keys: Sequence[KeysetColumn], values: Sequence[Any]) -> ColumnElement[bool]:
+    """Rows strictly after ``values`` in the order defined by ``keys``."""
+
+    expressions = [_comparable_expression(db, key) for key in keys]
+    values = [_comparable_value(db, key, value) for key, value in zip(keys, values, strict=True)]
+    if len({key.descending for key in keys}) == 1:
+        # 方向一致时用行值比较，PostgreSQL 可以直接用复合索引做范围扫描。
+        left = tuple_(*expressions)
+        right = tuple_(*values)
+        return left < right if keys[0].descending else left > right
+
+    clauses = []
+    for index, key in enumerate(keys):
+        equal_prefix = [expressions[i] == values[i] for i in range(index)]
+        after = expressions[index] < values[index] if key.descending else expressions[index] > values[index]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
+
+
+def paginate_keyset(
+    db: Session,
+    query: Select,
+    keys: Sequence[KeysetColumn],
+    *,
+    cursor: str | None,
+    limit: int,
+    sort: str,
+    order: str,
+    scalars: bool = True,
+) -> KeysetPage:
+    if cursor:
+        values = decode_cursor(cursor, sort=sort, order=order, keys=keys)
+        query = query.where(keyset_condition(db, keys, values))
+
+    statement = query.order_by(*(keyset_order_by(db, key) for key in keys)).limit(limit + 1)
+    result = db.scalars(statement) if scalars else db.execute(statement)
+    rows = list(result.all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([key.getter(last) for key in keys], sort=sort, order=order)
+    return KeysetPage(rows=rows, next_cursor=next_cursor)
@@ -0,0 +1,113 @@
+"""Short-TTL cache of authenticated users for the auth dependencies.
+
+``get_current_user`` / ``get_current_actor`` only need the user's columns (id,
+role, ``is_active`` and the profile fields ``/me`` returns), so a cache hit
+rebuilds a detached :class:`User` from a column snapshot without opening a
+database session. Any committed ORM change to a user (``AdminService.update_user``,
+profile updates, credit adjustments, deletes) evicts that user in this worker
+right after commit; other workers see the change once
+``PRINCIPAL_CACHE_TTL_SECONDS`` expires.
+
+The returned user is detached: routes that modify it must load their own copy
+with ``db.get(User, current_user.id)``.
+"""
+
+from __future__ import annotations
+
+from threading import Lock
+from time import monotonic
+from typing import Any
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import get_settings
+from app.core.metrics import metrics_registry
+from app.models.user import User
+
+settings = get_settings()
+
+PENDING_INVALIDATIONS_KEY = "principal_cache_invalidations"
+UserSnapshot = dict[str, Any]
+
+
+def snapshot_user(user: User) -> UserSnapshot:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def detached_user(snapshot: UserSnapshot) -> User:
+    # 用 committed 值构造，再挂上 identity key：对象没有待写入的改动，误 add 进会话也不会产生 INSERT。
+    user = inspect(User).class_manager.new_instance()
+    for key, value in snapshot.items():
+        set_committed_value(user, key, value)
+    make_transient_to_detached(user)
+    return user
+
+
+class PrincipalCache:
+    def __init__(self) -> None:
+        self._entries: dict[int, tuple[UserSnapshot, float]] = {}
+        self._lock = Lock()
+        self._counters = dict.fromkeys(("hits", "misses", "invalidations"), 0)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.principal_cache_ttl_seconds > 0
+
+    def get(self, user_id: int) -> User | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= monotonic():
+                self._entries.pop(user_id, None)
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            snapshot = entry[0]
+        return detached_user(snapshot)
+
+    def set(self, user: User) -> User:
+        snapshot = snapshot_user(user)
+        if self.enabled:
+            with self._lock:
+                self._entries[snapshot["id"]] = (snapshot, monotonic() + settings.principal_cache_ttl_seconds)
+        return detached_user(snapshot)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._counters["invalidations"] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+
+principal_cache = PrincipalCache()
+metrics_registry.register("principal_cache", principal_cache.stats)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_user_changes(session: Session, flush_context, instances) -> None:
+    changed = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User) and obj.id is not None}
+    if changed:
+        session.info.setdefault(PENDING_INVALIDATIONS_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    # 提交后再失效：提交前失效的话，并发请求可能把旧值重新读进缓存。
+    for user_id in session.info.pop(PENDING_INVALIDATIONS_KEY, ()):
+        principal_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session: Session) -> None:
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
@@ -0,0 +1,189 @@
+"""Quota counter cache layered in front of the ``quota_usage`` ledger.
+
+The ledger stays the source of truth: quota enforcement still runs the atomic
+upsert in ``consume_quota``. The cache only serves reads (``GET /quota`` and the
+pre-check in ``/detect``) so they do not hit ``quota_usage`` or the legacy
+``SUM(detections.chars_used)`` fallback on every request.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timezone
+from threading import Lock
+from time import monotonic
+from typing import Protocol
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.quota_usage import QuotaUsage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+QuotaKey = tuple[str, str, date]
+
+
+class QuotaCounterBackend(Protocol):
+    """Storage used by :class:`QuotaCounterCache`.
+
+    The default backend is per-worker memory; a shared backend (for example Redis
+    with ``SET NX EX``) only needs to implement these methods.
+    """
+
+    def get(self, key: QuotaKey) -> int | None: ...
+
+    def set(self, key: QuotaKey, value: int, ttl_seconds: float) -> None: ...
+
+    def add(self, key: QuotaKey, value: int, ttl_seconds: float) -> bool: ...
+
+    def delete(self, key: QuotaKey) -> None: ...
+
+    def keys(self) -> list[QuotaKey]: ...
+
+    def prune_before(self, usage_date: date) -> int: ...
+
+    def clear(self) -> None: ...
+
+
+class InMemoryQuotaCounterBackend:
+    def __init__(self) -> None:
+        self._values: dict[QuotaKey, tuple[int, float]] = {}
+        self._lock = Lock()
+
+    def get(self, key: QuotaKey) -> int | None:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: QuotaKey, value: int, ttl_seconds: float) -> None:
+        with self._lock:
+            self._values[key] = (int(value), monotonic() + max(ttl_seconds, 0.0))
+
+    def add(self, key: QuotaKey, value: int, ttl_seconds: float) -> bool:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and entry[1] > monotonic():
+                return False
+            self._values[key] = (int(value), monotonic() + max(ttl_seconds, 0.0))
+            return True
+
+    def delete(self, key: QuotaKey) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def keys(self) -> list[QuotaKey]:
+        with self._lock:
+            return list(self._values.keys())
+
+    def prune_before(self, usage_date: date) -> int:
+        with self._lock:
+            stale = [key for key in self._values if key[2] < usage_date]
+            for key in stale:
+                del self._values[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class QuotaCounterCache:
+    def __init__(self, backend: QuotaCounterBackend | None = None) -> None:
+        self.backend: QuotaCounterBackend = backend or InMemoryQuotaCounterBackend()
+        self._current_date: date | None = None
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.quota_cache_ttl_seconds > 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._current_date = None
+        self.backend.clear()
+
+    def get(self, actor_type: str, actor_id: str, usage_date: date) -> int | None:
+        if not self.enabled:
+            return None
+        self._roll_over(usage_date)
+        return self.backend.get((actor_type, actor_id, usage_date))
+
+    def set(self, actor_type: str, actor_id: str, usage_date: date, used: int) -> None:
+        if not self.enabled:
+            return
+        self._roll_over(usage_date)
+        self.backend.set((actor_type, actor_id, usage_date), int(used), settings.quota_cache_ttl_seconds)
+
+    def fill(self, actor_type: str, actor_id: str, usage_date: date, used: int) -> None:
+        """Cache a value read from the database unless a newer committed value got there first."""
+
+        if not self.enabled:
+            return
+        self._roll_over(usage_date)
+        self.backend.add((actor_type, actor_id, usage_date), int(used), settings.quota_cache_ttl_seconds)
+
+    def invalidate(self, actor_type: str, actor_id: str, usage_date: date) -> None:
+        self.backend.delete((actor_type, actor_id, usage_date))
+
+    def keys(self, usage_date: date | None = None) -> list[QuotaKey]:
+        keys = self.backend.keys()
+        return keys if usage_date is None else [key for key in keys if key[2] == usage_date]
+
+    def _roll_over(self, usage_date: date) -> None:
+        with self._lock:
+            if self._current_date is not None and usage_date <= self._current_date:
+                return
+            self._current_date = usage_date
+        pruned = self.backend.prune_before(usage_date)
+        if pruned:
+            logger.info("Pruned quota counters after day rollover", extra={"pruned": pruned})
+
+
+quota_counter_cache = QuotaCounterCache()
+
+
+def reconcile_quota_counters(db: Session, usage_date: date | None = None) -> int:
+    """Repair cached counters that drifted away from ``quota_usage``.
+
+    Counters without a ledger row are dropped so the next read goes through the
+    regular fallback path. Returns the number of repaired or dropped keys.
+    """
+
+    target_date = usage_date or datetime.now(timezone.utc).date()
+    keys = quota_counter_cache.keys(target_date)
+    if not keys:
+        return 0
+
+    ledger_rows = db.execute(
+        select(QuotaUsage.actor_type, QuotaUsage.actor_id, QuotaUsage.used).where(
+            QuotaUsage.usage_date == target_date,
+            tuple_(QuotaUsage.actor_type, QuotaUsage.actor_id).in_([(key[0], key[1]) for key in keys]),
+        )
+    ).all()
+    ledger = {(row.actor_type, row.actor_id): int(row.used or 0) for row in ledger_rows}
+
+    repaired = 0
+    for actor_type, actor_id, key_date in keys:
+        cached = quota_counter_cache.backend.get((actor_type, actor_id, key_date))
+        if cached is None:
+            continue
+        expected = ledger.get((actor_type, actor_id))
+        if expected is None:
+            quota_counter_cache.invalidate(actor_type, actor_id, key_date)
+            repaired += 1
+        elif expected != cached:
+            quota_counter_cache.set(actor_type, actor_id, key_date, expected)
+            repaired += 1
+
+    if repaired:
+        logger.info("Reconciled quota counters", extra={"repaired": repaired, "usage_date": str(target_date)})
+    return repaired
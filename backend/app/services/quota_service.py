@@ -3,15 +3,17 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import func, select
+from sqlalchemy import event, func, select
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.models.detection import Detection
 from app.models.quota_usage import QuotaUsage
+from app.services.quota_cache import quota_counter_cache
 
 GUEST_DAILY_LIMIT = 5000
 USER_DAILY_LIMIT = 30000
+PENDING_COUNTERS_KEY = "quota_counter_pending"
 
 
 @dataclass(frozen=True)
@@ -48,6 +50,10 @@ def get_used_today(
     end_time: datetime,
 ) -> int:
     usage_date = start_time.date()
+    cached = quota_counter_cache.get(actor_type, actor_id, usage_date)
+    if cached is not None:
+        return cached
+
     quota_total = db.scalar(
         select(QuotaUsage.used).where(
             QuotaUsage.actor_type == actor_type,
@@ -56,7 +62,9 @@ def get_used_today(
         )
     )
     if quota_total is not None:
-        return int(quota_total or 0)
+        used = int(quota_total or 0)
+        quota_counter_cache.fill(actor_type, actor_id, usage_date, used)
+        return used
 
     detection_total = db.scalar(
         select(func.coalesce(func.sum(Detection.chars_used), 0)).where(
@@ -66,7 +74,29 @@ def get_used_today(
             Detection.created_at < end_time,
         )
     )
-    return int(detection_total or 0)
+    used = int(detection_total or 0)
+    quota_counter_cache.fill(actor_type, actor_id, usage_date, used)
+    return used
+
+
+def _publish_pending_counters(session: Session) -> None:
+    pending = session.info.pop(PENDING_COUNTERS_KEY, None) or {}
+    for (actor_type, actor_id, usage_date), used in pending.items():
+        quota_counter_cache.set(actor_type, actor_id, usage_date, used)
+
+
+def _discard_pending_counters(session: Session) -> None:
+    pending = session.info.pop(PENDING_COUNTERS_KEY, None) or {}
+    for actor_type, actor_id, usage_date in pending:
+        quota_counter_cache.invalidate(actor_type, actor_id, usage_date)
+
+
+def _write_through_on_commit(db: Session, *, actor_type: str, actor_id: str, usage_date, used: int) -> None:
+    # 计数只在事务提交后写入缓存，避免回滚后缓存里残留未落库的用量。
+    if not event.contains(db, "after_commit", _publish_pending_counters):
+        event.listen(db, "after_commit", _publish_pending_counters)
+        event.listen(db, "after_rollback", _discard_pending_counters)
+    db.info.setdefault(PENDING_COUNTERS_KEY, {})[(actor_type, actor_id, usage_date)] = used
 
 
 def _consume_quota_postgresql(
@@ -168,7 +198,17 @@ def consume_quota(
     usage_date = start_time.date()
     dialect_name = db.get_bind().dialect.name
     if dialect_name == "postgresql":
-        return _consume_quota_postgresql(
+        result = _consume_quota_postgresql(
+            db,
+            actor_type=actor_type,
+            actor_id=actor_id,
+            usage_date=usage_date,
+            chars=chars,
+            limit=limit,
+            baseline_used=baseline_used,
+        )
+    else:
+        result = _consume_quota_generic(
             db,
             actor_type=actor_type,
             actor_id=actor_id,
@@ -178,12 +218,5 @@ def consume_quota(
             baseline_used=baseline_used,
         )
 
-    return _consume_quota_generic(
-        db,
-        actor_type=actor_type,
-        actor_id=actor_id,
-        usage_date=usage_date,
-        chars=chars,
-        limit=limit,
-        baseline_used=baseline_used,
-    )
+    _write_through_on_commit(db, actor_type=actor_type, actor_id=actor_id, usage_date=usage_date, used=result.used_today)
+    return result
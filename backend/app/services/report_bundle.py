@@ -0,0 +1,111 @@
+"""Bulk PDF export as a ZIP streamed while the reports render.
+
+Reports are rendered through :func:`render_report` (so the report cache and
+process pool are shared with ``/reports/pdf``), with at most
+``max(REPORT_RENDER_WORKERS, 1)`` renders in flight. Each finished report is
+written into the archive as soon as it completes and the bytes are yielded
+straight away, so memory stays at one window of reports however many ids the
+request has. Entries are stored uncompressed: the PDF streams are already
+deflated. Reports that could not be built or rendered are listed in
+``errors.json`` at the end of the archive instead of failing the download.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import zipfile
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass
+
+from app.core.config import get_settings
+from app.schemas.report import ReportPdfContent
+from app.services.report_pdf import ReportUser
+from app.services.report_rendering import RenderedReport, render_report
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class BundleError:
+    history_id: int
+    code: str
+    message: str
+
+    def to_json(self) -> dict[str, object]:
+        return {"historyId": self.history_id, "code": self.code, "message": self.message}
+
+
+class _ChunkSink:
+    """Write-only file object for :class:`zipfile.ZipFile`; the archive is drained after every write."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _discard_result(task: asyncio.Task[RenderedReport]) -> None:
+    if not task.cancelled() and task.exception() is None:
+        task.result().discard()
+
+
+async def stream_report_zip(
+    contents: Iterable[ReportPdfContent],
+    user: ReportUser,
+    errors: Iterable[BundleError] = (),
+) -> AsyncIterator[bytes]:
+    """Yield a ZIP of the reports for ``contents``, in the order they finish rendering."""
+    errors = list(errors)
+    pending = iter(contents)
+    window = max(settings.report_render_workers, 1)
+    in_flight: dict[asyncio.Task[RenderedReport], int] = {}
+    sink = _ChunkSink()
+
+    def fill() -> None:
+        while len(in_flight) < window and (content := next(pending, None)) is not None:
+            in_flight[asyncio.create_task(render_report(content, user))] = content.history_id
+
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            fill()
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    history_id = in_flight.pop(task)
+                    try:
+                        rendered = task.result()
+                    except Exception:
+                        logger.exception("Bulk report render failed for history %s", history_id)
+                        errors.append(BundleError(history_id, "RENDER_FAILED", "Report rendering failed"))
+                        continue
+                    with archive.open(rendered.filename, mode="w", force_zip64=True) as entry:
+                        if rendered.body is not None:
+                            entry.write(rendered.body)
+                        else:
+                            for chunk in rendered.iter_file():
+                                entry.write(chunk)
+                                yield sink.drain()
+                    yield sink.drain()
+                # 写完一批再补位：同一时刻最多 window 份报告在渲染或等待写出。
+                fill()
+            if errors:
+                body = [error.to_json() for error in sorted(errors, key=lambda item: item.history_id)]
+                archive.writestr("errors.json", json.dumps(body, ensure_ascii=False, indent=2))
+        yield sink.drain()
+    finally:
+        # 客户端中途断开时取消还没渲染完的报告，已经渲染出临时文件的在完成后删掉。
+        for task in in_flight:
+            task.cancel()
+            task.add_done_callback(_discard_result)
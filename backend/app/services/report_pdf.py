@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from html import escape
 from io import BytesIO
 from pathlib import Path
+from typing import BinaryIO
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -13,11 +15,21 @@ from reportlab.lib.units import mm
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from reportlab.platypus import (
+    Flowable,
+    FrameBG,
+    Paragraph,
+    SimpleDocTemplate,
+    Spacer,
+    Table,
+    TableStyle,
+)
 
 from app.models.user import User
 from app.schemas.report import ReportPdfContent
 
+# 版式或文案改动时递增，渲染缓存键里带着它，旧缓存自然失效。
+REPORT_RENDERER_VERSION = "3"
 FONT_NAME = "NotoSansSC"
 FALLBACK_FONT_NAME = "STSong-Light"
 FONT_PATH = Path(__file__).resolve().parents[1] / "assets" / "fonts" / "NotoSansSC-VF.ttf"
@@ -28,13 +40,27 @@ HUMAN_STROKE = "#027A48"
 HUMAN_FILL = colors.HexColor("#ECFDF3")
 
 
+@dataclass(frozen=True)
+class ReportUser:
+    """The user fields a report prints; picklable, so rendering can run in another process."""
+
+    first_name: str | None
+    surname: str | None
+    name: str | None
+    email: str | None
+
+    @classmethod
+    def from_user(cls, user: User) -> ReportUser:
+        return cls(first_name=user.first_name, surname=user.surname, name=user.name, email=user.email)
+
+
 @dataclass(frozen=True)
 class ReportCopy:
     brand: str
     title: str
     subtitle: str
     report_type_label: str
-    generated_at_label: str
+    rendered_at_label: str
     display_name_label: str
     account_name_label: str
     functions_label: str
@@ -66,7 +92,7 @@ def _get_copy(locale: str) -> ReportCopy:
             title="AI \u68c0\u6d4b\u62a5\u544a",
             subtitle="\u7528\u4e8e\u4eba\u5de5\u590d\u6838\u4e0e\u7559\u6863",
             report_type_label="\u62a5\u544a\u7c7b\u578b",
-            generated_at_label="\u5bfc\u51fa\u65f6\u95f4",
+            rendered_at_label="\u6e32\u67d3\u65f6\u95f4",
             display_name_label="\u7528\u6237\u59d3\u540d",
             account_name_label="\u7528\u6237\u8d26\u53f7",
             functions_label="\u529f\u80fd\u7c7b\u578b",
@@ -96,7 +122,7 @@ def _get_copy(locale: str) -> ReportCopy:
         title="AI Detection Report",
         subtitle="Prepared for manual review and record keeping",
         report_type_label="Report Type",
-        generated_at_label="Generated At",
+        rendered_at_label="Rendered At",
         display_name_label="Display Name",
         account_name_label="Account Name",
         functions_label="Functions",
@@ -153,7 +179,7 @@ def _escape_text(value: str | int | None) -> str:
     return escape(str(value or "")).replace("\n", "<br/>")
 
 
-def _resolve_display_name(user: User) -> str:
+def _resolve_display_name(user: User | ReportUser) -> str:
     full_name = " ".join(part for part in [user.first_name, user.surname] if part).strip()
     if full_name:
         return full_name
@@ -164,7 +190,7 @@ def _resolve_display_name(user: User) -> str:
     return "User"
 
 
-def _resolve_account_name(user: User) -> str:
+def _resolve_account_name(user: User | ReportUser) -> str:
     if user.name:
         return user.name
     if user.email and "@" in user.email:
@@ -264,6 +290,28 @@ def _build_styles(font_name: str) -> dict[str, ParagraphStyle]:
             textColor=colors.HexColor("#667085"),
             wordWrap="CJK",
         ),
+        "sentence_body": ParagraphStyle(
+            "SentenceBody",
+            parent=base["BodyText"],
+            fontName=font_name,
+            fontSize=10.5,
+            leading=16,
+            textColor=colors.HexColor("#101828"),
+            leftIndent=10,
+            rightIndent=10,
+            wordWrap="CJK",
+        ),
+        "sentence_note": ParagraphStyle(
+            "SentenceNote",
+            parent=base["BodyText"],
+            fontName=font_name,
+            fontSize=9.5,
+            leading=14,
+            textColor=colors.HexColor("#667085"),
+            leftIndent=10,
+            rightIndent=10,
+            wordWrap="CJK",
+        ),
         "meta_value": ParagraphStyle(
             "MetaValue",
             parent=base["BodyText"],
@@ -278,7 +326,7 @@ def _build_styles(font_name: str) -> dict[str, ParagraphStyle]:
 
 def _build_metadata_table(
     payload: ReportPdfContent,
-    user: User,
+    user: User | ReportUser,
     copy: ReportCopy,
     styles: dict[str, ParagraphStyle],
 ) -> Table:
@@ -289,7 +337,7 @@ def _build_metadata_table(
             Paragraph(copy.report_type_history if payload.report_type == "history" else copy.report_type_scan, styles["meta_value"]),
         ],
         [
-            Paragraph(copy.generated_at_label, styles["meta_label"]),
+            Paragraph(copy.rendered_at_label, styles["meta_label"]),
             Paragraph(_escape_text(_format_datetime(payload.generated_at)), styles["meta_value"]),
         ],
         [
@@ -357,52 +405,69 @@ def _build_summary_table(payload: ReportPdfContent, copy: ReportCopy, styles: di
     return table
 
 
-def _build_sentence_block(sentence, index: int, copy: ReportCopy, styles: dict[str, ParagraphStyle]) -> Table:
+def _iter_sentence_block(sentence, index: int, copy: ReportCopy, styles: dict[str, ParagraphStyle]) -> Iterator[Flowable]:
+    # 底色和边框交给 FrameBG 画在 frame 上，句子本身只是几个单样式 Paragraph：
+    # 比每句一个嵌套 Table 轻得多，能跨页拆分，也走 reportlab 单 frag 的快速折行。
     stroke, fill = _get_sentence_palette(sentence.type)
     probability = round(float(sentence.probability or 0) * 100)
-    title = Paragraph(
+    yield FrameBG(color=fill, strokeColor=colors.HexColor(stroke), strokeWidth=1, start=True)
+    yield Spacer(1, 10)
+    yield Paragraph(
         f"<font color='{stroke}'><b>{index}. {_map_sentence_type(sentence.type, copy)} {probability}%</b></font>",
-        styles["body"],
+        styles["sentence_body"],
     )
-    body = Paragraph(_escape_text(sentence.text), styles["body"])
-    content = [title, Spacer(1, 4), body]
+    yield Spacer(1, 4)
+    yield Paragraph(_escape_text(sentence.text), styles["sentence_body"])
     if sentence.reason:
-        content.extend(
-            [
-                Spacer(1, 4),
-                Paragraph(f"<b>{copy.reason_label}:</b> {_escape_text(sentence.reason)}", styles["muted"]),
-            ]
-        )
-
-    table = Table([[content]], colWidths=[170 * mm], hAlign="LEFT")
-    table.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, -1), fill),
-                ("BOX", (0, 0), (-1, -1), 1, colors.HexColor(stroke)),
-                ("LEFTPADDING", (0, 0), (-1, -1), 10),
-                ("RIGHTPADDING", (0, 0), (-1, -1), 10),
-                ("TOPPADDING", (0, 0), (-1, -1), 10),
-                ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
-                ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ]
-        )
-    )
-    return table
+        yield Spacer(1, 4)
+        yield Paragraph(f"<b>{copy.reason_label}:</b> {_escape_text(sentence.reason)}", styles["sentence_note"])
+    yield Spacer(1, 10)
+    yield FrameBG(start=False)
+    yield Spacer(1, 8)
 
 
-def _append_original_text(story: list, text: str, styles: dict[str, ParagraphStyle], copy: ReportCopy) -> None:
+def _iter_original_text(text: str, styles: dict[str, ParagraphStyle], copy: ReportCopy) -> Iterator[Flowable]:
     paragraphs = str(text or "").splitlines()
     if not paragraphs:
-        story.append(Paragraph(copy.no_data, styles["muted"]))
+        yield Paragraph(copy.no_data, styles["muted"])
         return
 
     for paragraph in paragraphs:
         if paragraph.strip():
-            story.append(Paragraph(_escape_text(paragraph), styles["body"]))
+            yield Paragraph(_escape_text(paragraph), styles["body"])
         else:
-            story.append(Spacer(1, 6))
-        story.append(Spacer(1, 3))
+            yield Spacer(1, 6)
+        yield Spacer(1, 3)
+
+
+class _StoryStream(list):
+    """List view over a flowable generator that keeps at most ``window`` flowables materialised.
+
+    ``BaseDocTemplate.build`` only ever looks at the front of the story (and
+    puts split remainders back there), so feeding it from a generator keeps the
+    number of live flowables constant however many sentences the report has.
+    """
+
+    def __init__(self, flowables: Iterator[Flowable], window: int = 16) -> None:
+        super().__init__()
+        self._source: Iterator[Flowable] | None = flowables
+        self._window = window
+        self._fill()
+
+    def _fill(self) -> None:
+        while self._source is not None and list.__len__(self) < self._window:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self) -> int:
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
 
 
 def build_report_filename(payload: ReportPdfContent) -> str:
@@ -414,54 +479,60 @@ def build_report_filename(payload: ReportPdfContent) -> str:
     return f"aidetector-report-{timestamp}.pdf"
 
 
-def build_report_pdf(payload: ReportPdfContent, user: User) -> bytes:
+def _iter_story(
+    payload: ReportPdfContent,
+    user: User | ReportUser,
+    copy: ReportCopy,
+    styles: dict[str, ParagraphStyle],
+) -> Iterator[Flowable]:
+    yield Paragraph(copy.title, styles["title"])
+    yield Paragraph(copy.subtitle, styles["subtitle"])
+    yield _build_metadata_table(payload, user, copy, styles)
+    yield Spacer(1, 10)
+
+    yield Paragraph(copy.summary_title, styles["section"])
+    yield _build_summary_table(payload, copy, styles)
+    yield Spacer(1, 8)
+    yield Paragraph(f"<b>{copy.ai_likely_label}:</b> {payload.analysis.ai_likely_count}", styles["body"])
+    yield Spacer(1, 12)
+
+    yield Paragraph(copy.risk_title, styles["section"])
+    risk_index = 0
+    for sentence in payload.analysis.sentences:
+        if sentence.type in {"ai", "mixed"}:
+            risk_index += 1
+            yield from _iter_sentence_block(sentence, risk_index, copy, styles)
+    if not risk_index:
+        yield Paragraph(copy.no_risk, styles["muted"])
+        yield Spacer(1, 8)
+
+    yield Paragraph(copy.details_title, styles["section"])
+    if payload.analysis.sentences:
+        for index, sentence in enumerate(payload.analysis.sentences, start=1):
+            yield from _iter_sentence_block(sentence, index, copy, styles)
+    else:
+        yield Paragraph(copy.no_data, styles["muted"])
+        yield Spacer(1, 8)
+
+    yield Paragraph(copy.original_title, styles["section"])
+    yield from _iter_original_text(payload.input_text, styles, copy)
+
+
+def write_report_pdf(payload: ReportPdfContent, user: User | ReportUser, output: str | Path | BinaryIO) -> None:
+    """Render the report into ``output`` (a path or binary file) with a bounded number of live flowables."""
     copy = _get_copy(payload.locale)
     font_name = _ensure_report_font()
     styles = _build_styles(font_name)
-    buffer = BytesIO()
 
     doc = SimpleDocTemplate(
-        buffer,
+        str(output) if isinstance(output, Path) else output,
         pagesize=A4,
         leftMargin=20 * mm,
         rightMargin=20 * mm,
         topMargin=24 * mm,
         bottomMargin=16 * mm,
+        pageCompression=1,
     )
-    story: list = []
-
-    story.append(Paragraph(copy.title, styles["title"]))
-    story.append(Paragraph(copy.subtitle, styles["subtitle"]))
-    story.append(_build_metadata_table(payload, user, copy, styles))
-    story.append(Spacer(1, 10))
-
-    story.append(Paragraph(copy.summary_title, styles["section"]))
-    story.append(_build_summary_table(payload, copy, styles))
-    story.append(Spacer(1, 8))
-    story.append(Paragraph(f"<b>{copy.ai_likely_label}:</b> {payload.analysis.ai_likely_count}", styles["body"]))
-    story.append(Spacer(1, 12))
-
-    risk_sentences = [item for item in payload.analysis.sentences if item.type in {"ai", "mixed"}]
-    story.append(Paragraph(copy.risk_title, styles["section"]))
-    if risk_sentences:
-        for index, sentence in enumerate(risk_sentences, start=1):
-            story.append(_build_sentence_block(sentence, index, copy, styles))
-            story.append(Spacer(1, 8))
-    else:
-        story.append(Paragraph(copy.no_risk, styles["muted"]))
-        story.append(Spacer(1, 8))
-
-    story.append(Paragraph(copy.details_title, styles["section"]))
-    if payload.analysis.sentences:
-        for index, sentence in enumerate(payload.analysis.sentences, start=1):
-            story.append(_build_sentence_block(sentence, index, copy, styles))
-            story.append(Spacer(1, 8))
-    else:
-        story.append(Paragraph(copy.no_data, styles["muted"]))
-        story.append(Spacer(1, 8))
-
-    story.append(Paragraph(copy.original_title, styles["section"]))
-    _append_original_text(story, payload.input_text, styles, copy)
 
     generated_at_text = _format_datetime(payload.generated_at)
 
@@ -480,5 +551,16 @@ def build_report_pdf(payload: ReportPdfContent, user: User) -> bytes:
         )
         canvas.restoreState()
 
-    doc.build(story, onFirstPage=draw_page, onLaterPages=draw_page)
+    doc.build(_StoryStream(_iter_story(payload, user, copy, styles)), onFirstPage=draw_page, onLaterPages=draw_page)
+
+
+def render_report_file(payload: ReportPdfContent, user: User | ReportUser, path: str) -> int:
+    """Process-pool entry point: render to ``path`` and return the file size."""
+    write_report_pdf(payload, user, Path(path))
+    return Path(path).stat().st_size
+
+
+def build_report_pdf(payload: ReportPdfContent, user: User | ReportUser) -> bytes:
+    buffer = BytesIO()
+    write_report_pdf(payload, user, buffer)
     return buffer.getvalue()
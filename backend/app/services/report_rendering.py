@@ -0,0 +1,244 @@
+"""Cached, off-loop rendering of PDF reports.
+
+Reports are pure-Python reportlab work, so they are rendered on a process pool
+(``REPORT_RENDER_WORKERS``; ``0`` falls back to a thread) straight into a
+temporary file. PDFs up to ``REPORT_INLINE_MAX_BYTES`` are read back and kept
+per worker, keyed by history id, locale, report type, a hash of
+everything the report prints (analysis, input text, functions, user names) and
+:data:`REPORT_RENDERER_VERSION`, in an LRU bounded by ``REPORT_CACHE_MAX_BYTES``
+and ``REPORT_CACHE_TTL_SECONDS``. A committed ORM change to a detection evicts
+its reports. Larger PDFs are streamed from the temporary file and deleted once
+sent, so the API process never holds them in memory. The ETag is the hash of
+the PDF bytes, so a cached PDF re-exported unchanged can be answered with 304.
+The request time is not part of the key: the PDF prints when it was rendered,
+and the download filename is rebuilt from each request's ``generated_at``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from pathlib import Path
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.etag import etag_from_digest, etag_matches
+from app.core.metrics import metrics_registry
+from app.models.detection import Detection
+from app.schemas.report import ReportPdfContent
+from app.services.report_pdf import (
+    REPORT_RENDERER_VERSION,
+    ReportUser,
+    build_report_filename,
+    render_report_file,
+)
+
+settings = get_settings()
+
+PENDING_INVALIDATIONS_KEY = "report_cache_invalidations"
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class RenderedReport:
+    """A rendered PDF, held either in memory (``body``) or in a temporary file (``path``)."""
+
+    etag: str
+    filename: str
+    size: int
+    body: bytes | None = None
+    path: Path | None = None
+    cached: bool = False
+
+    def matches(self, if_none_match: str | None) -> bool:
+        return etag_matches(if_none_match, self.etag)
+
+    def iter_file(self) -> Iterator[bytes]:
+        try:
+            with self.path.open("rb") as handle:
+                while chunk := handle.read(STREAM_CHUNK_BYTES):
+                    yield chunk
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+def report_cache_key(content: ReportPdfContent, user: ReportUser) -> tuple[int | None, str]:
+    printed = {
+        "analysis": content.analysis.model_dump(mode="json"),
+        "input_text": content.input_text,
+        "functions": content.functions,
+        "detection_id": content.detection_id,
+        "user": [user.first_name, user.surname, user.name, user.email],
+    }
+    digest = hashlib.sha256(json.dumps(printed, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return content.history_id, f"{content.locale}:{content.report_type}:{digest}:{REPORT_RENDERER_VERSION}"
+
+
+class ReportCache:
+    def __init__(self) -> None:
+        self._entries: OrderedDict[tuple[int | None, str], tuple[RenderedReport, float]] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self._counters = dict.fromkeys(("hits", "misses", "evictions", "invalidations"), 0)
+
+    def get(self, key: tuple[int | None, str]) -> RenderedReport | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def set(self, key: tuple[int | None, str], report: RenderedReport) -> None:
+        max_bytes = settings.report_cache_max_bytes
+        if report.body is None or len(report.body) > max_bytes or settings.report_cache_ttl_seconds == 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (report, monotonic() + settings.report_cache_ttl_seconds)
+            self._size += len(report.body)
+            while self._size > max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def invalidate_history(self, history_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == history_id]:
+                self._drop(key)
+            self._counters["invalidations"] += 1
+
+    def _drop(self, key: tuple[int | None, str]) -> None:
+        report, _ = self._entries.pop(key)
+        self._size -= len(report.body)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "bytes": self._size}
+
+
+class ReportRenderPool:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # forkserver：worker 不继承 API 进程的线程和数据库连接。
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                context = multiprocessing.get_context(method)
+                if method == "forkserver":
+                    context.set_forkserver_preload(["app.services.report_pdf"])
+                self._executor = ProcessPoolExecutor(max_workers=settings.report_render_workers, mp_context=context)
+            return self._executor
+
+    async def render(self, content: ReportPdfContent, user: ReportUser, path: Path) -> int:
+        """Render into ``path`` and return the PDF size in bytes."""
+        if settings.report_render_workers == 0:
+            return await asyncio.to_thread(render_report_file, content, user, str(path))
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, render_report_file, content, user, str(path))
+        except BrokenProcessPool:
+            # worker 异常退出后整个池不可用，丢掉它，下一次请求重建。
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+report_cache = ReportCache()
+report_render_pool = ReportRenderPool()
+metrics_registry.register("report_cache", report_cache.stats)
+
+
+def _digest_file(path: Path, keep: bool) -> tuple[str, bytes | None]:
+    digest = hashlib.sha256()
+    chunks: list[bytes] = []
+    with path.open("rb") as handle:
+        while chunk := handle.read(STREAM_CHUNK_BYTES):
+            digest.update(chunk)
+            if keep:
+                chunks.append(chunk)
+    return etag_from_digest(digest.hexdigest()), b"".join(chunks) if keep else None
+
+
+async def render_report(content: ReportPdfContent, user: ReportUser) -> RenderedReport:
+    """Return the report for ``content``; a result with ``path`` set must be streamed or discarded by the caller."""
+    key = report_cache_key(content, user)
+    cached = report_cache.get(key)
+    if cached is not None:
+        return replace(cached, filename=build_report_filename(content))
+
+    handle, name = tempfile.mkstemp(prefix="report-", suffix=".pdf")
+    os.close(handle)
+    path = Path(name)
+    try:
+        size = await report_render_pool.render(content, user, path)
+        inline = size <= settings.report_inline_max_bytes
+        etag, body = await asyncio.to_thread(_digest_file, path, inline)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    filename = build_report_filename(content)
+    if body is None:
+        return RenderedReport(etag=etag, filename=filename, size=size, path=path)
+    path.unlink(missing_ok=True)
+    report_cache.set(key, RenderedReport(etag=etag, filename=filename, size=size, body=body, cached=True))
+    return RenderedReport(etag=etag, filename=filename, size=size, body=body)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_detection_changes(session: Session, flush_context, instances) -> None:
+    changed = {
+        obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, Detection) and obj.id is not None
+    }
+    if changed:
+        session.info.setdefault(PENDING_INVALIDATIONS_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_reports(session: Session) -> None:
+    for history_id in session.info.pop(PENDING_INVALIDATIONS_KEY, ()):
+        report_cache.invalidate_history(history_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_detection_changes(session: Session) -> None:
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
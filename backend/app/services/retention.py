@@ -0,0 +1,385 @@
+"""Retention and cold archival of old detection records.
+
+Each actor type has its own maximum age (``RETENTION_GUEST_DAYS`` for unclaimed
+guest records, ``RETENTION_USER_DAYS`` for records owned by a user; ``0`` keeps
+them forever). Expired rows are streamed out with a server-side cursor, one
+bounded batch per transaction. Each batch is appended to a compressed JSONL
+archive (zstd when ``zstandard`` is installed, gzip otherwise) and fsync'd
+before the same ids are deleted, so a crash can duplicate an archived row but
+never lose one. ``index.jsonl`` in the archive directory records the id range
+of every batch, so :func:`restore_detection` only decompresses the candidate
+files.
+
+Usage and team rollups keep counting archived rows: they describe history, not
+what is still in the hot table.
+
+    python -m app.services.retention archive
+    python -m app.services.retention restore <detection_id>
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import logging
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from threading import Lock
+from time import monotonic
+from typing import Any
+
+from sqlalchemy import ColumnElement, and_, delete, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import metrics_registry
+from app.models.detection import Detection
+from app.services.history_counters import apply_history_deltas, history_deltas
+
+try:  # pragma: no cover - 可选依赖，缺失时退回 gzip
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:  # pragma: no cover - Windows 本地开发环境没有 fcntl
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = ".retention.lock"
+# 服务端游标每次从数据库取回的行数；批大小只决定一次事务删多少行。
+STREAM_CHUNK_ROWS = 200
+
+
+class ArchivedDetectionNotFound(LookupError):
+    pass
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    name: str
+    max_age_days: int
+
+    def predicate(self) -> ColumnElement[bool]:
+        if self.name == "guest":
+            # 已被认领的游客记录归属用户，按用户策略处理。
+            return and_(Detection.actor_type == "guest", Detection.user_id.is_(None))
+        # 置顶记录是用户主动保留的，不归档。
+        return and_(Detection.user_id.is_not(None), Detection.is_pinned.is_(False))
+
+
+def retention_policies() -> list[RetentionPolicy]:
+    policies = [
+        RetentionPolicy("guest", settings.retention_guest_days),
+        RetentionPolicy("user", settings.retention_user_days),
+    ]
+    return [policy for policy in policies if policy.max_age_days > 0]
+
+
+@dataclass
+class RetentionResult:
+    archived: int = 0
+    deleted: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    skipped: bool = False
+
+
+class RetentionMetrics:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.running_policy: str | None = None
+            self.run_rows = 0
+            self.run_started_at: float | None = None
+            self.counters = dict.fromkeys(("runs", "batches", "archived_rows", "deleted_rows", "restored_rows"), 0)
+            self.last_run_seconds = 0.0
+            self.last_rows_per_second = 0.0
+
+    def start(self, policy: str) -> None:
+        with self._lock:
+            self.running_policy = policy
+            if self.run_started_at is None:
+                self.run_started_at = monotonic()
+                self.run_rows = 0
+
+    def record_batch(self, archived: int, deleted: int) -> None:
+        with self._lock:
+            self.run_rows += archived
+            self.counters["batches"] += 1
+            self.counters["archived_rows"] += archived
+            self.counters["deleted_rows"] += deleted
+
+    def record_restore(self) -> None:
+        with self._lock:
+            self.counters["restored_rows"] += 1
+
+    def finish(self, seconds: float, rows: int) -> None:
+        with self._lock:
+            self.counters["runs"] += 1
+            self.running_policy = None
+            self.run_started_at = None
+            self.last_run_seconds = round(seconds, 3)
+            self.last_rows_per_second = round(rows / seconds, 1) if seconds > 0 else 0.0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            elapsed = monotonic() - self.run_started_at if self.run_started_at is not None else 0.0
+            return {
+                **self.counters,
+                "running_policy": self.running_policy,
+                "current_run_rows": self.run_rows if self.run_started_at is not None else 0,
+                "current_run_seconds": round(elapsed, 3),
+                "last_run_seconds": self.last_run_seconds,
+                "last_rows_per_second": self.last_rows_per_second,
+            }
+
+
+retention_metrics = RetentionMetrics()
+metrics_registry.register("retention", retention_metrics.stats)
+
+
+def _archive_suffix() -> str:
+    return ".jsonl.zst" if zstandard is not None else ".jsonl.gz"
+
+
+def _compress(data: bytes, suffix: str) -> bytes:
+    # 每批写成独立的 zstd frame / gzip member，追加后整个文件仍可顺序解压。
+    if suffix.endswith(".zst"):
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data)
+
+
+def _open_archive(path: Path) -> io.TextIOBase:
+    if path.name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path.name}")
+        reader = zstandard.ZstdDecompressor().stream_reader(path.open("rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def _encode_row(row: dict[str, Any]) -> str:
+    payload = {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode_row(line: str) -> dict[str, Any]:
+    row = json.loads(line)
+    if isinstance(row.get("created_at"), str):
+        row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
+
+
+def _append_durably(path: Path, data: bytes) -> None:
+    with path.open("ab") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+class _RunLock:
+    """同机多个 worker 共用归档目录，只让其中一个执行归档。"""
+
+    def __init__(self, archive_dir: Path) -> None:
+        self.path = archive_dir / LOCK_FILE
+        self.handle = None
+
+    def acquire(self) -> bool:
+        self.handle = self.path.open("a")
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.handle.close()
+            self.handle = None
+            return False
+        return True
+
+    def release(self) -> None:
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def _expired_batch(db: Session, policy: RetentionPolicy, cutoff: datetime, after: tuple[datetime, int] | None, limit: int) -> list[dict[str, Any]]:
+    table = Detection.__table__
+    query = select(table).where(policy.predicate(), table.c.created_at < cutoff)
+    if after is not None:
+        query = query.where(tuple_(table.c.created_at, table.c.id) > after)
+    query = query.order_by(table.c.created_at, table.c.id).limit(limit)
+    result = db.execute(query.execution_options(stream_results=True, yield_per=STREAM_CHUNK_ROWS))
+    return [dict(row) for row in result.mappings()]
+
+
+def archive_expired_detections(
+    db: Session,
+    *,
+    archive_dir: str | Path | None = None,
+    now: datetime | None = None,
+    batch_size: int | None = None,
+) -> RetentionResult:
+    """Archive and delete detections older than their policy allows."""
+
+    archive_path = Path(archive_dir or settings.retention_archive_dir)
+    archive_path.mkdir(parents=True, exist_ok=True)
+    batch_size = batch_size or settings.retention_batch_size
+    now = now or datetime.now(timezone.utc)
+    result = RetentionResult()
+
+    run_lock = _RunLock(archive_path)
+    if not run_lock.acquire():
+        result.skipped = True
+        return result
+
+    started_at = monotonic()
+    try:
+        for policy in retention_policies():
+            retention_metrics.start(policy.name)
+            cutoff = now - timedelta(days=policy.max_age_days)
+            archive_file = archive_path / f"detections-{policy.name}-{now:%Y%m%dT%H%M%SZ}{_archive_suffix()}"
+            after: tuple[datetime, int] | None = None
+            while True:
+                rows = _expired_batch(db, policy, cutoff, after, batch_size)
+                if not rows:
+                    db.commit()
+                    break
+                ids = [row["id"] for row in rows]
+                payload = "".join(_encode_row(row) + "\n" for row in rows).encode("utf-8")
+                _append_durably(archive_file, _compress(payload, archive_file.name))
+                entry = {
+                    "file": archive_file.name,
+                    "policy": policy.name,
+                    "min_id": min(ids),
+                    "max_id": max(ids),
+                    "rows": len(rows),
+                }
+                _append_durably(archive_path / INDEX_FILE, (json.dumps(entry) + "\n").encode("utf-8"))
+
+                # 只按主键删本批已落盘的行，并重复策略条件：归档后被认领的游客记录会被保留。
+                deleted_user_ids = db.execute(
+                    delete(Detection.__table__)
+                    .where(
+                        Detection.id.in_(ids),
+                        Detection.created_at < cutoff,
+                        policy.predicate(),
+                    )
+                    .returning(Detection.user_id)
+                ).scalars().all()
+                # 用量汇总保留历史计数；历史上限计数只反映热表里的行。
+                apply_history_deltas(db.connection(), history_deltas(deleted_user_ids, sign=-1))
+                db.commit()
+                deleted = len(deleted_user_ids)
+
+                retention_metrics.record_batch(len(rows), deleted)
+                result.archived += len(rows)
+                result.deleted += deleted
+                result.batches += 1
+                after = (rows[-1]["created_at"], rows[-1]["id"])
+                if len(rows) < batch_size:
+                    break
+    finally:
+        result.seconds = monotonic() - started_at
+        retention_metrics.finish(result.seconds, result.archived)
+        run_lock.release()
+
+    if result.archived:
+        logger.info(
+            "Archived expired detections",
+            extra={"archived": result.archived, "deleted": result.deleted, "seconds": round(result.seconds, 3)},
+        )
+    return result
+
+
+def _candidate_files(archive_path: Path, detection_id: int) -> list[Path]:
+    index_path = archive_path / INDEX_FILE
+    if not index_path.exists():
+        return []
+    names: list[str] = []
+    with index_path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry["min_id"] <= detection_id <= entry["max_id"] and entry["file"] not in names:
+                names.append(entry["file"])
+    # 新归档优先：同一行被重复归档时以最后一次为准。
+    return [archive_path / name for name in reversed(names) if (archive_path / name).exists()]
+
+
+def _iter_archived_rows(path: Path) -> Iterator[dict[str, Any]]:
+    with _open_archive(path) as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield _decode_row(line)
+
+
+def find_archived_detection(detection_id: int, *, archive_dir: str | Path | None = None) -> dict[str, Any]:
+    archive_path = Path(archive_dir or settings.retention_archive_dir)
+    for path in _candidate_files(archive_path, detection_id):
+        for row in _iter_archived_rows(path):
+            if row["id"] == detection_id:
+                return row
+    raise ArchivedDetectionNotFound(detection_id)
+
+
+def restore_detection(db: Session, detection_id: int, *, archive_dir: str | Path | None = None) -> bool:
+    """Insert one archived detection back; returns ``False`` when it is already in the table."""
+
+    row = find_archived_detection(detection_id, archive_dir=archive_dir)
+    if db.scalar(select(Detection.id).where(Detection.id == detection_id)) is not None:
+        return False
+    try:
+        db.execute(Detection.__table__.insert(), [row])
+        apply_history_deltas(db.connection(), history_deltas([row.get("user_id")]))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    retention_metrics.record_restore()
+    logger.info("Restored archived detection", extra={"detection_id": detection_id})
+    return True
+
+
+def main(argv: list[str] | None = None) -> int:
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.services.retention")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("archive", help="archive and delete expired detections now")
+    restore = commands.add_parser("restore", help="restore one archived detection")
+    restore.add_argument("detection_id", type=int)
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if args.command == "archive":
+            result = archive_expired_detections(db)
+            print(json.dumps({"archived": result.archived, "deleted": result.deleted, "skipped": result.skipped}))
+            return 0
+        try:
+            restored = restore_detection(db, args.detection_id)
+        except ArchivedDetectionNotFound:
+            print(f"detection {args.detection_id} not found in archive")
+            return 1
+        print(f"detection {args.detection_id} {'restored' if restored else 'already present'}")
+        return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -1,13 +1,34 @@
-"""Service helpers for scan examples."""
+"""Service helpers for scan examples.
+
+Default examples are upserted once at startup (``seed_scan_examples``), not per
+request. Rendered responses are cached per locale as JSON bytes plus a strong
+ETag; any committed ORM change to ``ScanExample`` in this worker bumps the cache
+version, and other workers rebuild after ``SCAN_EXAMPLES_CACHE_SECONDS``.
+"""
 
 from __future__ import annotations
 
-from sqlalchemy import select
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
+from app.core.etag import etag_matches, strong_etag
+from app.core.metrics import metrics_registry
 from app.models.scan_example import ScanExample
 from app.schemas.scan_example import ScanExamplesResponse, ScanHeroExampleItem, ScanUsageExampleItem
 
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+PENDING_INVALIDATION_KEY = "scan_example_cache_invalidation"
+
 DEFAULT_EXAMPLES = [
     {
         "locale": "zh-CN",
@@ -242,7 +263,6 @@ class ScanExampleService:
 
     def list_examples(self, locale: str) -> ScanExamplesResponse:
         normalized_locale = self._normalize_locale(locale)
-        self._ensure_seeded()
 
         records = self._fetch_records(normalized_locale)
         response_locale = normalized_locale
@@ -300,7 +320,7 @@ class ScanExampleService:
         )
         return list(self.db.scalars(stmt).all())
 
-    def _ensure_seeded(self) -> None:
+    def ensure_seeded(self) -> None:
         existing_records = {
             (record.locale, record.placement, record.key): record
             for record in self.db.scalars(select(ScanExample)).all()
@@ -394,3 +414,101 @@ class ScanExampleService:
             },
         }
         return labels.get(locale, labels["en-US"]).get(key, "")
+
+
+@dataclass(frozen=True)
+class CachedScanExamples:
+    body: bytes
+    etag: str
+
+    def matches(self, if_none_match: str | None) -> bool:
+        return etag_matches(if_none_match, self.etag)
+
+
+class ScanExampleCache:
+    def __init__(self) -> None:
+        self._entries: dict[str, tuple[CachedScanExamples, int, float]] = {}
+        self._version = 0
+        self._lock = Lock()
+        self._counters = dict.fromkeys(("hits", "misses", "invalidations"), 0)
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self, locale: str) -> CachedScanExamples | None:
+        with self._lock:
+            entry = self._entries.get(locale)
+            if entry is None or entry[1] != self._version or entry[2] <= monotonic():
+                self._entries.pop(locale, None)
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def set(self, locale: str, version: int, response: ScanExamplesResponse) -> CachedScanExamples:
+        body = response.model_dump_json(by_alias=True).encode("utf-8")
+        cached = CachedScanExamples(body=body, etag=strong_etag(body))
+        with self._lock:
+            # 构建期间版本被推进说明读到的可能是旧数据，这次结果照常返回但不入缓存。
+            if version == self._version:
+                self._entries[locale] = (cached, version, monotonic() + settings.scan_examples_cache_seconds)
+        return cached
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "version": self._version}
+
+
+scan_example_cache = ScanExampleCache()
+metrics_registry.register("scan_examples", scan_example_cache.stats)
+
+
+def get_cached_examples(locale: str, db: Callable[[], Session]) -> CachedScanExamples:
+    """Return the rendered examples for ``locale``; ``db`` is only called on a cache miss."""
+    normalized_locale = ScanExampleService._normalize_locale(locale)
+    cached = scan_example_cache.get(normalized_locale)
+    if cached is not None:
+        return cached
+    version = scan_example_cache.version
+    response = ScanExampleService(db()).list_examples(normalized_locale)
+    return scan_example_cache.set(normalized_locale, version, response)
+
+
+def seed_scan_examples(session_factory: Callable[[], Session]) -> None:
+    with session_factory() as db:
+        try:
+            ScanExampleService(db).ensure_seeded()
+        except IntegrityError:
+            # 多个 worker 同时启动时只有一个能插入成功，其余的放弃即可。
+            db.rollback()
+            logger.info("Scan examples were seeded concurrently by another worker")
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_scan_example_changes(session: Session, flush_context, instances) -> None:
+    if any(isinstance(obj, ScanExample) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[PENDING_INVALIDATION_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_scan_examples(session: Session) -> None:
+    if session.info.pop(PENDING_INVALIDATION_KEY, False):
+        scan_example_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_scan_example_changes(session: Session) -> None:
+    session.info.pop(PENDING_INVALIDATION_KEY, None)
@@ -0,0 +1,91 @@
+"""Substring search helpers shared by history and admin listings (pg_trgm on PostgreSQL)."""
+
+from __future__ import annotations
+
+import html
+from collections.abc import Sequence
+
+from sqlalchemy import case, func, literal, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+SEARCH_TERM_MAX_LENGTH = 200
+SNIPPET_RADIUS = 60
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+LIKE_ESCAPE = "\\"
+
+
+def normalize_search_term(raw: str | None) -> str | None:
+    term = (raw or "").strip()[:SEARCH_TERM_MAX_LENGTH]
+    return term or None
+
+
+def like_pattern(term: str) -> str:
+    escaped = term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", f"{LIKE_ESCAPE}%").replace("_", f"{LIKE_ESCAPE}_")
+    return f"%{escaped}%"
+
+
+def search_condition(columns: Sequence[ColumnElement], term: str) -> ColumnElement[bool]:
+    pattern = like_pattern(term)
+    return or_(*(column.ilike(pattern, escape=LIKE_ESCAPE) for column in columns))
+
+
+def search_rank(db: Session, weighted_columns: Sequence[tuple[ColumnElement, float]], term: str) -> ColumnElement:
+    """Relevance score for ``sort=relevance``; higher is better."""
+
+    if db.get_bind().dialect.name == "postgresql":
+        scores = [func.word_similarity(term, func.coalesce(column, "")) * weight for column, weight in weighted_columns]
+        return func.greatest(*scores) if len(scores) > 1 else scores[0]
+
+    pattern = like_pattern(term)
+    score = literal(0.0)
+    for column, weight in weighted_columns:
+        score = score + case((column.ilike(pattern, escape=LIKE_ESCAPE), weight), else_=0.0)
+    return score
+
+
+def snippet_source(
+    db: Session, column: ColumnElement, term: str, radius: int = SNIPPET_RADIUS
+) -> tuple[ColumnElement, ColumnElement, ColumnElement]:
+    """Cut the text around the first match in SQL so list queries never load the full column.
+
+    Returns ``(excerpt, offset, total_length)``; the offset (0-based) and the full length let
+    :func:`highlight_snippet` decide on the ellipses. ``strpos`` (PostgreSQL) and ``instr``
+    (SQLite) are both 1-based and return 0 on a miss.
+    """
+
+    position_fn = func.strpos if db.get_bind().dialect.name == "postgresql" else func.instr
+    position = position_fn(func.lower(column), term.lower())
+    start = case((position > radius, position - radius), else_=1)
+    return func.substr(column, start, len(term) + radius * 2), start - 1, func.length(column)
+
+
+def highlight_snippet(
+    text: str | None,
+    term: str,
+    radius: int = SNIPPET_RADIUS,
+    *,
+    offset: int = 0,
+    total_length: int | None = None,
+) -> str | None:
+    """Return an HTML-escaped excerpt with the first match wrapped in ``<mark>``.
+
+    ``offset``/``total_length`` describe where ``text`` was cut from when it is already an excerpt.
+    """
+
+    if not text:
+        return None
+    index = text.lower().find(term.lower())
+    if index < 0:
+        return None
+
+    start = max(index - radius, 0)
+    end = min(index + len(term) + radius, len(text))
+    before = html.escape(text[start:index])
+    match = html.escape(text[index : index + len(term)])
+    after = html.escape(text[index + len(term) : end])
+    full_length = len(text) + offset if total_length is None else total_length
+    prefix = "…" if offset + start > 0 else ""
+    suffix = "…" if offset + end < full_length else ""
+    return f"{prefix}{before}{HIGHLIGHT_OPEN}{match}{HIGHLIGHT_CLOSE}{after}{suffix}"
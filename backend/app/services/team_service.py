@@ -1,14 +1,28 @@
 from __future__ import annotations
 
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import date, datetime
 
 from fastapi import HTTPException, status
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.models.detection import Detection
 from app.models.team import Team, TeamMember, TeamMemberRole
 from app.models.user import User
+from app.services.team_stats import read_team_stats
+
+
+@dataclass
+class TeamDailyStats:
+    day: date
+    detections: int = 0
+    chars_used: int = 0
+    score_sum: float = 0.0
+    label_counts: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def average_score(self) -> float | None:
+        return self.score_sum / self.detections if self.detections else None
 
 
 class TeamService:
@@ -71,23 +85,19 @@ class TeamService:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a team member")
         return member
 
-    def get_team_stats(self, team_id: int, user_id: int, start: datetime | None, end: datetime | None):
+    def get_team_stats(
+        self, team_id: int, user_id: int, start: datetime | None, end: datetime | None
+    ) -> list[TeamDailyStats]:
         self.ensure_membership(team_id, user_id)
 
-        detections_query = (
-            select(
-                func.date_trunc("day", Detection.created_at).label("day"),
-                func.count(Detection.id).label("count"),
-            )
-            .join(TeamMember, TeamMember.user_id == Detection.user_id)
-            .where(TeamMember.team_id == team_id)
-        )
-
-        if start:
-            detections_query = detections_query.where(Detection.created_at >= start)
-        if end:
-            detections_query = detections_query.where(Detection.created_at <= end)
-
-        detections_query = detections_query.group_by("day").order_by("day")
-        rows = self.db.execute(detections_query).all()
-        return rows
+        # 读预聚合的 team_daily_stats，代价只与区间天数相关，与检测明细量无关。
+        days: dict[date, TeamDailyStats] = {}
+        for row in read_team_stats(
+            self.db, team_id, start=start.date() if start else None, end=end.date() if end else None
+        ):
+            stats = days.setdefault(row.day, TeamDailyStats(day=row.day))
+            stats.detections += row.detections
+            stats.chars_used += int(row.chars_used)
+            stats.score_sum += row.score_sum
+            stats.label_counts[row.label] = stats.label_counts.get(row.label, 0) + row.detections
+        return list(days.values())
@@ -0,0 +1,201 @@
+"""Per-team, per-day detection rollups behind ``GET /teams/{id}/stats``.
+
+A detection counts towards every team its author is a member of and had
+joined by the time it was created (``team_members.joined_at <=
+detections.created_at``), judged by the current ``team_members`` rows. Detection
+writes apply this when they happen: ORM writes are folded in from the same
+flush, and write-behind inserts call :func:`apply_team_stat_rows`. Membership
+changes follow the same rule, so removing a member takes their detections out
+of that team's past days, and adding or back-dating one adds them. The periodic
+:func:`rebuild_team_stats` job recomputes the same attribution from scratch and
+repairs anything that bypassed the hooks (``ON DELETE CASCADE``, raw SQL).
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date, datetime, time, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import Connection, delete, event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.detection import Detection
+from app.models.team import TeamDailyStat, TeamMember
+from app.services.usage_rollups import apply_increments, ensure_utc
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+StatKey = tuple[int, date, str]
+
+
+def _team_joins(connection: Connection, user_ids: set[int]) -> dict[int, list[tuple[int, datetime]]]:
+    joins: dict[int, list[tuple[int, datetime]]] = defaultdict(list)
+    if not user_ids:
+        return joins
+    rows = connection.execute(
+        select(TeamMember.user_id, TeamMember.team_id, TeamMember.joined_at).where(TeamMember.user_id.in_(user_ids))
+    ).all()
+    for user_id, team_id, joined_at in rows:
+        joins[user_id].append((team_id, ensure_utc(joined_at)))
+    return joins
+
+
+def _apply_stat_deltas(connection: Connection, rows: Iterable, joins: dict[int, list[tuple[int, datetime]]], sign: int) -> None:
+    deltas: dict[StatKey, list[float]] = defaultdict(lambda: [0, 0, 0.0])
+    for row in rows:
+        created_at = ensure_utc(row.created_at or datetime.now(timezone.utc))
+        for team_id, joined_at in joins.get(row.user_id, ()):
+            if joined_at > created_at:
+                continue
+            values = deltas[(team_id, created_at.date(), row.result_label)]
+            values[0] += sign
+            values[1] += sign * int(row.chars_used or 0)
+            values[2] += sign * float(row.score or 0.0)
+
+    stat_rows = [
+        {"team_id": team_id, "day": day, "label": label, "detections": values[0], "chars_used": values[1], "score_sum": values[2]}
+        for (team_id, day, label), values in sorted(deltas.items())
+        if values[0]
+    ]
+    apply_increments(
+        connection,
+        TeamDailyStat.__table__,
+        stat_rows,
+        ["team_id", "day", "label"],
+        ["detections", "chars_used", "score_sum"],
+    )
+
+
+def apply_team_stat_rows(connection: Connection, rows: Iterable, *, sign: int = 1) -> None:
+    """Add (or with ``sign=-1`` remove) detection rows exposing ``user_id``, ``created_at``,
+    ``chars_used``, ``result_label`` and ``score``."""
+
+    rows = [row for row in rows if row.user_id is not None]
+    joins = _team_joins(connection, {row.user_id for row in rows})
+    if joins:
+        _apply_stat_deltas(connection, rows, joins, sign)
+
+
+def apply_membership_change(
+    connection: Connection,
+    team_id: int,
+    user_id: int,
+    joined_at: datetime,
+    *,
+    sign: int = 1,
+    skip_ids: frozenset[int] = frozenset(),
+) -> None:
+    """Add (or with ``sign=-1`` remove) a membership's detections: the user's rows created since ``joined_at``."""
+
+    joined_at = ensure_utc(joined_at)
+    # SQL 只按加入当天粗筛，精确的 joined_at <= created_at 在 _apply_stat_deltas 中比较：
+    # SQLite 上服务端默认时间与绑定参数的文本精度不同，直接在 SQL 里比较同一秒内的行会漏掉。
+    since = datetime.combine(joined_at.date(), time.min, tzinfo=timezone.utc)
+    result = connection.execute(
+        select(Detection.id, Detection.user_id, Detection.created_at, Detection.chars_used, Detection.result_label, Detection.score)
+        .where(Detection.user_id == user_id, Detection.created_at >= since)
+        .execution_options(yield_per=1000)
+    )
+    joins = {user_id: [(team_id, joined_at)]}
+    for batch in result.partitions():
+        _apply_stat_deltas(connection, [row for row in batch if row.id not in skip_ids], joins, sign)
+
+
+def _pending_values(detection: Detection) -> SimpleNamespace:
+    # 待插入对象的 created_at 可能由 server_default 生成，只从 __dict__ 取值，避免在 flush 中触发加载。
+    state = detection.__dict__
+    return SimpleNamespace(
+        user_id=state.get("user_id"),
+        created_at=state.get("created_at"),
+        chars_used=state.get("chars_used"),
+        result_label=detection.result_label,
+        score=detection.score,
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_team_stats(session: Session, flush_context, instances) -> None:
+    added = [_pending_values(obj) for obj in session.new if isinstance(obj, Detection)]
+    removed = [obj for obj in session.deleted if isinstance(obj, Detection)]
+    memberships = _membership_changes(session)
+    if not memberships and not any(row.user_id is not None for row in [*added, *removed]):
+        return
+    connection = session.connection()
+    apply_team_stat_rows(connection, added)
+    apply_team_stat_rows(connection, removed, sign=-1)
+    # 同一次 flush 里被删除的检测已经按上面扣过，这里跳过，避免重复扣减。
+    removed_ids = frozenset(obj.id for obj in removed if obj.id is not None)
+    for team_id, user_id, joined_at, sign in memberships:
+        apply_membership_change(connection, team_id, user_id, joined_at, sign=sign, skip_ids=removed_ids)
+
+
+def _membership_changes(session: Session) -> list[tuple[int, int, datetime, int]]:
+    changes: list[tuple[int, int, datetime, int]] = []
+    for obj in session.new:
+        # joined_at 由 server_default 取当前时间时，新成员之前没有可计入的检测。
+        if isinstance(obj, TeamMember) and obj.__dict__.get("joined_at") is not None:
+            changes.append((obj.team_id, obj.user_id, obj.joined_at, 1))
+    for obj in session.deleted:
+        if isinstance(obj, TeamMember):
+            changes.append((obj.team_id, obj.user_id, obj.joined_at, -1))
+    for obj in session.dirty:
+        if isinstance(obj, TeamMember):
+            history = inspect(obj).attrs.joined_at.history
+            if history.has_changes() and history.deleted and history.added:
+                changes.append((obj.team_id, obj.user_id, history.deleted[0], -1))
+                changes.append((obj.team_id, obj.user_id, history.added[0], 1))
+    return changes
+
+
+def rebuild_team_stats(db: Session, *, start: date, end: date) -> int:
+    """Recompute ``team_daily_stats`` for days in ``[start, end)``; returns the detections scanned.
+
+    Attribution uses the current memberships, the same rule the flush hooks apply.
+    """
+
+    range_start = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+    range_end = datetime(end.year, end.month, end.day, tzinfo=timezone.utc)
+    connection = db.connection()
+    connection.execute(delete(TeamDailyStat).where(TeamDailyStat.day >= start, TeamDailyStat.day < end))
+    detections = db.execute(
+        select(Detection.user_id, Detection.created_at, Detection.chars_used, Detection.result_label, Detection.score)
+        .where(
+            Detection.user_id.in_(select(TeamMember.user_id)),
+            Detection.created_at >= range_start,
+            Detection.created_at < range_end,
+        )
+        .execution_options(yield_per=1000)
+    )
+    batch: list = []
+    written = 0
+    for row in detections:
+        batch.append(row)
+        if len(batch) >= 1000:
+            apply_team_stat_rows(connection, batch)
+            written += len(batch)
+            batch = []
+    apply_team_stat_rows(connection, batch)
+    written += len(batch)
+    db.commit()
+    logger.info("Rebuilt team stats", extra={"start": start.isoformat(), "end": end.isoformat(), "detections": written})
+    return written
+
+
+def rebuild_recent_team_stats(db: Session, now: datetime | None = None) -> int:
+    now = ensure_utc(now or datetime.now(timezone.utc))
+    window = timedelta(hours=settings.usage_rollup_rebuild_window_hours)
+    return rebuild_team_stats(db, start=(now - window).date(), end=(now + timedelta(days=1)).date())
+
+
+def read_team_stats(db: Session, team_id: int, *, start: date | None, end: date | None) -> list[TeamDailyStat]:
+    query = select(TeamDailyStat).where(TeamDailyStat.team_id == team_id, TeamDailyStat.detections != 0)
+    if start is not None:
+        query = query.where(TeamDailyStat.day >= start)
+    if end is not None:
+        query = query.where(TeamDailyStat.day <= end)
+    return list(db.scalars(query.order_by(TeamDailyStat.day, TeamDailyStat.label)).all())
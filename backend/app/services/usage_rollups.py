@@ -0,0 +1,300 @@
+"""Hourly/daily usage rollups read by the admin overview.
+
+ORM inserts and deletes of detections and users are folded into
+``usage_rollups`` / ``usage_label_rollups`` inside the same flush, so the
+counters commit or roll back together with the rows they describe. Write-behind
+batch inserts call :func:`apply_usage_deltas` themselves. Changes that bypass
+the ORM (bulk ``DELETE``, ``ON DELETE CASCADE``) are repaired by the periodic
+:func:`rebuild_usage_rollups` job, which recomputes recent buckets from the raw
+tables. On PostgreSQL incremental writers hold a shared transaction-level
+advisory lock and the rebuild an exclusive one, so an increment is either
+committed before the rebuild reads the raw tables or applied after it commits.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Connection, delete, event, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.detection import Detection
+from app.models.usage_rollup import (
+    ROLLUP_DAY,
+    ROLLUP_HOUR,
+    UsageLabelRollup,
+    UsageRollup,
+)
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+GRANULARITIES = (ROLLUP_HOUR, ROLLUP_DAY)
+SQLITE_BUCKET_FORMATS = {ROLLUP_HOUR: "%Y-%m-%d %H:00:00", ROLLUP_DAY: "%Y-%m-%d 00:00:00"}
+USAGE_CHANGED_KEY = "usage_rollups_changed"
+USAGE_ROLLUP_LOCK_KEY = 0x75736167  # "usag"
+
+_change_callbacks: list[Callable[[], None]] = []
+
+
+def ensure_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    value = ensure_utc(value)
+    if granularity == ROLLUP_HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class UsageDeltas:
+    # (granularity, bucket_start) -> [detections, chars_used, new_users]
+    usage: dict[tuple[str, datetime], list[int]] = field(default_factory=lambda: defaultdict(lambda: [0, 0, 0]))
+    labels: dict[tuple[str, datetime, str], int] = field(default_factory=lambda: defaultdict(int))
+
+    def add_detection(self, created_at: datetime | None, chars_used: int | None, label: str, sign: int = 1) -> None:
+        created_at = created_at or datetime.now(timezone.utc)
+        for granularity in GRANULARITIES:
+            start = bucket_start(created_at, granularity)
+            counters = self.usage[(granularity, start)]
+            counters[0] += sign
+            counters[1] += sign * int(chars_used or 0)
+            self.labels[(granularity, start, label)] += sign
+
+    def add_user(self, created_at: datetime | None, sign: int = 1) -> None:
+        created_at = created_at or datetime.now(timezone.utc)
+        for granularity in GRANULARITIES:
+            self.usage[(granularity, bucket_start(created_at, granularity))][2] += sign
+
+    def __bool__(self) -> bool:
+        return bool(self.usage)
+
+
+def _upsert_statement(connection: Connection, table, rows: list[dict], key_columns: list[str], value_columns: list[str]):
+    dialect_name = connection.dialect.name
+    if dialect_name not in {"postgresql", "sqlite"}:
+        return None
+    insert_fn = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert_fn(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[name] for name in key_columns],
+        set_={name: table.c[name] + stmt.excluded[name] for name in value_columns},
+    )
+
+
+def apply_increments(connection: Connection, table, rows: list[dict], key_columns: list[str], value_columns: list[str]) -> None:
+    if not rows:
+        return
+    stmt = _upsert_statement(connection, table, rows, key_columns, value_columns)
+    if stmt is not None:
+        connection.execute(stmt)
+        return
+    for row in rows:
+        where = [table.c[name] == row[name] for name in key_columns]
+        result = connection.execute(
+            update(table).where(*where).values({name: table.c[name] + row[name] for name in value_columns})
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(row))
+
+
+def lock_usage_rollups(connection: Connection, *, exclusive: bool = False) -> None:
+    """Take the rollup advisory lock until the transaction ends (no-op outside PostgreSQL)."""
+
+    if connection.dialect.name != "postgresql":
+        return
+    lock = func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+    connection.execute(select(lock(USAGE_ROLLUP_LOCK_KEY)))
+
+
+def apply_usage_deltas(connection: Connection, deltas: UsageDeltas) -> None:
+    usage_rows = [
+        {"granularity": granularity, "bucket_start": start, "detections": values[0], "chars_used": values[1], "new_users": values[2]}
+        for (granularity, start), values in sorted(deltas.usage.items())
+        if any(values)
+    ]
+    label_rows = [
+        {"granularity": granularity, "bucket_start": start, "label": label, "detections": value}
+        for (granularity, start, label), value in sorted(deltas.labels.items())
+        if value
+    ]
+    if not usage_rows and not label_rows:
+        return
+    # 重算持有排他锁时在这里等它提交，增量叠加在重算结果之上，不会被重算覆盖或漏算。
+    lock_usage_rollups(connection)
+    # 按主键排序后写入，并发事务以相同顺序加行锁，避免互相死锁。
+    apply_increments(
+        connection,
+        UsageRollup.__table__,
+        usage_rows,
+        ["granularity", "bucket_start"],
+        ["detections", "chars_used", "new_users"],
+    )
+    apply_increments(connection, UsageLabelRollup.__table__, label_rows, ["granularity", "bucket_start", "label"], ["detections"])
+
+
+def detection_deltas(rows: Iterable, *, sign: int = 1) -> UsageDeltas:
+    """Deltas for detection rows written outside the ORM (``created_at``, ``chars_used``, ``result_label``);
+    ``sign=-1`` for deleted rows."""
+
+    deltas = UsageDeltas()
+    for row in rows:
+        deltas.add_detection(row.created_at, row.chars_used, row.result_label, sign=sign)
+    return deltas
+
+
+def on_usage_change(callback: Callable[[], None]) -> None:
+    """Register a callback fired after a commit that wrote detections or users (cache invalidation)."""
+
+    _change_callbacks.append(callback)
+
+
+def mark_usage_changed(session: Session) -> None:
+    session.info[USAGE_CHANGED_KEY] = True
+
+
+def notify_usage_changed() -> None:
+    """Fire the change callbacks; for writers that commit outside a :class:`Session`."""
+
+    for callback in _change_callbacks:
+        try:
+            callback()
+        except Exception as exc:  # pragma: no cover - 回调失败不能影响已提交的事务
+            logger.error("Usage change callback failed", exc_info=exc)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_usage_change(session: Session) -> None:
+    if session.info.pop(USAGE_CHANGED_KEY, False):
+        notify_usage_changed()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_usage_change(session: Session) -> None:
+    session.info.pop(USAGE_CHANGED_KEY, None)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_usage_deltas(session: Session, flush_context, instances) -> None:
+    if any(isinstance(obj, User) for obj in session.dirty):
+        mark_usage_changed(session)
+    deltas = UsageDeltas()
+    for obj in session.new:
+        if isinstance(obj, Detection):
+            # created_at 由 server_default 生成时此刻还没有值，按当前时间落桶。
+            deltas.add_detection(obj.__dict__.get("created_at"), obj.__dict__.get("chars_used"), obj.result_label)
+        elif isinstance(obj, User):
+            deltas.add_user(obj.__dict__.get("created_at"))
+    for obj in session.deleted:
+        if isinstance(obj, Detection):
+            deltas.add_detection(obj.created_at, obj.chars_used, obj.result_label, sign=-1)
+        elif isinstance(obj, User):
+            deltas.add_user(obj.created_at, sign=-1)
+    if deltas:
+        apply_usage_deltas(session.connection(), deltas)
+        mark_usage_changed(session)
+
+
+def _bucket_expression(db: Session, column, granularity: str):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(granularity, column, "UTC")
+    return func.strftime(SQLITE_BUCKET_FORMATS[granularity], column)
+
+
+def _as_bucket(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return ensure_utc(value)
+
+
+def rebuild_usage_rollups(db: Session, *, start: datetime, end: datetime) -> int:
+    """Recompute every bucket in ``[start, end)`` from ``detections`` and ``users``.
+
+    ``start``/``end`` are widened to whole days so hour and day rows stay consistent.
+    Holds the exclusive rollup lock, so concurrent increments are neither lost nor
+    counted twice. Returns the number of rollup rows written.
+    """
+
+    start = bucket_start(start, ROLLUP_DAY)
+    day_end = bucket_start(end, ROLLUP_DAY)
+    end = day_end if day_end == ensure_utc(end) else day_end + timedelta(days=1)
+
+    # 先等已经写入增量的事务提交，再读原始表；之后的增量写入等到本次重算提交后再叠加。
+    lock_usage_rollups(db.connection(), exclusive=True)
+    deltas = UsageDeltas()
+    for granularity in GRANULARITIES:
+        detection_bucket = _bucket_expression(db, Detection.created_at, granularity)
+        detection_rows = db.execute(
+            select(detection_bucket, Detection.result_label, func.count(Detection.id), func.coalesce(func.sum(Detection.chars_used), 0))
+            .where(Detection.created_at >= start, Detection.created_at < end)
+            .group_by(detection_bucket, Detection.result_label)
+        ).all()
+        for bucket, label, count, chars in detection_rows:
+            key = (granularity, _as_bucket(bucket))
+            deltas.usage[key][0] += int(count)
+            deltas.usage[key][1] += int(chars)
+            deltas.labels[(granularity, key[1], label)] += int(count)
+
+        user_bucket = _bucket_expression(db, User.created_at, granularity)
+        user_rows = db.execute(
+            select(user_bucket, func.count(User.id))
+            .where(User.created_at >= start, User.created_at < end)
+            .group_by(user_bucket)
+        ).all()
+        for bucket, count in user_rows:
+            deltas.usage[(granularity, _as_bucket(bucket))][2] += int(count)
+
+    connection = db.connection()
+    for table in (UsageRollup.__table__, UsageLabelRollup.__table__):
+        connection.execute(delete(table).where(table.c.bucket_start >= start, table.c.bucket_start < end))
+    apply_usage_deltas(connection, deltas)
+    mark_usage_changed(db)
+    db.commit()
+    written = len(deltas.usage) + len(deltas.labels)
+    logger.info("Rebuilt usage rollups", extra={"start": start.isoformat(), "end": end.isoformat(), "rows": written})
+    return written
+
+
+def rebuild_recent_usage_rollups(db: Session, now: datetime | None = None) -> int:
+    now = ensure_utc(now or datetime.now(timezone.utc))
+    window = timedelta(hours=settings.usage_rollup_rebuild_window_hours)
+    return rebuild_usage_rollups(db, start=now - window, end=now + timedelta(days=1))
+
+
+def read_usage_rollups(db: Session, *, granularity: str, start: datetime, end: datetime) -> list[UsageRollup]:
+    return list(
+        db.scalars(
+            select(UsageRollup)
+            .where(
+                UsageRollup.granularity == granularity,
+                UsageRollup.bucket_start >= start,
+                UsageRollup.bucket_start < end,
+            )
+            .order_by(UsageRollup.bucket_start)
+        ).all()
+    )
+
+
+def read_label_counts(db: Session, *, granularity: str, start: datetime, end: datetime) -> dict[str, int]:
+    rows = db.execute(
+        select(UsageLabelRollup.label, func.sum(UsageLabelRollup.detections))
+        .where(
+            UsageLabelRollup.granularity == granularity,
+            UsageLabelRollup.bucket_start >= start,
+            UsageLabelRollup.bucket_start < end,
+        )
+        .group_by(UsageLabelRollup.label)
+    ).all()
+    return {label: int(count) for label, count in sorted(rows) if count}
@@ -52,6 +52,43 @@ def fake_tokenizer(monkeypatch):
     monkeypatch.setattr("app.services.token_chunker.get_tokenizer", lambda model_name=None: FakeTokenizer())
 
 
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    from app.services.api_key_cache import api_key_cache, last_used_recorder
+    from app.services.file_parsing import parse_metrics, parsed_text_cache
+    from app.services.list_counts import list_count_cache
+    from app.services.overview_cache import overview_cache
+    from app.services.principal_cache import principal_cache
+    from app.services.quota_cache import quota_counter_cache
+    from app.services.report_rendering import report_cache
+    from app.services.retention import retention_metrics
+    from app.services.scan_example_service import scan_example_cache
+
+    quota_counter_cache.reset()
+    list_count_cache.reset()
+    overview_cache.reset()
+    retention_metrics.reset()
+    api_key_cache.reset()
+    last_used_recorder.reset()
+    principal_cache.reset()
+    scan_example_cache.reset()
+    parse_metrics.reset()
+    parsed_text_cache.reset()
+    report_cache.reset()
+    yield
+    quota_counter_cache.reset()
+    list_count_cache.reset()
+    overview_cache.reset()
+    retention_metrics.reset()
+    api_key_cache.reset()
+    last_used_recorder.reset()
+    principal_cache.reset()
+    scan_example_cache.reset()
+    parse_metrics.reset()
+    parsed_text_cache.reset()
+    report_cache.reset()
+
+
 @pytest.fixture(scope="session", autouse=True)
 def configure_test_settings():
     from app.api.v1 import auth as auth_api
@@ -1,10 +1,14 @@
+import json
+
 import pytest
 from fastapi import HTTPException
+from sqlalchemy import inspect
 
 from app.api.v1.admin import (
     adjust_admin_user_credits,
     admin_status,
     delete_admin_detection,
+    export_admin_detections,
     get_admin_detection,
     get_admin_overview,
     get_admin_user,
@@ -16,6 +20,7 @@ from app.api.v1.auth import register_user
 from app.core.roles import UserRole
 from app.schemas.admin import AdminOverviewPreset, AdminUserCreditsAdjustRequest, AdminUserUpdateRequest
 from app.schemas.auth import RegisterRequest
+from app.services.admin_service import AdminService
 from app.services.detection_service import DetectionService
 
 
@@ -50,11 +55,13 @@ async def _create_user(db_session, email: str, role: UserRole = UserRole.INDIVID
     return user
 
 
-def _create_detection(db_session, user, *, label: str = "ai", score: float = 0.91):
+def _create_detection(
+    db_session, user, *, label: str = "ai", score: float = 0.91, text: str = "This is a generated test text."
+):
     service = DetectionService(db_session)
     return service.create_detection(
         user_id=user.id,
-        text="This is a generated test text.",
+        text=text,
         label=label,
         score=score,
         functions_used=["scan"],
@@ -81,12 +88,19 @@ async def test_admin_status_and_overview(db_session, unique_email):
     assert overview.summary.active_users == 2
     assert overview.summary.new_users == 2
     assert overview.summary.detections == 1
+    assert overview.summary.label_counts == {"ai": 1}
     assert len(overview.series) == 7
     assert sum(item.new_users for item in overview.series) == 2
     assert sum(item.detections for item in overview.series) == 1
     assert overview.recent_users[0].id in {admin.id, normal.id}
     assert len(overview.recent_detections) == 1
 
+    cached = await get_admin_overview(db=db_session, _=admin, preset=AdminOverviewPreset.WEEK)
+    assert cached is overview
+    _create_detection(db_session, normal)
+    refreshed = await get_admin_overview(db=db_session, _=admin, preset=AdminOverviewPreset.WEEK)
+    assert refreshed.summary.detections == 2
+
 
 @pytest.mark.anyio
 async def test_list_and_update_admin_users(db_session, unique_email):
@@ -104,6 +118,8 @@ async def test_list_and_update_admin_users(db_session, unique_email):
         plan_tier=None,
         sort="createdAt",
         order="desc",
+        cursor=None,
+        include_total=True,
     )
     assert listed.total == 1
     assert listed.items[0].email == member.email
@@ -167,6 +183,8 @@ async def test_list_get_and_delete_admin_detections(db_session, unique_email):
         date_to=None,
         sort="createdAt",
         order="desc",
+        cursor=None,
+        include_total=True,
     )
     assert listed.total == 1
     assert listed.items[0].id == detection.id
@@ -192,5 +210,194 @@ async def test_list_get_and_delete_admin_detections(db_session, unique_email):
         date_to=None,
         sort="createdAt",
         order="desc",
+        cursor=None,
+        include_total=True,
     )
     assert after_delete.total == 0
+
+
+@pytest.mark.anyio
+async def test_admin_detection_list_defers_payload_columns(db_session, unique_email):
+    member = await _create_user(db_session, unique_email)
+    member_id = member.id
+    detection_id = _create_detection(db_session, member).id
+    db_session.expunge_all()
+
+    service = AdminService(db_session)
+    items, _, _ = service.list_detections(page=1, page_size=20, user_id=member_id)
+    assert {"input_text", "editor_html", "meta_json"} <= inspect(items[0].detection).unloaded
+
+    db_session.expunge_all()
+    detail = service.get_detection(detection_id)
+    assert not {"input_text", "editor_html", "meta_json"} & inspect(detail.detection).unloaded
+    assert detail.detection.meta_json["analysis"]["summary"]["ai"] == 90
+
+
+@pytest.mark.anyio
+async def test_admin_detection_search_returns_snippets_ranked_by_relevance(db_session, unique_email):
+    admin = await _create_user(db_session, unique_email, role=UserRole.SYS_ADMIN)
+    member = await _create_user(db_session, f"member-{unique_email}")
+    detection = _create_detection(db_session, member)
+
+    listed = await list_admin_detections(
+        db=db_session,
+        _=admin,
+        page=1,
+        page_size=20,
+        search="GENERATED",
+        user_id=member.id,
+        actor_type=None,
+        label=None,
+        function_name=None,
+        date_from=None,
+        date_to=None,
+        sort="relevance",
+        order="desc",
+        cursor=None,
+        include_total=True,
+    )
+    assert listed.total == 1
+    assert listed.items[0].id == detection.id
+    assert listed.items[0].snippet == "This is a <mark>generated</mark> test text."
+
+    wildcard = await list_admin_detections(
+        db=db_session,
+        _=admin,
+        page=1,
+        page_size=20,
+        search="%",
+        user_id=member.id,
+        actor_type=None,
+        label=None,
+        function_name=None,
+        date_from=None,
+        date_to=None,
+        sort="createdAt",
+        order="desc",
+        cursor=None,
+        include_total=True,
+    )
+    assert wildcard.total == 0
+
+    _create_detection(db_session, member, text="a" * 100 + " generated " + "b" * 100)
+    excerpt = await list_admin_detections(
+        db=db_session,
+        _=admin,
+        page=1,
+        page_size=20,
+        search="generated",
+        user_id=member.id,
+        actor_type=None,
+        label=None,
+        function_name=None,
+        date_from=None,
+        date_to=None,
+        sort="createdAt",
+        order="desc",
+        cursor=None,
+        include_total=False,
+    )
+    long_snippet = excerpt.items[0].snippet
+    assert long_snippet.startswith("…a") and long_snippet.endswith("b…")
+    assert "<mark>generated</mark>" in long_snippet
+
+
+@pytest.mark.anyio
+async def test_admin_detection_list_pages_with_cursor(db_session, unique_email):
+    admin = await _create_user(db_session, unique_email, role=UserRole.SYS_ADMIN)
+    member = await _create_user(db_session, f"member-{unique_email}")
+    created = [_create_detection(db_session, member, score=score) for score in (0.3, 0.9, 0.9, 0.5)]
+
+    async def fetch(cursor):
+        return await list_admin_detections(
+            db=db_session,
+            _=admin,
+            page=1,
+            page_size=3,
+            search=None,
+            user_id=member.id,
+            actor_type=None,
+            label=None,
+            function_name=None,
+            date_from=None,
+            date_to=None,
+            sort="score",
+            order="desc",
+            cursor=cursor,
+            include_total=False,
+        )
+
+    first = await fetch(None)
+    second = await fetch(first.next_cursor)
+    assert first.total is None
+    assert second.next_cursor is None
+    walked = [item.id for item in first.items + second.items]
+    expected = sorted(created, key=lambda detection: (detection.score, detection.id), reverse=True)
+    assert walked == [detection.id for detection in expected]
+
+
+@pytest.mark.anyio
+async def test_admin_user_total_switches_to_cached_count_above_threshold(db_session, unique_email, monkeypatch):
+    from app.services import list_counts
+
+    admin = await _create_user(db_session, unique_email, role=UserRole.SYS_ADMIN)
+    for index in range(3):
+        await _create_user(db_session, f"bulk{index}-{unique_email}")
+
+    async def _list():
+        return await list_admin_users(
+            db=db_session,
+            _=admin,
+            page=1,
+            page_size=20,
+            search="bulk",
+            system_role=None,
+            is_active=None,
+            plan_tier=None,
+            sort="createdAt",
+            order="desc",
+            cursor=None,
+            include_total=True,
+        )
+
+    small = await _list()
+    assert (small.total, small.total_exact) == (3, True)
+
+    monkeypatch.setattr(list_counts.settings, "list_count_exact_threshold", 1)
+    first = await _list()
+    await _create_user(db_session, f"bulk9-{unique_email}")
+    cached = await _list()
+    assert (first.total, first.total_exact) == (3, True)
+    assert (cached.total, cached.total_exact) == (3, False)
+    assert list_counts.list_count_cache.stats()["cache_hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_export_admin_detections_applies_list_filters(db_session, unique_email):
+    admin = await _create_user(db_session, unique_email, role=UserRole.SYS_ADMIN)
+    member = await _create_user(db_session, f"member-{unique_email}")
+    ai_detection = _create_detection(db_session, member, label="ai")
+    _create_detection(db_session, member, label="human", score=0.12)
+
+    response = await export_admin_detections(
+        db=db_session,
+        _=admin,
+        export_format="ndjson",
+        columns="id,userEmail,label,createdAt",
+        search=None,
+        user_id=member.id,
+        actor_type=None,
+        label="ai",
+        function_name=None,
+        date_from=None,
+        date_to=None,
+        gzip=False,
+    )
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    rows = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["id"] == ai_detection.id
+    assert rows[0]["userEmail"] == member.email
+    assert rows[0]["label"] == "ai"
+    assert list(rows[0]) == ["id", "userEmail", "label", "createdAt"]
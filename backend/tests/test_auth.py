@@ -2,12 +2,23 @@ import pytest
 from fastapi import HTTPException, Response
 from starlette.requests import Request
 
-from app.api.v1.auth import guest_login, login, logout, read_current_user, register_user
+from app.api.v1.auth import (
+    guest_login,
+    login,
+    logout,
+    read_current_user,
+    register_user,
+    update_current_user_profile,
+)
 from app.core.rate_limit import auth_rate_limiter
 from app.api.v1.detections import detect
 from app.api.v1.quota import get_quota
-from app.db.deps import get_current_actor
+from app.core.security import create_access_token
+from app.db.deps import get_current_actor, get_current_user
+from app.db.session import LazySession
 from app.schemas.auth import GuestTokenRequest, LoginRequest, RegisterRequest
+from app.schemas.user import UserProfileUpdate
+from app.services.admin_service import AdminService
 from app.schemas.detection import DetectionRequest
 from app.services.repre_guard_client import repre_guard_client
 
@@ -157,3 +168,28 @@ async def test_logout_clears_auth_cookie():
     response = await logout()
     assert response.status_code == 204
     assert "aid_access_token=" in response.headers.get("set-cookie", "")
+
+
+def _no_session():
+    raise AssertionError("auth dependency opened a database session")
+
+
+@pytest.mark.anyio
+async def test_principal_cache_skips_session_and_invalidates_on_user_updates(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
+    token = create_access_token(subject=str(user.id))
+
+    assert get_current_user(db=db_session, token=token).id == user.id
+    cached = get_current_user(db=LazySession(_no_session), token=token)
+    assert cached.email == unique_email
+
+    guest = await guest_login()
+    assert get_current_actor(db=LazySession(_no_session), token=guest.access_token).actor_type == "guest"
+
+    await update_current_user_profile(payload=UserProfileUpdate(firstName="Cache"), current_user=cached, db=db_session)
+    assert get_current_user(db=db_session, token=token).first_name == "Cache"
+
+    AdminService(db_session).update_user(user.id, is_active=False)
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(db=db_session, token=token)
+    assert exc_info.value.status_code == 401
@@ -1,6 +1,9 @@
+from io import BytesIO
 from math import exp
 
 import pytest
+from docx import Document
+from fastapi import UploadFile
 
 from app.api.v1.auth import register_user
 from fastapi import HTTPException
@@ -10,6 +13,7 @@ from app.api.v1.detections import (
     _merge_short_paragraphs,
     _split_paragraphs,
     detect,
+    detect_file,
     detect_scan,
     list_detections,
 )
@@ -149,6 +153,8 @@ async def test_detect_with_user(db_session, unique_email):
         page_size=10,
         from_time=None,
         to_time=None,
+        cursor=None,
+        include_total=True,
     )
     assert listed.total == 1
     assert listed.items[0].meta_json["options"]["api_key"] == "***"
@@ -596,3 +602,35 @@ async def test_detect_supports_probability_score_type(db_session, unique_email,
     assert response.result.sentences[0].type == "ai"
     assert response.result.sentences[0].probability >= 0.67
 
+
+
+@pytest.mark.anyio
+async def test_detect_file_parses_and_detects_each_upload(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
+    actor = ActorContext(actor_type="user", actor_id=str(user.id), user=user)
+    document = Document()
+    document.add_paragraph(LONG_TEXT)
+    docx_buffer = BytesIO()
+    document.save(docx_buffer)
+    docx_buffer.seek(0)
+
+    response = await detect_file(
+        db=db_session,
+        current_user=user,
+        current_actor=actor,
+        files=[
+            UploadFile(file=docx_buffer, filename="essay.docx"),
+            UploadFile(file=BytesIO(b"too short"), filename="note.txt"),
+            UploadFile(file=BytesIO(b"x"), filename="tool.exe"),
+        ],
+        functions=["scan"],
+    )
+
+    essay, note, tool = response.results
+    assert essay.error is None
+    assert essay.detection.input_text == LONG_TEXT
+    assert essay.detection.history_id > 0
+    assert note.detection is None
+    assert note.error.code == "TEXT_TOO_SHORT"
+    assert tool.error.code == "INVALID_FILE"
+    assert tool.error.message == "Unsupported file type: .exe"
@@ -0,0 +1,159 @@
+import importlib.util
+import os
+import uuid
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from app.db.base_class import Base
+from app.models.detection import Detection
+from app.models.history_counter import UserHistoryCounter
+from app.models.team import Team, TeamDailyStat, TeamMember, TeamMemberRole
+from app.models.usage_rollup import UsageRollup
+from app.models.user import User
+from app.services import list_counts
+from app.services.detection_partitions import (
+    add_months,
+    detach_detection_partitions,
+    ensure_detection_partitions,
+    list_detection_partitions,
+    partition_month,
+    partition_name,
+)
+
+PARTITION_MIGRATION = Path(__file__).resolve().parents[1] / "alembic" / "versions" / "20240923_0019_partition_detections_by_month.py"
+
+
+@pytest.fixture()
+def pg_engine():
+    """A scratch schema on ``TEST_POSTGRES_URL`` with ``detections`` partitioned by migration 0019."""
+
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    schema = f"partition_test_{uuid.uuid4().hex[:12]}"
+    admin_engine = create_engine(url, future=True)
+    with admin_engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(url, future=True, connect_args={"options": f"-csearch_path={schema},public"})
+    try:
+        Base.metadata.create_all(engine)
+        spec = importlib.util.spec_from_file_location("partition_migration", PARTITION_MIGRATION)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+        with engine.begin() as conn, Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+        yield engine
+    finally:
+        engine.dispose()
+        with admin_engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin_engine.dispose()
+
+
+def _insert_detection(engine, created_at: datetime, user_id: int | None = None) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO detections (user_id, actor_type, actor_id, chars_used, input_text, result_label, score, created_at) "
+                "VALUES (:user_id, 'guest', 'g-1', 10, 'text', 'ai', 0.9, :created_at)"
+            ),
+            {"user_id": user_id, "created_at": created_at},
+        )
+
+
+def test_partition_names_round_trip_across_year_boundary():
+    months = [add_months(date(2026, 11, 1), offset) for offset in range(4)]
+    assert months == [date(2026, 11, 1), date(2026, 12, 1), date(2027, 1, 1), date(2027, 2, 1)]
+    assert [partition_name(month) for month in months[1:3]] == ["detections_p202612", "detections_p202701"]
+    assert partition_month("detections_p202701") == date(2027, 1, 1)
+    assert partition_month("detections_default") is None
+
+
+def test_partition_maintenance_is_noop_without_postgres(engine):
+    assert ensure_detection_partitions(engine, months_ahead=3, today=date(2026, 3, 18)) == []
+    assert detach_detection_partitions(engine, before=date(2025, 1, 1), drop=True) == []
+
+
+def test_detach_old_month_on_postgres(pg_engine):
+    month = add_months(datetime.now(timezone.utc).date().replace(day=1), -2)
+    assert ensure_detection_partitions(pg_engine, months_ahead=0, today=month) == [partition_name(month)]
+    _insert_detection(pg_engine, datetime(month.year, month.month, 15, tzinfo=timezone.utc))
+
+    assert detach_detection_partitions(pg_engine, before=add_months(month, 1), drop=True) == [partition_name(month)]
+
+    assert partition_name(month) not in list_detection_partitions(pg_engine)
+    with pg_engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM detections")).scalar() == 0
+
+
+def test_ensure_moves_rows_out_of_default_partition(pg_engine):
+    month = add_months(datetime.now(timezone.utc).date().replace(day=1), -2)
+    _insert_detection(pg_engine, datetime(month.year, month.month, 15, tzinfo=timezone.utc))
+    with pg_engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM detections_default")).scalar() == 1
+
+    assert ensure_detection_partitions(pg_engine, months_ahead=0, today=month) == [partition_name(month)]
+
+    with pg_engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM detections_default")).scalar() == 0
+        assert conn.execute(text(f"SELECT count(*) FROM {partition_name(month)}")).scalar() == 1
+    assert partition_name(month) in list_detection_partitions(pg_engine)
+
+
+def test_detach_subtracts_aggregates_on_postgres(pg_engine):
+    month = add_months(datetime.now(timezone.utc).date().replace(day=1), -2)
+    ensure_detection_partitions(pg_engine, months_ahead=0, today=month)
+    created_at = datetime(month.year, month.month, 15, 9, tzinfo=timezone.utc)
+    with Session(pg_engine) as db:
+        user = User(email="partition@example.com", name="partition", password_hash="x")
+        team = Team(name="partition-team")
+        db.add_all([user, team])
+        db.flush()
+        joined_at = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+        db.add(TeamMember(team_id=team.id, user_id=user.id, role=TeamMemberRole.MEMBER, joined_at=joined_at))
+        db.flush()
+        db.add(
+            Detection(
+                user_id=user.id,
+                actor_type="user",
+                actor_id=str(user.id),
+                chars_used=10,
+                input_text="text",
+                result_label="ai",
+                score=0.9,
+                created_at=created_at,
+            )
+        )
+        db.commit()
+        user_id, team_id = user.id, team.id
+
+    detach_detection_partitions(pg_engine, before=add_months(month, 1), drop=True)
+
+    with Session(pg_engine) as db:
+        usage = db.scalar(select(func.sum(UsageRollup.detections)).where(UsageRollup.bucket_start < add_months(month, 1)))
+        assert not usage
+        assert not db.scalar(select(func.sum(TeamDailyStat.detections)).where(TeamDailyStat.team_id == team_id))
+        assert not db.scalar(select(UserHistoryCounter.records).where(UserHistoryCounter.user_id == user_id))
+
+
+def test_estimated_rows_sum_partitions_on_postgres(pg_engine):
+    month = add_months(datetime.now(timezone.utc).date().replace(day=1), -2)
+    ensure_detection_partitions(pg_engine, months_ahead=0, today=month)
+    for day in (3, 4, 5):
+        _insert_detection(pg_engine, datetime(month.year, month.month, day, tzinfo=timezone.utc))
+    _insert_detection(pg_engine, datetime.now(timezone.utc))
+    # autovacuum 只 ANALYZE 各分区，从不 ANALYZE 分区父表。
+    with pg_engine.begin() as conn:
+        for name in list_detection_partitions(pg_engine):
+            conn.execute(text(f"ANALYZE {name}"))
+
+    with Session(pg_engine) as db:
+        assert list_counts._estimated_rows(db, "detections") == 4
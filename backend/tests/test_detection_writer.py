@@ -0,0 +1,123 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base_class import Base
+from app.models.detection import Detection
+from app.services.detection_writer import DetectionWriteBehind
+
+
+def _build_writer(tmp_path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'writer.db'}", future=True)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, future=True)
+    writer = DetectionWriteBehind(session_factory, tmp_path / "spool", batch_size=2, flush_interval=60)
+    return writer, session_factory
+
+
+def _row(detection_id: int) -> dict:
+    return {
+        "id": detection_id,
+        "user_id": None,
+        "actor_type": "guest",
+        "actor_id": "write-behind",
+        "chars_used": 300,
+        "title": None,
+        "input_text": "queued detection",
+        "editor_html": None,
+        "functions_used": ["scan"],
+        "result_label": "ai",
+        "score": 0.8,
+        "is_pinned": False,
+        "created_at": datetime.now(timezone.utc),
+        "meta_json": {"analysis": {"summary": {"ai": 100, "mixed": 0, "human": 0}}},
+    }
+
+
+def test_write_behind_flushes_spooled_rows_in_batches(tmp_path):
+    writer, session_factory = _build_writer(tmp_path)
+    writer.start()
+    try:
+        for detection_id in (101, 102, 103):
+            writer.enqueue(_row(detection_id))
+        writer.flush()
+    finally:
+        writer.stop()
+
+    with session_factory() as db:
+        ids = list(db.scalars(select(Detection.id).order_by(Detection.id)).all())
+    assert ids == [101, 102, 103]
+    assert writer.stats()["queue_depth"] == 0
+    assert list((tmp_path / "spool").iterdir()) == []
+
+
+def test_write_behind_replays_spool_left_by_dead_worker(tmp_path):
+    writer, session_factory = _build_writer(tmp_path)
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    crashed = DetectionWriteBehind(session_factory, spool_dir)
+    complete_line = (
+        '{"id":201,"actor_type":"guest","actor_id":"crash","chars_used":1,"input_text":"x",'
+        '"result_label":"ai","score":0.5,"is_pinned":false,"created_at":"2026-03-20T00:00:00+00:00"}'
+    )
+    truncated_line = '{"id":202,"actor_type":"gue'
+    (spool_dir / f"{crashed.owner}.spool").write_text(f"{complete_line}\n{truncated_line}", encoding="utf-8")
+
+    writer.start()
+    try:
+        assert writer.stats()["recovered_rows"] == 1
+        writer.flush()
+    finally:
+        writer.stop()
+
+    with session_factory() as db:
+        assert db.scalar(select(func.count(Detection.id))) == 1
+        assert db.get(Detection, 201).actor_id == "crash"
+
+
+def test_write_behind_dead_letters_rejected_rows(tmp_path):
+    writer, session_factory = _build_writer(tmp_path)
+    poison = {**_row(302), "actor_id": None}
+    writer.start()
+    try:
+        for row in (_row(301), poison, _row(303)):
+            writer.enqueue(row)
+        writer.flush()
+        stats = writer.stats()
+    finally:
+        writer.stop()
+
+    with session_factory() as db:
+        ids = list(db.scalars(select(Detection.id).order_by(Detection.id)).all())
+    assert ids == [301, 303]
+    assert stats["dead_lettered_rows"] == 1
+    assert stats["pending_segments"] == 0
+    dead_letters = list((tmp_path / "spool").glob("*.deadletter"))
+    assert len(dead_letters) == 1
+    assert '"id":302' in dead_letters[0].read_text(encoding="utf-8")
+
+
+def test_write_behind_orphan_is_adopted_by_one_worker(tmp_path):
+    writer, session_factory = _build_writer(tmp_path)
+    other = DetectionWriteBehind(session_factory, tmp_path / "spool", batch_size=2, flush_interval=60)
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    crashed = DetectionWriteBehind(session_factory, spool_dir)
+    (spool_dir / f"{crashed.owner}.spool").write_text(
+        '{"id":401,"actor_type":"guest","actor_id":"crash","chars_used":1,"input_text":"x",'
+        '"result_label":"ai","score":0.5,"is_pinned":false,"created_at":"2026-03-20T00:00:00+00:00"}\n',
+        encoding="utf-8",
+    )
+
+    writer.start()
+    other.start()
+    try:
+        assert writer.stats()["recovered_rows"] + other.stats()["recovered_rows"] == 1
+        assert other.stats()["recovered_rows"] == 0
+    finally:
+        writer.stop()
+        other.stop()
+
+    with session_factory() as db:
+        assert db.scalar(select(func.count(Detection.id))) == 1
@@ -0,0 +1,210 @@
+import asyncio
+import threading
+import time
+from io import BytesIO
+
+import pytest
+from docx import Document
+from fastapi import UploadFile
+from reportlab.pdfgen import canvas
+
+from app.api.v1.detections import parse_files
+from app.services import file_parsing
+from app.services.file_parsing import (
+    FileParseError,
+    FileParseTimeoutError,
+    FileTooLargeError,
+    ParsedText,
+    ParsedTextCache,
+    collect_text,
+    file_parser_pool,
+    parse_file,
+    parse_metrics,
+    parsed_text_cache,
+    spool_upload,
+)
+
+
+def _pdf_bytes(*pages: str) -> bytes:
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for text in pages:
+        pdf.drawString(72, 720, text)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _docx_bytes(*paragraphs: str) -> bytes:
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.mark.anyio
+async def test_parse_files_parses_in_subprocesses_and_keeps_order():
+    files = [
+        UploadFile(file=BytesIO(_docx_bytes("first", "second")), filename="a.docx"),
+        UploadFile(file=BytesIO(b"plain text"), filename="b.txt"),
+        UploadFile(file=BytesIO(b"%PDF-broken"), filename="c.pdf"),
+        UploadFile(file=BytesIO(b"x"), filename="d.exe"),
+    ]
+
+    response = await parse_files(current_user=object(), files=files)
+
+    assert [item.file_name for item in response.results] == ["a.docx", "b.txt", "c.pdf", "d.exe"]
+    assert response.results[0].content == "first\nsecond"
+    assert response.results[1].content == "plain text"
+    assert response.results[2].content is None
+    assert response.results[2].error.startswith("Failed to parse file:")
+    assert response.results[3].error == "Unsupported file type: .exe"
+
+    stats = parse_metrics.stats()
+    assert stats[".docx"]["count"] == 1 and stats[".docx"]["errors"] == 0
+    assert stats[".pdf"]["errors"] == 1
+    assert stats[".txt"]["count"] == 1
+
+
+@pytest.mark.anyio
+async def test_parse_files_truncates_pdf_at_detect_limit(monkeypatch):
+    monkeypatch.setattr("app.api.v1.detections.MAX_DETECT_CHARS", 12)
+    files = [
+        UploadFile(file=BytesIO(_pdf_bytes("page one text", "page two text")), filename="long.pdf"),
+        UploadFile(file=BytesIO(_pdf_bytes("short")), filename="short.pdf"),
+    ]
+
+    response = await parse_files(current_user=object(), files=files)
+
+    assert response.results[0].content == "page one tex"
+    assert response.results[0].truncated is True
+    assert response.results[1].content == "short"
+    assert response.results[1].truncated is False
+
+
+@pytest.mark.anyio
+async def test_parse_files_rejects_oversized_upload_while_spooling(monkeypatch):
+    monkeypatch.setattr("app.api.v1.detections.MAX_FILE_SIZE_BYTES", 10)
+
+    response = await parse_files(current_user=object(), files=[UploadFile(file=BytesIO(b"x" * 11), filename="big.txt")])
+
+    assert response.results[0].error == "File too large. Max 10 bytes."
+
+
+def test_spool_upload_stops_reading_past_limit(tmp_path):
+    source = BytesIO(b"x" * (3 * file_parsing.SPOOL_CHUNK_BYTES))
+
+    with pytest.raises(FileTooLargeError):
+        spool_upload(source, tmp_path / "upload.bin", file_parsing.SPOOL_CHUNK_BYTES + 1)
+
+    assert source.tell() == 2 * file_parsing.SPOOL_CHUNK_BYTES
+
+
+def test_collect_text_stops_consuming_pages_at_limit():
+    consumed = []
+
+    def pages():
+        for number in range(100):
+            consumed.append(number)
+            yield "\n" if number == 0 else f"page-{number}"
+
+    parsed = collect_text(pages(), max_chars=15)
+
+    assert parsed.content == "page-1\npage-2\np"
+    assert parsed.truncated is True
+    assert consumed == [0, 1, 2, 3]
+
+
+def test_parse_kills_process_after_wall_time_limit(monkeypatch, tmp_path):
+    monkeypatch.setattr(file_parsing.settings, "file_parse_timeout_seconds", 0.001)
+    path = tmp_path / "slow.docx"
+    path.write_bytes(_docx_bytes("slow"))
+
+    with pytest.raises(FileParseTimeoutError):
+        file_parser_pool.parse(".docx", path, 20000)
+
+    assert parse_metrics.stats()[".docx"]["timeouts"] == 1
+
+
+@pytest.mark.anyio
+async def test_parse_file_waits_for_a_slot_before_taking_a_thread(monkeypatch, tmp_path):
+    monkeypatch.setattr(file_parsing.settings, "file_parse_workers", 1)
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def slow_parse(extension, path, max_chars, cancel=None):
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+        return ParsedText(content=path.name, truncated=False)
+
+    monkeypatch.setattr(file_parser_pool, "parse", slow_parse)
+    paths = [tmp_path / f"{index}.docx" for index in range(4)]
+
+    parsed = await asyncio.gather(*(parse_file(".docx", path, 100) for path in paths))
+
+    assert [item.content for item in parsed] == [path.name for path in paths]
+    assert running["peak"] == 1
+
+
+def test_parse_kills_process_when_cancelled(tmp_path):
+    path = tmp_path / "cancelled.docx"
+    path.write_bytes(_docx_bytes("cancelled"))
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(FileParseError, match="cancelled"):
+        file_parser_pool.parse(".docx", path, 20000, cancel)
+
+
+@pytest.mark.anyio
+async def test_cancelled_parse_file_signals_the_parsing_thread(monkeypatch, tmp_path):
+    started = threading.Event()
+    seen: list[threading.Event] = []
+
+    def blocking_parse(extension, path, max_chars, cancel=None):
+        seen.append(cancel)
+        started.set()
+        cancel.wait(5)
+        raise FileParseError("Parsing was cancelled")
+
+    monkeypatch.setattr(file_parser_pool, "parse", blocking_parse)
+    task = asyncio.create_task(parse_file(".docx", tmp_path / "slow.docx", 100))
+    await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert seen[0].is_set()
+
+
+@pytest.mark.anyio
+async def test_parse_files_serves_repeated_upload_from_cache():
+    data = _docx_bytes("syllabus")
+
+    first = await parse_files(current_user=object(), files=[UploadFile(file=BytesIO(data), filename="a.docx")])
+    second = await parse_files(current_user=object(), files=[UploadFile(file=BytesIO(data), filename="b.docx")])
+
+    assert first.results[0].cached is False
+    assert second.results[0].cached is True
+    assert second.results[0].content == "syllabus"
+    assert parse_metrics.stats()[".docx"]["count"] == 1
+
+
+def test_parsed_text_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(file_parsing.settings, "file_parse_cache_max_bytes", 30)
+    first, second, third = (ParsedTextCache.key(f"{n}" * 64, ".pdf", 100) for n in range(3))
+    parsed_text_cache.set(first, ParsedText("a" * 200))
+    parsed_text_cache.set(second, ParsedText("b" * 200))
+    assert parsed_text_cache.get(first) is not None
+
+    parsed_text_cache.set(third, ParsedText("c" * 200))
+
+    assert parsed_text_cache.get(second) is None
+    assert parsed_text_cache.get(first).content == "a" * 200
+    assert parsed_text_cache.stats()["evictions"] >= 1
@@ -1,7 +1,14 @@
 """Tests for history API endpoints."""
 
+import base64
+import csv
+import gzip
+import io
+import json
+
 import pytest
 from fastapi import HTTPException
+from sqlalchemy import func, select
 
 from app.api.v1.auth import register_user
 from app.api.v1.history import (
@@ -10,12 +17,14 @@ from app.api.v1.history import (
     clear_all_histories,
     create_history,
     delete_history,
+    export_histories,
     get_history,
     list_histories,
     update_history,
 )
 from app.core.security import create_access_token
 from app.models.detection import Detection
+from app.models.history_counter import UserHistoryCounter
 from app.schemas.auth import RegisterRequest
 from app.schemas.history import (
     Analysis,
@@ -26,6 +35,7 @@ from app.schemas.history import (
     Sentence,
     Summary,
 )
+from app.services.history_counters import read_history_count, reconcile_history_counters
 
 
 @pytest.mark.anyio
@@ -421,6 +431,34 @@ async def test_batch_delete(db_session, unique_email):
     assert list_response.total == 1
 
 
+@pytest.mark.anyio
+async def test_batch_delete_reports_missing_foreign_and_duplicate_ids(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
+    other = await register_user(RegisterRequest(email=f"other-{unique_email}", password="StrongPass!23"), db_session)
+
+    def _payload(index: int) -> HistoryRecordCreate:
+        return HistoryRecordCreate(
+            title=f"Record {index}",
+            functions=["scan"],
+            input_text=f"Text {index}",
+            editor_html=f"<p>Text {index}</p>",
+        )
+
+    own = [(await create_history(payload=_payload(index), db=db_session, current_user=user)).id for index in range(2)]
+    foreign = (await create_history(payload=_payload(9), db=db_session, current_user=other)).id
+    missing = max(own + [foreign]) + 1000
+
+    response = await batch_delete_histories(
+        payload=BatchDeleteRequest(ids=[own[0], missing, own[0], foreign, own[1]]),
+        db=db_session,
+        current_user=user,
+    )
+
+    assert response.deleted_count == 2
+    assert response.failed_ids == [missing, own[0], foreign]
+    assert db_session.get(Detection, foreign) is not None
+
+
 @pytest.mark.anyio
 async def test_clear_all(db_session, unique_email):
     user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
@@ -642,6 +680,79 @@ async def test_claim_guest_history_assigns_guest_records_to_user(db_session, uni
     assert histories.items[0].title == "Guest Record"
 
 
+@pytest.mark.anyio
+async def test_history_counter_tracks_creates_claims_and_deletes(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
+
+    created = [
+        await create_history(
+            payload=HistoryRecordCreate(
+                title=f"Record {index}",
+                functions=["scan"],
+                input_text=f"Text {index}",
+                editor_html=f"<p>Text {index}</p>",
+            ),
+            db=db_session,
+            current_user=user,
+        )
+        for index in range(3)
+    ]
+    assert read_history_count(db_session, user.id) == 3
+
+    guest_id = "guest-counter-test"
+    db_session.add(
+        Detection(
+            user_id=None,
+            actor_type="guest",
+            actor_id=guest_id,
+            chars_used=5,
+            input_text="Guest text",
+            result_label="ai",
+            score=0.9,
+            meta_json={"analysis": {"summary": {"ai": 90, "mixed": 5, "human": 5}}},
+        )
+    )
+    db_session.commit()
+    guest_token = create_access_token(subject=guest_id, extra_claims={"sub_type": "guest", "guest_id": guest_id})
+    await claim_guest_history(payload=ClaimGuestHistoryRequest(guest_token=guest_token), db=db_session, current_user=user)
+    assert read_history_count(db_session, user.id) == 4
+
+    await delete_history(history_id=created[0].id, db=db_session, current_user=user)
+    await batch_delete_histories(payload=BatchDeleteRequest(ids=[created[1].id]), db=db_session, current_user=user)
+    assert read_history_count(db_session, user.id) == 2
+
+    await clear_all_histories(db=db_session, current_user=user)
+    assert read_history_count(db_session, user.id) == 0
+
+
+@pytest.mark.anyio
+async def test_inflated_counter_does_not_trim_below_limit_and_is_reconciled(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
+
+    async def create(index: int):
+        payload = HistoryRecordCreate(
+            title=f"Record {index}",
+            functions=["scan"],
+            input_text=f"Text {index}",
+            editor_html=f"<p>Text {index}</p>",
+        )
+        return await create_history(payload=payload, db=db_session, current_user=user)
+
+    for index in range(3):
+        await create(index)
+    # 模拟计数漂移（例如级联删除绕过了钩子）：计数器远大于实际行数。
+    counter = db_session.get(UserHistoryCounter, user.id)
+    counter.records = 150
+    db_session.commit()
+
+    await create(3)
+    assert db_session.scalar(select(func.count()).select_from(Detection).where(Detection.user_id == user.id)) == 4
+
+    assert reconcile_history_counters(db_session) == 1
+    assert read_history_count(db_session, user.id) == 4
+    assert reconcile_history_counters(db_session) == 0
+
+
 @pytest.mark.anyio
 async def test_create_history_rejects_blank_input_text(db_session, unique_email):
     user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
@@ -725,3 +836,147 @@ async def test_list_histories_filters_blank_records(db_session, unique_email):
     assert response.total == 1
     assert len(response.items) == 1
     assert response.items[0].title == "Valid Record"
+
+
+@pytest.mark.anyio
+async def test_list_histories_paginates_displayable_records_in_sql(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
+
+    analysis = {"summary": {"ai": 60, "mixed": 20, "human": 20}, "sentences": []}
+    records = [
+        Detection(
+            user_id=user.id,
+            actor_type="user",
+            actor_id=str(user.id),
+            title=f"Record {index}",
+            input_text=f"Text {index}" if index % 3 else "   ",
+            functions_used=["scan"],
+            result_label="ai",
+            score=0.6,
+            meta_json={"analysis": analysis},
+        )
+        for index in range(1, 10)
+    ]
+    db_session.add_all(records)
+    db_session.commit()
+    assert [record.is_displayable for record in records] == [True, True, False] * 3
+
+    response = await list_histories(
+        db=db_session,
+        current_user=user,
+        page=2,
+        per_page=4,
+        sort="created_at",
+        order="desc",
+    )
+    assert response.total == 6
+    assert response.total_pages == 2
+    assert len(response.items) == 2
+
+    records[2].input_text = "Filled later"
+    db_session.commit()
+    assert records[2].is_displayable is True
+
+
+@pytest.mark.anyio
+async def test_list_histories_walks_pages_with_cursor(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
+
+    analysis = {"summary": {"ai": 60, "mixed": 20, "human": 20}, "sentences": []}
+    db_session.add_all(
+        [
+            Detection(
+                user_id=user.id,
+                actor_type="user",
+                actor_id=str(user.id),
+                title=f"Record {index}",
+                input_text=f"Text {index}",
+                functions_used=["scan"],
+                result_label="ai",
+                score=0.6,
+                is_pinned=index in {2, 4},
+                meta_json={"analysis": analysis},
+            )
+            for index in range(1, 6)
+        ]
+    )
+    db_session.commit()
+
+    async def fetch(cursor=None, include_total=False):
+        return await list_histories(
+            db=db_session,
+            current_user=user,
+            page=1,
+            per_page=2,
+            sort="created_at",
+            order="desc",
+            cursor=cursor,
+            include_total=include_total,
+        )
+
+    full = await fetch(include_total=True)
+    assert full.total == 5
+
+    walked, cursor = [], None
+    for _ in range(5):
+        response = await fetch(cursor)
+        assert response.total is None
+        walked.extend(item.id for item in response.items)
+        cursor = response.next_cursor
+        if cursor is None:
+            break
+    assert cursor is None
+
+    assert len(walked) == len(set(walked)) == 5
+    assert {db_session.get(Detection, item_id).is_pinned for item_id in walked[:2]} == {True}
+    assert walked[2:] == sorted(walked[2:], reverse=True)
+
+    forged = base64.urlsafe_b64encode(b'{"s":"created_at","o":"desc","v":[[1],{},"x"]}').decode("ascii")
+    for bad_cursor in ("not-a-cursor", forged):
+        with pytest.raises(HTTPException) as exc_info:
+            await fetch(bad_cursor)
+        assert exc_info.value.status_code == 422
+        assert exc_info.value.detail["code"] == "INVALID_CURSOR"
+
+
+@pytest.mark.anyio
+async def test_export_histories_streams_ndjson_and_gzipped_csv(db_session, unique_email, monkeypatch):
+    from app.services import exports
+
+    monkeypatch.setattr(exports.settings, "export_batch_size", 2)
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23"), db_session)
+    created = []
+    for index in range(5):
+        payload = HistoryRecordCreate(
+            title=f"Export {index + 1}",
+            functions=["scan"],
+            input_text=f"Export text {index + 1}",
+            editor_html=f"<p>Export text {index + 1}</p>",
+            analysis=Analysis(
+                summary=Summary(ai=30, mixed=20, human=50), sentences=[], ai_likely_count=0, highlighted_html=""
+            ),
+        )
+        created.append(await create_history(payload=payload, db=db_session, current_user=user))
+
+    response = await export_histories(db=db_session, current_user=user)
+    assert response.media_type == "application/x-ndjson"
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    rows = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert [row["id"] for row in rows] == [record.id for record in created]
+    assert rows[0]["title"] == "Export 1"
+    assert rows[0]["functions"] == ["scan"]
+    assert "inputText" not in rows[0]
+
+    response = await export_histories(
+        db=db_session, current_user=user, export_format="csv", columns="id,inputText", q="text 3", gzip=True
+    )
+    assert response.media_type == "application/gzip"
+    assert response.headers["Content-Disposition"].endswith('.csv.gz"')
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    table = list(csv.reader(io.StringIO(gzip.decompress(body).decode("utf-8"))))
+    assert table == [["id", "inputText"], [str(created[2].id), "Export text 3"]]
+
+    with pytest.raises(HTTPException) as exc:
+        await export_histories(db=db_session, current_user=user, columns="id,editorHtml")
+    assert exc.value.status_code == 422
+    assert exc.value.detail["detail"] == ["editorHtml"]
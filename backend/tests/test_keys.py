@@ -1,9 +1,20 @@
 import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
 
 from app.api.v1.auth import register_user
-from app.api.v1.keys import api_key_self_test, create_api_key, list_api_keys
-from app.schemas.auth import RegisterRequest
+from app.api.v1.keys import (
+    api_key_self_test,
+    create_api_key,
+    deactivate_api_key,
+    list_api_keys,
+)
+from app.db.deps import get_current_user
+from app.models.api_key import APIKey
 from app.schemas.api_key import APIKeyCreateRequest, APIKeyStatus
+from app.schemas.auth import RegisterRequest
+from app.services.admin_service import AdminService
+from app.services.api_key_cache import api_key_cache, last_used_recorder
 
 
 @pytest.mark.anyio
@@ -25,3 +36,40 @@ async def test_api_key_happy_path(db_session, unique_email):
 
     self_test = await api_key_self_test(current_user=user)
     assert unique_email in self_test.message
+
+
+@pytest.mark.anyio
+async def test_api_key_auth_is_cached_and_batches_last_used(db_session, unique_email):
+    user = await register_user(payload=RegisterRequest(email=unique_email, password="StrongPass!23"), db=db_session)
+    created = await create_api_key(payload=APIKeyCreateRequest(name="Cached Key"), db=db_session, current_user=user)
+
+    for _ in range(3):
+        assert get_current_user(db=db_session, token=None, api_key_header=created.key).id == user.id
+    assert api_key_cache.stats()["hits"] == 2
+
+    api_key = db_session.get(APIKey, created.id)
+    assert api_key.last_used_at is None
+    assert last_used_recorder.stats()["pending"] == 1
+    flushed = last_used_recorder.flush(lambda: Session(bind=db_session.connection(), join_transaction_mode="create_savepoint"))
+    assert flushed == 1
+    db_session.refresh(api_key)
+    assert api_key.last_used_at is not None
+
+    await deactivate_api_key(current_user=user, db=db_session, key_id=created.id)
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(db=db_session, token=None, api_key_header=created.key)
+    assert exc_info.value.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_cached_api_key_rejected_once_owner_is_deactivated(db_session, unique_email):
+    user = await register_user(payload=RegisterRequest(email=unique_email, password="StrongPass!23"), db=db_session)
+    created = await create_api_key(payload=APIKeyCreateRequest(name="Owner Key"), db=db_session, current_user=user)
+    assert get_current_user(db=db_session, token=None, api_key_header=created.key).id == user.id
+
+    AdminService(db_session).update_user(user.id, is_active=False)
+
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(db=db_session, token=None, api_key_header=created.key)
+    assert exc_info.value.status_code == 401
+    assert api_key_cache.stats()["hits"] == 1
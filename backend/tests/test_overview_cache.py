@@ -0,0 +1,59 @@
+import asyncio
+import threading
+from contextlib import nullcontext
+
+import pytest
+
+from app.services.overview_cache import OverviewCache
+
+
+@pytest.mark.anyio
+async def test_overview_cache_coalesces_concurrent_misses():
+    cache = OverviewCache()
+    calls = []
+    release = threading.Event()
+
+    def loader(db):
+        calls.append(db)
+        release.wait(timeout=5)
+        return {"value": len(calls)}
+
+    pending = [asyncio.ensure_future(cache.get("week", "db", loader)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    release.set()
+    results = await asyncio.gather(*pending)
+
+    assert calls == ["db"]
+    assert results == [{"value": 1}] * 3
+    assert await cache.get("week", "db", loader) == {"value": 1}
+    assert cache.stats() == {
+        "hits": 1,
+        "stale_hits": 0,
+        "misses": 1,
+        "coalesced": 2,
+        "refreshes": 0,
+        "invalidations": 0,
+        "entries": 1,
+    }
+
+
+@pytest.mark.anyio
+async def test_overview_cache_serves_stale_and_refreshes_after_invalidation():
+    cache = OverviewCache()
+    versions = iter(range(1, 10))
+
+    def loader(db):
+        return next(versions)
+
+    assert await cache.get("today", None, loader) == 1
+    cache.invalidate()
+    # 未配置后台 session 时，失效条目直接同步重算。
+    assert await cache.get("today", None, loader) == 2
+
+    cache.configure(lambda: nullcontext("refresh-session"))
+    cache.invalidate()
+    assert await cache.get("today", None, loader) == 2
+    await asyncio.gather(*cache._tasks)
+    assert await cache.get("today", None, loader) == 3
+    assert cache.stats()["stale_hits"] == 1
+    assert cache.stats()["refreshes"] == 1
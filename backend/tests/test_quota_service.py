@@ -1,6 +1,9 @@
+from datetime import date, timedelta
+
 from app.models.detection import Detection
 from app.models.quota_usage import QuotaUsage
-from app.services.quota_service import get_today_bounds, get_used_today
+from app.services.quota_cache import quota_counter_cache, reconcile_quota_counters
+from app.services.quota_service import consume_quota, get_today_bounds, get_used_today
 
 
 def test_get_used_today_prefers_ledger_when_present(db_session):
@@ -60,3 +63,64 @@ def test_get_used_today_falls_back_to_detection_rows_without_ledger(db_session):
     used_today = get_used_today(db_session, actor_type=actor_type, actor_id=actor_id, start_time=start, end_time=end)
 
     assert used_today == 1200
+
+
+def test_consume_quota_writes_through_to_cache_after_commit(db_session):
+    actor_type = "guest"
+    actor_id = "quota-cache-write-through"
+    start, end = get_today_bounds()
+
+    assert get_used_today(db_session, actor_type=actor_type, actor_id=actor_id, start_time=start, end_time=end) == 0
+
+    consume_quota(db_session, actor_type=actor_type, actor_id=actor_id, chars=400, start_time=start, limit=5000)
+    assert quota_counter_cache.get(actor_type, actor_id, start.date()) == 0
+
+    db_session.commit()
+
+    assert quota_counter_cache.get(actor_type, actor_id, start.date()) == 400
+    assert get_used_today(db_session, actor_type=actor_type, actor_id=actor_id, start_time=start, end_time=end) == 400
+
+
+def test_consume_quota_rollback_drops_cached_counter(db_session):
+    actor_type = "guest"
+    actor_id = "quota-cache-rollback"
+    start, _ = get_today_bounds()
+    quota_counter_cache.set(actor_type, actor_id, start.date(), 100)
+
+    savepoint = db_session.begin_nested()
+    consume_quota(db_session, actor_type=actor_type, actor_id=actor_id, chars=50, start_time=start, limit=5000)
+    savepoint.rollback()
+
+    assert quota_counter_cache.get(actor_type, actor_id, start.date()) is None
+
+
+def test_reconcile_quota_counters_repairs_drift(db_session):
+    start, _ = get_today_bounds()
+    usage_date = start.date()
+    db_session.add(QuotaUsage(actor_type="user", actor_id="drifted", usage_date=usage_date, limit=30000, used=900))
+    db_session.commit()
+    quota_counter_cache.set("user", "drifted", usage_date, 100)
+    quota_counter_cache.set("user", "orphan", usage_date, 50)
+
+    repaired = reconcile_quota_counters(db_session, usage_date)
+
+    assert repaired == 2
+    assert quota_counter_cache.get("user", "drifted", usage_date) == 900
+    assert quota_counter_cache.get("user", "orphan", usage_date) is None
+
+
+def test_quota_counter_cache_prunes_previous_day_on_rollover():
+    today = date(2026, 3, 20)
+    quota_counter_cache.set("guest", "rollover", today - timedelta(days=1), 300)
+
+    assert quota_counter_cache.get("guest", "rollover", today) is None
+    assert quota_counter_cache.keys() == []
+
+
+def test_quota_counter_fill_does_not_overwrite_committed_value():
+    usage_date = date(2026, 3, 21)
+    quota_counter_cache.set("user", "fill-race", usage_date, 700)
+
+    quota_counter_cache.fill("user", "fill-race", usage_date, 500)
+
+    assert quota_counter_cache.get("user", "fill-race", usage_date) == 700
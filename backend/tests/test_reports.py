@@ -1,14 +1,27 @@
+import json
+import tempfile
+import zipfile
+from datetime import timedelta
 from io import BytesIO
+from pathlib import Path
 
 import pytest
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 from pypdf import PdfReader
 
 from app.api.v1.auth import register_user
-from app.api.v1.reports import export_pdf_report
-from app.schemas import ReportPdfRequest
+from app.api.v1.reports import (
+    _build_report_content,
+    export_bulk_reports,
+    export_pdf_report,
+)
+from app.schemas import ReportBulkRequest, ReportPdfRequest
 from app.schemas.auth import RegisterRequest
+from app.services import report_rendering
 from app.services.history_service import HistoryService
+from app.services.report_pdf import ReportUser, build_report_filename
+from app.services.report_rendering import render_report, report_cache
 
 
 def _build_analysis() -> dict:
@@ -121,3 +134,114 @@ async def test_export_pdf_report_rejects_missing_history(db_session, unique_emai
         )
 
     assert exc_info.value.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_export_pdf_report_reuses_cached_pdf_and_honours_etag(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23", name="cache-user"), db_session)
+    history = _create_history(db_session, user.id)
+    request = ReportPdfRequest(report_type="scan", locale="en-US", history_id=history.id)
+
+    first = await export_pdf_report(request, db=db_session, current_user=user)
+    second = await export_pdf_report(request, db=db_session, current_user=user)
+    assert second.body == first.body
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert report_cache.stats()["hits"] == 1
+
+    not_modified = await export_pdf_report(request, db=db_session, current_user=user, if_none_match=first.headers["ETag"])
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+
+    other_locale = await export_pdf_report(
+        ReportPdfRequest(report_type="scan", locale="zh-CN", history_id=history.id), db=db_session, current_user=user
+    )
+    assert other_locale.headers["ETag"] != first.headers["ETag"]
+
+
+@pytest.mark.anyio
+async def test_cached_report_takes_filename_from_each_request(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23", name="stamp-user"), db_session)
+    history = _create_history(db_session, user.id)
+    first = _build_report_content(history, "history", "en-US")
+    later = first.model_copy(update={"generated_at": first.generated_at + timedelta(hours=3)})
+
+    rendered = await render_report(first, ReportUser.from_user(user))
+    reused = await render_report(later, ReportUser.from_user(user))
+
+    assert report_cache.stats()["hits"] == 1
+    assert reused.body == rendered.body
+    assert reused.filename == build_report_filename(later) != rendered.filename
+    assert "Rendered At" in _extract_text(rendered.body)
+
+
+@pytest.mark.anyio
+async def test_report_cache_evicted_when_history_changes(db_session, unique_email):
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23", name="evict-user"), db_session)
+    history = _create_history(db_session, user.id)
+    request = ReportPdfRequest(report_type="history", locale="en-US", history_id=history.id)
+    await export_pdf_report(request, db=db_session, current_user=user)
+    assert report_cache.stats()["entries"] == 1
+
+    history.title = "Renamed"
+    db_session.commit()
+
+    assert report_cache.stats()["entries"] == 0
+
+
+@pytest.mark.anyio
+async def test_large_report_is_streamed_from_temp_file(db_session, unique_email, monkeypatch):
+    monkeypatch.setattr(report_rendering.settings, "report_inline_max_bytes", 0)
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23", name="stream-user"), db_session)
+    history = _create_history(db_session, user.id)
+
+    response = await export_pdf_report(
+        ReportPdfRequest(report_type="scan", locale="en-US", history_id=history.id), db=db_session, current_user=user
+    )
+
+    assert isinstance(response, StreamingResponse)
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    assert body.startswith(b"%PDF")
+    assert int(response.headers["Content-Length"]) == len(body)
+    assert "This is the original text." in _extract_text(body)
+    assert report_cache.stats()["entries"] == 0
+    assert not list(Path(tempfile.gettempdir()).glob("report-*.pdf"))
+
+
+@pytest.mark.anyio
+async def test_bulk_reports_stream_zip_with_errors(db_session, unique_email, monkeypatch):
+    monkeypatch.setattr(report_rendering.settings, "report_inline_max_bytes", 0)
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23", name="bulk-user"), db_session)
+    first = _create_history(db_session, user.id, title="First")
+    second = _create_history(db_session, user.id, title="Second")
+    missing_id = second.id + 1000
+
+    response = await export_bulk_reports(
+        ReportBulkRequest(report_type="history", locale="en-US", history_ids=[first.id, second.id, first.id, missing_id]),
+        db=db_session,
+        current_user=user,
+    )
+
+    assert response.media_type == "application/zip"
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    with zipfile.ZipFile(BytesIO(body)) as archive:
+        names = archive.namelist()
+        pdf_names = sorted(name for name in names if name.endswith(".pdf"))
+        assert [name.split("-")[3] for name in pdf_names] == sorted([str(first.id), str(second.id)])
+        assert "This is the original text." in _extract_text(archive.read(pdf_names[0]))
+        errors = json.loads(archive.read("errors.json"))
+    assert errors == [{"historyId": missing_id, "code": "HISTORY_NOT_FOUND", "message": "History record not found"}]
+    assert not list(Path(tempfile.gettempdir()).glob("report-*.pdf"))
+
+
+@pytest.mark.anyio
+async def test_bulk_reports_enforce_per_request_cap(db_session, unique_email, monkeypatch):
+    from app.api.v1 import reports
+
+    monkeypatch.setattr(reports.settings, "report_bulk_max_items", 2)
+    user = await register_user(RegisterRequest(email=unique_email, password="StrongPass!23", name="bulk-cap"), db_session)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await export_bulk_reports(ReportBulkRequest(history_ids=[1, 2, 3]), db=db_session, current_user=user)
+
+    assert exc_info.value.status_code == 422
+    assert exc_info.value.detail["code"] == "TOO_MANY_REPORTS"
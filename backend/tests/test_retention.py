@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.models.detection import Detection
+from app.models.user import User
+from app.services import retention
+from app.services.retention import (
+    ArchivedDetectionNotFound,
+    archive_expired_detections,
+    restore_detection,
+    retention_metrics,
+)
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def _detection(actor_type: str, actor_id: str, *, age_days: int, user_id: int | None = None, pinned: bool = False) -> Detection:
+    return Detection(
+        actor_type=actor_type,
+        actor_id=actor_id,
+        user_id=user_id,
+        chars_used=10,
+        input_text=f"retention text {actor_id}",
+        meta_json={"analysis": {"summary": {"ai": 0.5}}},
+        result_label="AI",
+        score=0.5,
+        is_pinned=pinned,
+        created_at=NOW - timedelta(days=age_days),
+    )
+
+
+def _remaining_ids(db_session, ids: list[int]) -> set[int]:
+    return set(db_session.scalars(select(Detection.id).where(Detection.id.in_(ids))).all())
+
+
+@pytest.fixture()
+def retention_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(retention.settings, "retention_guest_days", 30)
+    monkeypatch.setattr(retention.settings, "retention_user_days", 365)
+    return tmp_path
+
+
+def test_archive_applies_policy_per_actor_and_restores_single_record(db_session, unique_email, retention_settings):
+    user = User(email=unique_email, name=unique_email, password_hash="x")
+    db_session.add(user)
+    db_session.flush()
+    rows = {
+        "old_guest": _detection("guest", "guest-old", age_days=45),
+        "new_guest": _detection("guest", "guest-new", age_days=5),
+        "claimed_guest": _detection("guest", "guest-claimed", age_days=45, user_id=user.id),
+        "old_user": _detection("user", str(user.id), age_days=400, user_id=user.id),
+        "pinned_user": _detection("user", str(user.id), age_days=400, user_id=user.id, pinned=True),
+        "recent_user": _detection("user", str(user.id), age_days=100, user_id=user.id),
+    }
+    db_session.add_all(rows.values())
+    db_session.commit()
+    ids = {name: row.id for name, row in rows.items()}
+
+    result = archive_expired_detections(db_session, archive_dir=retention_settings, now=NOW, batch_size=1)
+
+    assert (result.archived, result.deleted, result.batches) == (2, 2, 2)
+    expired = {ids["old_guest"], ids["old_user"]}
+    assert _remaining_ids(db_session, list(ids.values())) == set(ids.values()) - expired
+    assert list(retention_settings.glob("detections-guest-*.jsonl.*"))
+    stats = retention_metrics.stats()
+    assert stats["archived_rows"] == 2 and stats["runs"] == 1
+
+    db_session.expunge_all()
+    assert restore_detection(db_session, ids["old_user"], archive_dir=retention_settings) is True
+    restored = db_session.get(Detection, ids["old_user"])
+    assert restored.meta_json == {"analysis": {"summary": {"ai": 0.5}}}
+    assert restored.created_at.replace(tzinfo=timezone.utc) == NOW - timedelta(days=400)
+    assert restore_detection(db_session, ids["old_user"], archive_dir=retention_settings) is False
+    with pytest.raises(ArchivedDetectionNotFound):
+        restore_detection(db_session, ids["new_guest"], archive_dir=retention_settings)
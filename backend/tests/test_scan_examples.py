@@ -1,11 +1,16 @@
+import json
+
+import pytest
 from sqlalchemy import select
 
+from app.api.v1.detections import get_scan_examples
 from app.models.scan_example import ScanExample
-from app.services.scan_example_service import ScanExampleService
+from app.services.scan_example_service import ScanExampleService, scan_example_cache
 
 
 def test_list_examples_seeds_defaults_for_zh_cn(db_session):
     service = ScanExampleService(db_session)
+    service.ensure_seeded()
 
     response = service.list_examples("zh-CN")
 
@@ -23,6 +28,7 @@ def test_list_examples_seeds_defaults_for_zh_cn(db_session):
 
 def test_list_examples_falls_back_to_en_us(db_session):
     service = ScanExampleService(db_session)
+    service.ensure_seeded()
 
     response = service.list_examples("fr-FR")
 
@@ -54,6 +60,7 @@ def test_list_examples_refreshes_existing_seed_data(db_session):
     db_session.commit()
 
     service = ScanExampleService(db_session)
+    service.ensure_seeded()
     response = service.list_examples("en-US")
 
     assert response.hero_examples[0].label == "ChatGPT"
@@ -79,3 +86,47 @@ def test_list_examples_refreshes_existing_seed_data(db_session):
     assert refreshed.snippet.startswith("Artificial intelligence systems")
     assert refreshed.sort_order == 10
     assert refreshed.is_active is True
+
+
+@pytest.mark.anyio
+async def test_scan_examples_endpoint_serves_cached_body_with_etag(db_session):
+    ScanExampleService(db_session).ensure_seeded()
+    sessions_opened = []
+
+    def lazy_db():
+        sessions_opened.append(1)
+        return db_session
+
+    first = await get_scan_examples(db=lazy_db, locale="en-US", if_none_match=None)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith('W/')
+    assert first.headers["cache-control"] == "public, max-age=300"
+    assert json.loads(first.body)["heroExamples"][0]["label"] == "ChatGPT"
+
+    again = await get_scan_examples(db=lazy_db, locale="en", if_none_match=None)
+    assert again.body == first.body
+    assert sessions_opened == [1]
+
+    not_modified = await get_scan_examples(db=lazy_db, locale="en-US", if_none_match=f'W/"stale", {etag}')
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+    assert not_modified.headers["etag"] == etag
+
+
+@pytest.mark.anyio
+async def test_scan_examples_cache_invalidated_on_commit(db_session):
+    ScanExampleService(db_session).ensure_seeded()
+    first = await get_scan_examples(db=lambda: db_session, locale="en-US", if_none_match=None)
+
+    record = db_session.scalar(
+        select(ScanExample).where(ScanExample.locale == "en-US", ScanExample.placement == "hero", ScanExample.key == "chatgpt")
+    )
+    record.label = "Edited"
+    db_session.commit()
+
+    assert scan_example_cache.get("en-US") is None
+    second = await get_scan_examples(db=lambda: db_session, locale="en-US", if_none_match=first.headers["etag"])
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert json.loads(second.body)["heroExamples"][0]["label"] == "Edited"
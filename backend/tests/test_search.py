@@ -0,0 +1,21 @@
+from app.services.search import highlight_snippet, like_pattern, normalize_search_term
+
+
+def test_like_pattern_escapes_wildcards():
+    assert like_pattern("50%_off\\") == "%50\\%\\_off\\\\%"
+    assert normalize_search_term("   ") is None
+    assert normalize_search_term("  fox ") == "fox"
+
+
+def test_highlight_snippet_escapes_html_and_marks_first_match():
+    text = "<b>intro</b> " + "x" * 80 + " The Quick fox " + "y" * 80
+    snippet = highlight_snippet(text, "quick", radius=10)
+
+    assert snippet == "…xxxxx The <mark>Quick</mark> fox yyyyy…"
+    assert highlight_snippet("<b>quick</b>", "quick") == "&lt;b&gt;<mark>quick</mark>&lt;/b&gt;"
+    assert highlight_snippet(text, "missing") is None
+
+
+def test_highlight_snippet_uses_sql_cut_offsets():
+    assert highlight_snippet("xx fox yy", "fox", radius=3, offset=40, total_length=49) == "…xx <mark>fox</mark> yy"
+    assert highlight_snippet("xx fox yy", "fox", radius=3, offset=0, total_length=60) == "xx <mark>fox</mark> yy…"
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.api.v1.auth import register_user
+from app.api.v1.teams import get_team_stats
+from app.models.detection import Detection
+from app.models.team import TeamMemberRole
+from app.schemas.auth import RegisterRequest
+from app.services.team_service import TeamService
+from app.services.team_stats import rebuild_team_stats
+
+
+async def _create_user(db_session, email: str):
+    return await register_user(RegisterRequest(email=email, password="StrongPass!23"), db_session)
+
+
+def _detection(user, *, label: str, score: float, created_at: datetime | None = None) -> Detection:
+    return Detection(
+        user_id=user.id,
+        actor_type="user",
+        actor_id=str(user.id),
+        chars_used=100,
+        input_text="team text",
+        result_label=label,
+        score=score,
+        created_at=created_at,
+    )
+
+
+@pytest.mark.anyio
+async def test_team_stats_use_membership_at_detection_time(db_session, unique_email):
+    owner = await _create_user(db_session, unique_email)
+    member = await _create_user(db_session, f"member-{unique_email}")
+    team = TeamService(db_session).create_team(name=f"team-{unique_email}", creator_id=owner.id)
+
+    earlier = datetime.now(timezone.utc) - timedelta(days=3)
+    db_session.add(_detection(member, label="ai", score=0.9, created_at=earlier))
+    db_session.commit()
+    TeamService(db_session).add_member(team.id, owner.id, member.id, TeamMemberRole.MEMBER)
+    db_session.add_all(
+        [
+            _detection(owner, label="ai", score=0.8),
+            _detection(member, label="human", score=0.2),
+        ]
+    )
+    db_session.commit()
+
+    response = await get_team_stats(team_id=team.id, db=db_session, current_user=owner, start=None, end=None)
+    assert len(response.items) == 1
+    today = response.items[0]
+    assert today.detections == 2
+    assert today.chars_used == 200
+    assert today.average_score == pytest.approx(0.5)
+    assert today.label_counts == {"ai": 1, "human": 1}
+
+    written = rebuild_team_stats(db_session, start=earlier.date(), end=(datetime.now(timezone.utc) + timedelta(days=1)).date())
+    rebuilt = await get_team_stats(team_id=team.id, db=db_session, current_user=owner, start=None, end=None)
+    assert written == 3
+    assert rebuilt.items == response.items
+
+
+@pytest.mark.anyio
+async def test_removing_member_takes_their_detections_out_like_rebuild(db_session, unique_email):
+    owner = await _create_user(db_session, unique_email)
+    member = await _create_user(db_session, f"member-{unique_email}")
+    team = TeamService(db_session).create_team(name=f"team-{unique_email}", creator_id=owner.id)
+    membership = TeamService(db_session).add_member(team.id, owner.id, member.id, TeamMemberRole.MEMBER)
+    db_session.add_all([_detection(owner, label="ai", score=0.8), _detection(member, label="human", score=0.2)])
+    db_session.commit()
+
+    db_session.delete(membership)
+    db_session.commit()
+
+    response = await get_team_stats(team_id=team.id, db=db_session, current_user=owner, start=None, end=None)
+    assert [(item.detections, item.label_counts) for item in response.items] == [(1, {"ai": 1})]
+
+    today = datetime.now(timezone.utc).date()
+    rebuild_team_stats(db_session, start=today, end=today + timedelta(days=1))
+    rebuilt = await get_team_stats(team_id=team.id, db=db_session, current_user=owner, start=None, end=None)
+    assert rebuilt.items == response.items
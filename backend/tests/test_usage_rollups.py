@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from app.models.detection import Detection
+from app.models.usage_rollup import UsageLabelRollup, UsageRollup
+from app.services.usage_rollups import rebuild_usage_rollups
+
+
+def _detection(actor_id: str, *, label: str, chars: int, created_at: datetime) -> Detection:
+    return Detection(
+        actor_type="guest",
+        actor_id=actor_id,
+        chars_used=chars,
+        input_text="rollup text",
+        result_label=label,
+        score=0.5,
+        created_at=created_at,
+    )
+
+
+def _day_rollup(db_session, day: datetime) -> tuple[int, int]:
+    row = db_session.scalar(
+        select(UsageRollup).where(UsageRollup.granularity == "day", UsageRollup.bucket_start == day)
+    )
+    return (row.detections, row.chars_used) if row is not None else (0, 0)
+
+
+def test_orm_writes_keep_rollups_in_sync(db_session):
+    day = datetime(2026, 3, 18, tzinfo=timezone.utc)
+    first = _detection("rollup-a", label="ai", chars=100, created_at=day + timedelta(hours=3))
+    db_session.add_all([first, _detection("rollup-a", label="human", chars=40, created_at=day + timedelta(hours=5))])
+    db_session.commit()
+    assert _day_rollup(db_session, day) == (2, 140)
+
+    hourly = db_session.scalar(
+        select(UsageRollup).where(UsageRollup.granularity == "hour", UsageRollup.bucket_start == day + timedelta(hours=3))
+    )
+    assert hourly.detections == 1
+
+    db_session.delete(first)
+    db_session.commit()
+    assert _day_rollup(db_session, day) == (1, 40)
+    labels = dict(
+        db_session.execute(
+            select(UsageLabelRollup.label, UsageLabelRollup.detections).where(UsageLabelRollup.granularity == "day")
+        ).all()
+    )
+    assert labels == {"ai": 0, "human": 1}
+
+
+def test_rebuild_repairs_changes_that_bypass_the_orm(db_session):
+    day = datetime(2026, 3, 19, tzinfo=timezone.utc)
+    db_session.add_all(
+        [_detection("rollup-b", label="ai", chars=10 * index, created_at=day + timedelta(hours=index)) for index in range(1, 4)]
+    )
+    db_session.commit()
+    db_session.execute(delete(Detection).where(Detection.actor_id == "rollup-b", Detection.chars_used == 30))
+    db_session.commit()
+    assert _day_rollup(db_session, day) == (3, 60)
+
+    rebuild_usage_rollups(db_session, start=day, end=day + timedelta(hours=1))
+    assert _day_rollup(db_session, day) == (2, 30)
+    label_row = db_session.scalar(
+        select(UsageLabelRollup).where(UsageLabelRollup.granularity == "hour", UsageLabelRollup.bucket_start == day + timedelta(hours=3))
+    )
+    assert label_row is None
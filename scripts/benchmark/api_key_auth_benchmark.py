@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Measure X-API-Key authentication throughput before and after the key cache.
+
+Runs the authentication dependency in-process, one fresh session per simulated
+request, so the numbers isolate the auth work (hashing, lookups, commits) from
+HTTP and detection costs. ``legacy`` reproduces the previous behaviour: select
+the key by hash, load the user, write ``last_used_at`` and commit. ``cached``
+calls ``app.db.deps.get_current_user`` with the cache and the batched
+``last_used_at`` recorder.
+
+Without ``--database-url`` it uses a scratch SQLite file; against PostgreSQL it
+creates one throwaway user and key and deletes them afterwards.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from uuid import uuid4
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import create_engine, delete, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.security import generate_api_key, hash_api_key  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.deps import get_current_user  # noqa: E402
+from app.models.api_key import APIKey, APIKeyStatus  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.api_key_cache import last_used_recorder  # noqa: E402
+
+DEFAULT_REQUESTS = 5000
+OUTPUT_DIR = Path(__file__).resolve().parent / "results"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark API key authentication with and without caching.")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="SQLAlchemy URL (default: scratch SQLite).")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Authenticated calls per variant.")
+    return parser.parse_args()
+
+
+def legacy_auth(db, raw_key: str) -> User:
+    api_key = db.scalar(
+        select(APIKey).where(APIKey.key_hash == hash_api_key(raw_key), APIKey.status == APIKeyStatus.ACTIVE)
+    )
+    if api_key is None or api_key.user is None or not api_key.user.is_active:
+        raise RuntimeError("invalid key")
+    api_key.last_used_at = datetime.now(timezone.utc)
+    db.add(api_key)
+    db.commit()
+    return api_key.user
+
+
+def cached_auth(db, raw_key: str) -> User:
+    return get_current_user(db=db, token=None, api_key_header=raw_key)
+
+
+def run(session_factory, raw_key: str, requests: int, auth) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        with session_factory() as db:
+            auth(db, raw_key)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    args = parse_args()
+    scratch_dir = None
+    database_url = args.database_url
+    if not database_url:
+        scratch_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite+pysqlite:///{scratch_dir.name}/bench.db"
+
+    engine = create_engine(database_url, future=True)
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False, future=True)
+
+    plain_key, key_hash = generate_api_key()
+    with session_factory() as db:
+        user = User(email=f"bench-{uuid4().hex}@example.com", name=f"bench-{uuid4().hex}", password_hash="x")
+        db.add(user)
+        db.flush()
+        db.add(APIKey(user_id=user.id, name="bench", key_hash=key_hash))
+        db.commit()
+        user_id = user.id
+
+    report: dict = {"meta": {"requests": args.requests, "dialect": engine.dialect.name, "started_at": datetime.now(timezone.utc).isoformat()}}
+    try:
+        for name, auth in (("legacy", legacy_auth), ("cached", cached_auth)):
+            seconds = run(session_factory, plain_key, args.requests, auth)
+            report[f"{name}_requests_per_second"] = round(args.requests / seconds, 1)
+            report[f"{name}_ms_per_request"] = round(seconds * 1000 / args.requests, 3)
+        started = time.perf_counter()
+        report["last_used_rows_flushed"] = last_used_recorder.flush(session_factory)
+        report["last_used_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    finally:
+        with session_factory() as db:
+            db.execute(delete(APIKey).where(APIKey.user_id == user_id))
+            db.execute(delete(User).where(User.id == user_id))
+            db.commit()
+        if scratch_dir is not None:
+            scratch_dir.cleanup()
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = OUTPUT_DIR / f"api-key-auth-benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"report written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""Compare per-id and set-based history batch delete / guest claim on PostgreSQL.
+
+Mirrors ``HistoryService.batch_delete_histories`` and ``claim_guest_histories``
+before and after they were rewritten as single statements. Works in its own
+schema (``history_bench`` by default) and drops it afterwards unless ``--keep``
+is set.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+
+from sqlalchemy import create_engine, text
+
+DEFAULT_BATCH = 1000
+DEFAULT_REPEAT = 5
+OUTPUT_DIR = Path(__file__).resolve().parent / "results"
+
+SEED_SQL = """
+INSERT INTO {schema}.detections (user_id, actor_type, actor_id, is_displayable, meta_json, created_at)
+SELECT
+    CASE WHEN :guest THEN NULL ELSE :user_id END,
+    CASE WHEN :guest THEN 'guest' ELSE 'user' END,
+    :actor_id,
+    true,
+    jsonb_build_object('analysis', jsonb_build_object('summary', repeat(md5(g::text), 40))),
+    now() - (g || ' seconds')::interval
+FROM generate_series(1, :rows) AS g
+RETURNING id
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark per-id vs set-based history batch operations.")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="PostgreSQL SQLAlchemy URL.")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="Ids per batch delete / rows per claim.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per variant, median is reported.")
+    parser.add_argument("--schema", default="history_bench", help="Scratch schema name.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema after the run.")
+    return parser.parse_args()
+
+
+def seed(engine, schema: str, rows: int, *, guest: bool, actor_id: str) -> list[int]:
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(SEED_SQL.format(schema=schema)),
+            {"rows": rows, "guest": guest, "user_id": 1, "actor_id": actor_id},
+        )
+        return list(result.scalars())
+
+
+def delete_per_id(engine, schema: str, ids: list[int]) -> None:
+    # 旧实现：每个 id 一次 SELECT + DELETE + COMMIT。
+    for history_id in ids:
+        with engine.begin() as conn:
+            found = conn.execute(
+                text(f"SELECT id FROM {schema}.detections WHERE id = :id AND user_id = 1"), {"id": history_id}
+            ).scalar()
+            if found is not None:
+                conn.execute(text(f"DELETE FROM {schema}.detections WHERE id = :id"), {"id": history_id})
+
+
+def delete_set_based(engine, schema: str, ids: list[int]) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"DELETE FROM {schema}.detections WHERE user_id = 1 AND id = ANY(:ids) RETURNING id"), {"ids": ids}
+        ).all()
+
+
+def claim_per_row(engine, schema: str, guest_id: str) -> None:
+    # 旧实现：把整行（含 meta_json）读出来，逐行改 user_id，最后一次提交。
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text(
+                f"SELECT * FROM {schema}.detections WHERE actor_type = 'guest' AND actor_id = :guest "
+                "AND user_id IS NULL AND is_displayable ORDER BY created_at, id"
+            ),
+            {"guest": guest_id},
+        ).all()
+        for row in rows:
+            conn.execute(text(f"UPDATE {schema}.detections SET user_id = 1 WHERE id = :id"), {"id": row.id})
+
+
+def claim_set_based(engine, schema: str, guest_id: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"UPDATE {schema}.detections SET user_id = 1 WHERE actor_type = 'guest' AND actor_id = :guest "
+                "AND user_id IS NULL AND is_displayable"
+            ),
+            {"guest": guest_id},
+        )
+
+
+def measure(engine, schema: str, batch: int, repeat: int) -> dict[str, float]:
+    samples: dict[str, list[float]] = {name: [] for name in ("delete_per_id_ms", "delete_set_ms", "claim_per_row_ms", "claim_set_ms")}
+    for run in range(repeat):
+        for name, operation in (("delete_per_id_ms", delete_per_id), ("delete_set_ms", delete_set_based)):
+            ids = seed(engine, schema, batch, guest=False, actor_id="1")
+            started = time.perf_counter()
+            operation(engine, schema, ids)
+            samples[name].append((time.perf_counter() - started) * 1000)
+        for name, operation in (("claim_per_row_ms", claim_per_row), ("claim_set_ms", claim_set_based)):
+            guest_id = f"guest-{name}-{run}"
+            seed(engine, schema, batch, guest=True, actor_id=guest_id)
+            started = time.perf_counter()
+            operation(engine, schema, guest_id)
+            samples[name].append((time.perf_counter() - started) * 1000)
+    return {name: round(median(values), 2) for name, values in samples.items()}
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.database_url:
+        raise SystemExit("--database-url or DATABASE_URL is required")
+    schema = args.schema
+
+    engine = create_engine(args.database_url, future=True)
+    report: dict = {
+        "meta": {"batch": args.batch, "repeat": args.repeat, "started_at": datetime.now(timezone.utc).isoformat()},
+    }
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+        conn.execute(
+            text(
+                f"CREATE TABLE {schema}.detections ("
+                "id bigserial PRIMARY KEY, user_id integer, actor_type varchar(20) NOT NULL, "
+                "actor_id varchar(64) NOT NULL, is_displayable boolean NOT NULL, meta_json jsonb, "
+                "created_at timestamptz NOT NULL)"
+            )
+        )
+        conn.execute(text(f"CREATE INDEX ON {schema}.detections (actor_type, actor_id, created_at, id)"))
+        conn.execute(text(f"CREATE INDEX ON {schema}.detections (user_id)"))
+
+    report.update(measure(engine, schema, args.batch, args.repeat))
+
+    if not args.keep:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = OUTPUT_DIR / f"history-batch-benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"report written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
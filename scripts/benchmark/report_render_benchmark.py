@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""Compare the legacy and streamed PDF report renderers for 10 to 2,000 segments.
+
+``legacy`` reproduces the previous ``build_report_pdf``: the whole story list
+is built up front with one nested ``Table`` per sentence and the PDF is
+rendered into a ``BytesIO``. ``streamed`` is ``write_report_pdf`` writing to a
+temporary file, fed from a generator that draws each sentence's box with
+``FrameBG`` around plain single-style paragraphs. Each variant is timed without tracing, then run again under
+``tracemalloc`` to record the peak of Python allocations.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from statistics import median
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from reportlab.lib import colors  # noqa: E402
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.lib.units import mm  # noqa: E402
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle  # noqa: E402
+
+from app.schemas.history import Analysis  # noqa: E402
+from app.schemas.report import ReportPdfContent  # noqa: E402
+from app.services import report_pdf  # noqa: E402
+from app.services.report_pdf import ReportUser, write_report_pdf  # noqa: E402
+
+DEFAULT_SEGMENTS = (10, 50, 200, 500, 1000, 2000)
+DEFAULT_REPEAT = 3
+INPUT_TEXT_LIMIT = 50000
+OUTPUT_DIR = Path(__file__).resolve().parent / "results"
+USER = ReportUser(first_name="Bench", surname="User", name="bench-user", email="bench@example.com")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark legacy vs streamed PDF report rendering.")
+    parser.add_argument("--segments", type=int, nargs="+", default=list(DEFAULT_SEGMENTS), help="Segment counts to render.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per variant, median is reported.")
+    return parser.parse_args()
+
+
+def build_content(segments: int) -> ReportPdfContent:
+    sentences = []
+    for index in range(segments):
+        kind = ("ai", "human", "mixed")[index % 3]
+        text = f"Segment {index + 1} keeps a realistic length so every block wraps onto a few lines. " * 3
+        sentences.append(
+            {
+                "id": f"sent-{index + 1}",
+                "text": text.strip(),
+                "raw": text.strip(),
+                "type": kind,
+                "probability": 0.9 if kind != "human" else 0.1,
+                "score": 90 if kind != "human" else 10,
+                "reason": "Structured phrasing" if kind != "human" else "",
+                "suggestion": "",
+            }
+        )
+    analysis = Analysis.model_validate(
+        {
+            "summary": {"ai": 66, "mixed": 0, "human": 34},
+            "sentences": sentences,
+            "ai_likely_count": sum(1 for item in sentences if item["type"] != "human"),
+            "highlighted_html": "",
+        }
+    )
+    return ReportPdfContent(
+        report_type="history",
+        generated_at=datetime.now(timezone.utc),
+        locale="en-US",
+        history_id=1,
+        detection_id=1,
+        functions=["scan"],
+        # ReportPdfContent 限制原文 50,000 字符，超长时截断，句子数不受影响。
+        input_text="\n".join(item["text"] for item in sentences)[:INPUT_TEXT_LIMIT],
+        analysis=analysis,
+    )
+
+
+def _legacy_sentence_block(sentence, index, copy, styles):
+    stroke, fill = report_pdf._get_sentence_palette(sentence.type)
+    probability = round(float(sentence.probability or 0) * 100)
+    content = [
+        Paragraph(f"<font color='{stroke}'><b>{index}. {report_pdf._map_sentence_type(sentence.type, copy)} {probability}%</b></font>", styles["body"]),
+        Spacer(1, 4),
+        Paragraph(report_pdf._escape_text(sentence.text), styles["body"]),
+    ]
+    if sentence.reason:
+        content.extend([Spacer(1, 4), Paragraph(f"<b>{copy.reason_label}:</b> {report_pdf._escape_text(sentence.reason)}", styles["muted"])])
+    table = Table([[content]], colWidths=[170 * mm], hAlign="LEFT")
+    table.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, -1), fill),
+                ("BOX", (0, 0), (-1, -1), 1, colors.HexColor(stroke)),
+                ("LEFTPADDING", (0, 0), (-1, -1), 10),
+                ("RIGHTPADDING", (0, 0), (-1, -1), 10),
+                ("TOPPADDING", (0, 0), (-1, -1), 10),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
+                ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ]
+        )
+    )
+    return table
+
+
+def render_legacy(content: ReportPdfContent) -> int:
+    copy = report_pdf._get_copy(content.locale)
+    styles = report_pdf._build_styles(report_pdf._ensure_report_font())
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=20 * mm, rightMargin=20 * mm, topMargin=24 * mm, bottomMargin=16 * mm)
+    story: list = [
+        Paragraph(copy.title, styles["title"]),
+        report_pdf._build_metadata_table(content, USER, copy, styles),
+        report_pdf._build_summary_table(content, copy, styles),
+    ]
+    risk = [item for item in content.analysis.sentences if item.type in {"ai", "mixed"}]
+    for index, sentence in enumerate(risk, start=1):
+        story.extend([_legacy_sentence_block(sentence, index, copy, styles), Spacer(1, 8)])
+    for index, sentence in enumerate(content.analysis.sentences, start=1):
+        story.extend([_legacy_sentence_block(sentence, index, copy, styles), Spacer(1, 8)])
+    for paragraph in content.input_text.splitlines():
+        story.extend([Paragraph(report_pdf._escape_text(paragraph), styles["body"]), Spacer(1, 3)])
+    doc.build(story)
+    return len(buffer.getvalue())
+
+
+def render_streamed(content: ReportPdfContent) -> int:
+    with tempfile.TemporaryDirectory() as scratch:
+        path = Path(scratch) / "report.pdf"
+        write_report_pdf(content, USER, path)
+        return path.stat().st_size
+
+
+def measure(render, content: ReportPdfContent, repeat: int) -> dict[str, float]:
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = render(content)
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    render(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(median(timings), 1), "peak_mb": round(peak / 1024 / 1024, 2), "pdf_kb": round(size / 1024, 1)}
+
+
+def main() -> None:
+    args = parse_args()
+    report: dict = {"meta": {"repeat": args.repeat, "started_at": datetime.now(timezone.utc).isoformat()}, "runs": []}
+    for segments in args.segments:
+        content = build_content(segments)
+        run = {"segments": segments}
+        for name, render in (("legacy", render_legacy), ("streamed", render_streamed)):
+            for metric, value in measure(render, content, args.repeat).items():
+                run[f"{name}_{metric}"] = value
+        report["runs"].append(run)
+        print(json.dumps(run, ensure_ascii=False))
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = OUTPUT_DIR / f"report-render-benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"report written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Seed a scratch detections table and compare substring search with and without pg_trgm.
+
+The benchmark never touches application tables: it works in its own schema
+(``search_bench`` by default) and drops it afterwards unless ``--keep`` is set.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+
+from sqlalchemy import create_engine, text
+
+DEFAULT_ROWS = 1_000_000
+DEFAULT_REPEAT = 5
+DEFAULT_QUERIES = ["人工智能", "generated", "quick brown", "模型检测结果"]
+OUTPUT_DIR = Path(__file__).resolve().parent / "results"
+
+SEED_SQL = """
+INSERT INTO {schema}.detections (user_id, actor_id, title, input_text, created_at)
+SELECT
+    (g % 5000) + 1,
+    CASE WHEN g % 4 = 0 THEN 'guest-' || md5(g::text) ELSE ((g % 5000) + 1)::text END,
+    'Scan Record ' || g,
+    repeat(md5(g::text) || ' ', 20)
+        || (ARRAY['人工智能生成的文本', 'The quick brown fox', 'generated paragraph', '模型检测结果说明'])[(g % 4) + 1]
+        || repeat(' ' || md5((g * 7)::text), 10),
+    now() - (g || ' seconds')::interval
+FROM generate_series(1, :rows) AS g
+"""
+
+SEARCH_SQL = """
+SELECT id
+FROM {schema}.detections
+WHERE input_text ILIKE :pattern OR title ILIKE :pattern OR actor_id ILIKE :pattern
+ORDER BY created_at DESC, id DESC
+LIMIT 20
+"""
+
+RANKED_SQL = """
+SELECT id, word_similarity(:term, input_text) AS rank
+FROM {schema}.detections
+WHERE input_text ILIKE :pattern
+ORDER BY rank DESC, created_at DESC
+LIMIT 20
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark trigram-backed history/admin search on PostgreSQL.")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="PostgreSQL SQLAlchemy URL.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows to seed.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per query, median is reported.")
+    parser.add_argument("--query", action="append", dest="queries", help="Search term, may be repeated.")
+    parser.add_argument("--schema", default="search_bench", help="Scratch schema name.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema after the run.")
+    return parser.parse_args()
+
+
+def timed(conn, sql: str, params: dict) -> float:
+    started = time.perf_counter()
+    conn.execute(text(sql), params).all()
+    return (time.perf_counter() - started) * 1000
+
+
+def run_queries(conn, schema: str, queries: list[str], repeat: int, *, ranked: bool) -> dict[str, float]:
+    results: dict[str, float] = {}
+    for term in queries:
+        params = {"pattern": f"%{term}%", "term": term}
+        sql = (RANKED_SQL if ranked else SEARCH_SQL).format(schema=schema)
+        samples = [timed(conn, sql, params) for _ in range(repeat)]
+        results[term] = round(median(samples), 2)
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.database_url:
+        raise SystemExit("--database-url or DATABASE_URL is required")
+    queries = args.queries or DEFAULT_QUERIES
+    schema = args.schema
+
+    engine = create_engine(args.database_url, future=True)
+    report: dict = {
+        "meta": {"rows": args.rows, "repeat": args.repeat, "queries": queries, "started_at": datetime.now(timezone.utc).isoformat()},
+    }
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+        conn.execute(
+            text(
+                f"CREATE TABLE {schema}.detections ("
+                "id bigserial PRIMARY KEY, user_id integer, actor_id varchar(64) NOT NULL, "
+                "title varchar(255), input_text text NOT NULL, created_at timestamptz NOT NULL)"
+            )
+        )
+
+        started = time.perf_counter()
+        conn.execute(text(SEED_SQL.format(schema=schema)), {"rows": args.rows})
+        conn.execute(text(f"ANALYZE {schema}.detections"))
+        report["seed_seconds"] = round(time.perf_counter() - started, 2)
+
+        report["seq_scan_ms"] = run_queries(conn, schema, queries, args.repeat, ranked=False)
+
+        started = time.perf_counter()
+        for column in ("input_text", "title", "actor_id"):
+            conn.execute(
+                text(f"CREATE INDEX ON {schema}.detections USING gin ({column} gin_trgm_ops)")
+            )
+        conn.execute(text(f"ANALYZE {schema}.detections"))
+        report["index_build_seconds"] = round(time.perf_counter() - started, 2)
+        report["index_size"] = conn.execute(
+            text("SELECT pg_size_pretty(pg_indexes_size(:table))"), {"table": f"{schema}.detections"}
+        ).scalar()
+
+        report["trigram_ms"] = run_queries(conn, schema, queries, args.repeat, ranked=False)
+        report["trigram_ranked_ms"] = run_queries(conn, schema, queries, args.repeat, ranked=True)
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = OUTPUT_DIR / f"search-benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"report written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()